@@ -0,0 +1,124 @@
+# Log condensation benchmark: compression ratio and throughput of LogCondenser.
+#
+# The corpus is a set of generated console logs shaped like real ones (a failing pytest run
+# with colors and repeated tracebacks, a package install with progress bars, a C build with
+# warnings, a quiet server log), plus any *.log files passed with --corpus. Each log is fed
+# in READ_CHUNK_BYTES chunks, as the console reader delivers it. Results are appended to
+# benchmarks/condense.jsonl.
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+
+from feedback_common import READ_CHUNK_BYTES
+from feedback_condense import LogCondenser
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_FILE = os.path.join(REPO_DIR, "benchmarks", "condense.jsonl")
+GREEN, RED, RESET = "\x1b[32m", "\x1b[31m", "\x1b[0m"
+
+
+def pytest_log(rng: random.Random, tests: int = 20000) -> str:
+    lines = ["============================= test session starts ==============================",
+             f"collected {tests} items", ""]
+    failures = []
+    for index in range(tests):
+        failed = rng.random() < 0.01
+        lines.append(f"tests/test_module_{index // 100:03d}.py::test_case_{index} "
+                     f"{RED + 'FAILED' if failed else GREEN + 'PASSED'}{RESET} [{index * 100 // tests:3d}%]")
+        if failed: failures.append(index)
+    lines.append("=================================== FAILURES ===================================")
+    for index in failures:
+        lines += [f"___________________________ test_case_{index} ___________________________",
+                  "Traceback (most recent call last):",
+                  '  File "tests/conftest.py", line 41, in run',
+                  "    return handler(request)",
+                  '  File "app/handlers.py", line 120, in handler',
+                  "    raise ValueError(f\"bad payload {request.id}\")",
+                  f"ValueError: bad payload {rng.randrange(10 ** 6)}"]
+    lines.append(f"{RED}======= {len(failures)} failed, {tests - len(failures)} passed in 812.33s ======={RESET}")
+    return "\n".join(lines) + "\n"
+
+
+def install_log(rng: random.Random, packages: int = 400) -> str:
+    parts = []
+    for index in range(packages):
+        parts.append(f"Collecting package-{index}==1.{rng.randrange(20)}.0\n")
+        for percent in range(0, 101, 2):
+            bar = "█" * (percent // 4)
+            parts.append(f"\r  Downloading package-{index}.whl {percent:3d}%|{bar:<25}| {percent * 31}kB/3.1MB")
+        parts.append("\n")
+        if rng.random() < 0.02:
+            parts.append(f"WARNING: package-{index} is deprecated and will be removed\n")
+    parts.append("Successfully installed " + " ".join(f"package-{index}" for index in range(packages)) + "\n")
+    return "".join(parts)
+
+
+def build_log(rng: random.Random, units: int = 3000) -> str:
+    lines = []
+    for index in range(units):
+        lines.append(f"[{index + 1}/{units}] cc -O2 -Wall -c src/unit_{index}.c -o build/unit_{index}.o")
+        if rng.random() < 0.03:
+            lines += [f"src/unit_{index}.c:{rng.randrange(1, 900)}:5: warning: unused variable 'tmp' [-Wunused-variable]",
+                      "    int tmp = 0;", "        ^~~"]
+    lines += ["src/main.c:12:10: fatal error: config.h: No such file or directory", "compilation terminated.",
+              "make: *** [Makefile:40: build/main.o] Error 1"]
+    return "\n".join(lines) + "\n"
+
+
+def server_log(rng: random.Random, requests: int = 30000) -> str:
+    lines = []
+    for index in range(requests):
+        lines.append(f"2026-01-01 12:{index // 600 % 60:02d}:{index // 10 % 60:02d} INFO GET /api/items/{rng.randrange(999)} 200 "
+                     f"{rng.randrange(1, 40)}ms")
+        if index % 5000 == 4999:
+            lines.append(f"2026-01-01 12:00:00 ERROR upstream timeout after {rng.randrange(30, 60)}s")
+    return "\n".join(lines) + "\n"
+
+
+GENERATED = {"pytest": pytest_log, "install": install_log, "build": build_log, "server": server_log}
+
+
+def measure(name: str, text: str) -> dict:
+    started = time.perf_counter()
+    condenser = LogCondenser()
+    for start in range(0, len(text), READ_CHUNK_BYTES):
+        condenser.feed(text[start:start + READ_CHUNK_BYTES])
+    output = condenser.getvalue()
+    seconds = time.perf_counter() - started
+    input_bytes, output_bytes = len(text.encode("utf-8")), len(output.encode("utf-8"))
+    return {"log": name, "input_bytes": input_bytes, "output_bytes": output_bytes,
+            "ratio": round(input_bytes / max(1, output_bytes), 1), "seconds": round(seconds, 3),
+            "mb_per_s": round(input_bytes / (1024 * 1024) / max(seconds, 1e-9), 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure compression ratio and throughput of the log condenser.")
+    parser.add_argument("--corpus", nargs="*", default=[], help="additional .log files to condense")
+    parser.add_argument("--seed", type=int, default=1, help="seed for the generated logs")
+    parser.add_argument("--no-record", action="store_true", help=f"don't append the results to {RESULTS_FILE}")
+    args = parser.parse_args()
+
+    record = {"timestamp": time.time(), "python": platform.python_version(), "platform": sys.platform, "logs": []}
+    corpus = [(name, generate(random.Random(args.seed))) for name, generate in GENERATED.items()]
+    for path in args.corpus:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            corpus.append((os.path.basename(path), f.read()))
+    for name, text in corpus:
+        result = measure(name, text)
+        record["logs"].append(result)
+        print(f"{name:12} {result['input_bytes'] / 1024:9.1f} KiB -> {result['output_bytes'] / 1024:7.1f} KiB  "
+              f"ratio {result['ratio']:7.1f}x  {result['mb_per_s']:6.1f} MiB/s")
+
+    if not args.no_record:
+        os.makedirs(os.path.dirname(RESULTS_FILE), exist_ok=True)
+        with open(RESULTS_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+        print(f"Appended to {RESULTS_FILE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# Console log memory benchmark: 1M appended lines in LogStore, with and without spill.
+#
+# "list" is the unbounded list of chunks the window kept before LogStore, "store" is
+# LogStore with the default head/tail caps, and "spill" is LogStore with UI_LOG_SPILL's
+# temp file. Each mode runs in a fresh interpreter and reports the peak RSS of the process
+# and the tracemalloc peak of the appends plus rendering the returned logs (getvalue()).
+# The times include tracemalloc's overhead; compare them between modes only.
+# Results are appended to benchmarks/log_store.jsonl.
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+import tracemalloc
+
+from feedback_common import LOG_HEAD_BYTES, LOG_TAIL_BYTES, LogStore
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_FILE = os.path.join(REPO_DIR, "benchmarks", "log_store.jsonl")
+LINE = "[build] compiling module_%07d.c ... ok\n"
+MODES = ["list", "store", "spill"]
+
+
+def peak_rss_mb() -> float:
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024 # bytes on macOS, KiB elsewhere
+    except ImportError:
+        import psutil
+        return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+
+
+def run_mode(mode: str, lines: int) -> dict:
+    baseline_rss = peak_rss_mb()
+    tracemalloc.start()
+    started = time.perf_counter()
+    if mode == "list":
+        chunks = []
+        for index in range(lines):
+            chunks.append(LINE % index)
+        logs = "".join(chunks)
+    else:
+        store = LogStore(LOG_HEAD_BYTES, LOG_TAIL_BYTES, spill=mode == "spill")
+        for index in range(lines):
+            store.append(LINE % index)
+        logs = store.getvalue()
+    elapsed = time.perf_counter() - started
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    result = {"mode": mode, "lines": lines, "seconds": round(elapsed, 3), "returned_bytes": len(logs.encode("utf-8")),
+              "tracemalloc_peak_mb": round(traced_peak / (1024 * 1024), 1),
+              "peak_rss_mb": round(peak_rss_mb(), 1), "baseline_rss_mb": round(baseline_rss, 1)}
+    if mode != "list":
+        result["spill_bytes"] = store.total_bytes if store.spill_file else 0
+        store.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure LogStore memory for a large amount of console output.")
+    parser.add_argument("--lines", type=int, default=1000000, help="lines appended per mode")
+    parser.add_argument("--mode", choices=MODES, help="run a single mode in this interpreter")
+    parser.add_argument("--no-record", action="store_true", help=f"don't append the results to {RESULTS_FILE}")
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args.lines)))
+        return
+
+    record = {"timestamp": time.time(), "python": platform.python_version(), "platform": sys.platform,
+              "head_bytes": LOG_HEAD_BYTES, "tail_bytes": LOG_TAIL_BYTES, "modes": {}}
+    for mode in MODES:
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), "--mode", mode, "--lines", str(args.lines)],
+                                cwd=REPO_DIR, capture_output=True, text=True, check=True).stdout
+        result = record["modes"][mode] = json.loads(output.strip().splitlines()[-1])
+        print(f"{mode:6} {result['seconds']:7.2f} s  tracemalloc peak {result['tracemalloc_peak_mb']:7.1f} MiB  "
+              f"peak RSS {result['peak_rss_mb']:7.1f} MiB (baseline {result['baseline_rss_mb']:.1f})  "
+              f"returned {result['returned_bytes'] / (1024 * 1024):6.1f} MiB")
+
+    if not args.no_record:
+        os.makedirs(os.path.dirname(RESULTS_FILE), exist_ok=True)
+        with open(RESULTS_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+        print(f"Appended to {RESULTS_FILE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# Log transfer benchmark: how a large FeedbackResult gets from a GUI process to the API.
+#
+# "pickle" sends the logs string through the result queue, then encodes the response JSON
+# in one piece (the path used for small results). "handle" uses externalize_logs() in the
+# sender and LogBuffer in the receiver, streaming the JSON body from the mapping (the path
+# used for results above UI_LOG_HANDLE_THRESHOLD). Each mode runs in a fresh interpreter
+# so peak RSS is measured per mode. Results are appended to benchmarks/log_transfer.jsonl.
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+from multiprocessing import Process, Queue as MPQueue
+
+from feedback_common import FeedbackResult, LogBuffer, externalize_logs
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_FILE = os.path.join(REPO_DIR, "benchmarks", "log_transfer.jsonl")
+LINE = "[build] compiling module_%07d.c ... ok\n"
+
+
+def peak_rss_mb() -> float:
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024 # bytes on macOS, KiB elsewhere
+    except ImportError:
+        import psutil
+        return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+
+
+def sender(result_queue: MPQueue, mode: str, size_mb: int):
+    # Stands in for a GUI process handing over its result.
+    lines, size, index = [], 0, 0
+    while size < size_mb * 1024 * 1024:
+        line = LINE % index
+        lines.append(line)
+        size += len(line)
+        index += 1
+    result = FeedbackResult(logs="".join(lines), interactive_feedback="looks good")
+    del lines
+    started = time.perf_counter()
+    if mode == "handle":
+        result = externalize_logs(result)
+    result_queue.put((time.time(), time.perf_counter() - started, result))
+    result_queue.put(peak_rss_mb())
+
+
+def run_mode(mode: str, size_mb: int) -> dict:
+    result_queue = MPQueue()
+    process = Process(target=sender, args=(result_queue, mode, size_mb))
+    process.start()
+    sent_at, externalize_seconds, result = result_queue.get()
+    transfer_seconds = time.time() - sent_at
+    started = time.perf_counter()
+    written = 0
+    with open(os.devnull, "w", encoding="utf-8") as sink:
+        if "logs_handle" in result:
+            buffer = LogBuffer(result.pop("logs_handle"))
+            written += sink.write('{"logs": "')
+            for text in buffer.iter_text():
+                written += sink.write(json.dumps(text)[1:-1])
+            written += sink.write('", "interactive_feedback": %s}' % json.dumps(result["interactive_feedback"]))
+            del buffer
+        else:
+            written += sink.write(json.dumps(result))
+    response_seconds = time.perf_counter() - started
+    sender_peak = result_queue.get()
+    process.join()
+    return {"mode": mode, "size_mb": size_mb, "externalize_s": round(externalize_seconds, 3),
+            "transfer_s": round(transfer_seconds, 3), "response_s": round(response_seconds, 3),
+            "response_bytes": written, "receiver_peak_rss_mb": round(peak_rss_mb(), 1),
+            "sender_peak_rss_mb": round(sender_peak, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare queue pickling with file handles for large logs.")
+    parser.add_argument("--size-mb", type=int, default=100, help="size of the generated logs")
+    parser.add_argument("--mode", choices=["pickle", "handle"], help="run a single mode in this interpreter")
+    parser.add_argument("--no-record", action="store_true", help=f"don't append the results to {RESULTS_FILE}")
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args.size_mb)))
+        return
+
+    record = {"timestamp": time.time(), "python": platform.python_version(), "platform": sys.platform, "modes": {}}
+    for mode in ("pickle", "handle"):
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), "--mode", mode, "--size-mb", str(args.size_mb)],
+                                cwd=REPO_DIR, capture_output=True, text=True, check=True).stdout
+        result = record["modes"][mode] = json.loads(output.strip().splitlines()[-1])
+        print(f"{mode:7} transfer {result['transfer_s']:7.3f} s  response {result['response_s']:7.3f} s  "
+              f"receiver peak {result['receiver_peak_rss_mb']:7.1f} MiB  sender peak {result['sender_peak_rss_mb']:7.1f} MiB")
+
+    if not args.no_record:
+        os.makedirs(os.path.dirname(RESULTS_FILE), exist_ok=True)
+        with open(RESULTS_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+        print(f"Appended to {RESULTS_FILE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# Window startup benchmark: spawn-per-request (UI_WORKER_POOL_SIZE=0) against the pre-warmed pool.
+#
+# Runs the UI server app in this process on Qt's offscreen platform, with every feedback
+# window answering itself as soon as it is shown (patched into the GUI process targets, so
+# Qt is only loaded in the children). For each pool size it reports the time from the
+# request to the window being shown (the feedback_window_shown_seconds metric) and the
+# full round trip, for --runs requests one after another and one burst of --burst
+# concurrent requests. Results are appended to benchmarks/pool.jsonl.
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import tempfile
+import functools
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from fastapi.testclient import TestClient
+
+import feedback_ui
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_FILE = os.path.join(REPO_DIR, "benchmarks", "pool.jsonl")
+GUI_TARGETS = ["process_target_for_gui", "gui_worker_main"]
+ORIGINAL_TARGETS = {name: getattr(feedback_ui, name) for name in GUI_TARGETS}
+
+
+def _auto_submitting(target_name: str, *args):
+    # Runs in the GUI process: every FeedbackUI submits an empty answer once it is shown.
+    import feedback_gui
+    from PySide6.QtCore import QTimer
+    original_init = feedback_gui.FeedbackUI.__init__
+
+    def __init__(self, *init_args, **init_kwargs):
+        original_init(self, *init_args, **init_kwargs)
+        QTimer.singleShot(0, self, self._submit_feedback_and_close)
+    feedback_gui.FeedbackUI.__init__ = __init__
+    ORIGINAL_TARGETS[target_name](*args)
+
+
+def shown_seconds() -> tuple[int, float]:
+    metric = feedback_ui.METRIC_WINDOW_SHOWN
+    with metric.lock:
+        return metric.count, metric.sum
+
+
+def percentile(samples: list[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def measure(pool_size: int, runs: int, burst: int, warmup_seconds: float, project_directory: str) -> dict:
+    feedback_ui.GUI_POOL_SIZE = pool_size
+    with TestClient(feedback_ui.app) as client:
+        time.sleep(warmup_seconds) # Let the pool workers finish setting up their QApplication
+
+        def ask(index: int) -> float:
+            started = time.perf_counter()
+            response = client.post("/run_feedback_ui/", json={"project_directory": project_directory,
+                                                              "prompt": f"pool benchmark {index}", "dedupe": False})
+            response.raise_for_status()
+            return time.perf_counter() - started
+
+        shown, round_trips = [], []
+        for index in range(runs):
+            count, total = shown_seconds()
+            round_trips.append(ask(index))
+            new_count, new_total = shown_seconds()
+            if new_count == count + 1: shown.append(new_total - total)
+
+        count, total = shown_seconds()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=burst) as executor:
+            list(executor.map(ask, range(runs, runs + burst)))
+        burst_seconds = time.perf_counter() - started
+        new_count, new_total = shown_seconds()
+        fallback_spawns = feedback_ui.gui_pool.fallback_spawns if feedback_ui.gui_pool else None
+    return {"pool_size": pool_size,
+            "shown_median_ms": round(statistics.median(shown) * 1000, 1),
+            "shown_p95_ms": round(percentile(shown, 0.95) * 1000, 1),
+            "round_trip_median_ms": round(statistics.median(round_trips) * 1000, 1),
+            "burst_shown_mean_ms": round((new_total - total) / max(1, new_count - count) * 1000, 1),
+            "burst_seconds": round(burst_seconds, 3), "fallback_spawns": fallback_spawns}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare window startup latency with and without the GUI worker pool.")
+    parser.add_argument("--pool-size", type=int, nargs="*", default=[0, 4], help="UI_WORKER_POOL_SIZE values to measure")
+    parser.add_argument("--runs", type=int, default=20, help="sequential requests per pool size")
+    parser.add_argument("--burst", type=int, default=4, help="concurrent requests in the burst")
+    parser.add_argument("--warmup", type=float, default=3.0, help="seconds to wait for the pool to warm up")
+    parser.add_argument("--no-record", action="store_true", help=f"don't append the results to {RESULTS_FILE}")
+    args = parser.parse_args()
+
+    # No history, config store or QSettings of the user's own setup.
+    feedback_ui.HISTORY_DB_PATH = feedback_ui.CONFIG_DB_PATH = ""
+    feedback_ui.SESSION_HOST_MODE = False
+    logging.getLogger("httpx").setLevel(logging.WARNING) # One line per request otherwise
+    for name in GUI_TARGETS:
+        setattr(feedback_ui, name, functools.partial(_auto_submitting, name))
+    record = {"timestamp": time.time(), "python": platform.python_version(), "platform": sys.platform,
+              "runs": args.runs, "burst": args.burst, "results": []}
+    with tempfile.TemporaryDirectory(prefix="bench-pool-") as project_directory:
+        os.environ["XDG_CONFIG_HOME"] = os.path.join(project_directory, ".config")
+        for pool_size in args.pool_size:
+            result = measure(pool_size, args.runs, args.burst, args.warmup if pool_size else 0.0, project_directory)
+            record["results"].append(result)
+            print(f"pool {pool_size:3}  shown median {result['shown_median_ms']:7.1f} ms  p95 {result['shown_p95_ms']:7.1f} ms  "
+                  f"round trip {result['round_trip_median_ms']:7.1f} ms  burst of {args.burst}: shown mean "
+                  f"{result['burst_shown_mean_ms']:7.1f} ms, {result['burst_seconds']:.2f} s")
+
+    if not args.no_record:
+        os.makedirs(os.path.dirname(RESULTS_FILE), exist_ok=True)
+        with open(RESULTS_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+        print(f"Appended to {RESULTS_FILE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# Console rendering benchmark: lines/sec through a headless FeedbackUI.
+#
+# Opens a FeedbackUI on Qt's offscreen platform and feeds it --lines lines of output.
+# "batched" hands them to _enqueue_output() from a producer thread, the way the pipe reader
+# does, and lets output_flush_timer render them (UI_CONSOLE_FLUSH_MS). "per_line" renders
+# every line on the GUI thread as it arrives, as the console did before batching. Reports
+# lines/sec until the last line is on screen and the longest gap of a 5 ms probe timer
+# (how long the GUI thread was unresponsive). Each mode runs in a fresh interpreter.
+# Results are appended to benchmarks/render.jsonl.
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_FILE = os.path.join(REPO_DIR, "benchmarks", "render.jsonl")
+LINE = "[build] compiling module_%07d.c ... ok\n"
+MODES = ["batched", "per_line"]
+PROBE_INTERVAL_MS = 5
+
+
+def run_mode(mode: str, lines: int) -> dict:
+    from PySide6.QtCore import QTimer
+    from feedback_gui import CONSOLE_FLUSH_INTERVAL_MS, FeedbackUI, init_qt_application
+
+    app = init_qt_application()
+    project_directory = tempfile.mkdtemp(prefix="bench-render-")
+    os.environ["XDG_CONFIG_HOME"] = os.path.join(project_directory, ".config") # Keep QSettings out of the user's config
+    ui = FeedbackUI(project_directory, "render benchmark")
+    ui.show()
+    app.processEvents()
+
+    gaps = [0.0]
+    last_tick = [time.perf_counter()]
+
+    def probe():
+        now = time.perf_counter()
+        gaps[0] = max(gaps[0], now - last_tick[0])
+        last_tick[0] = now
+    probe_timer = QTimer()
+    probe_timer.timeout.connect(probe)
+    probe_timer.start(PROBE_INTERVAL_MS)
+
+    produced = threading.Event()
+    finished = {}
+
+    def check_done():
+        with ui._pending_output_lock:
+            pending = bool(ui._pending_output)
+        if produced.is_set() and not pending:
+            finished["at"] = time.perf_counter()
+            app.quit()
+
+    def produce():
+        for index in range(lines):
+            ui._enqueue_output(LINE % index)
+        produced.set()
+
+    started = time.perf_counter()
+    if mode == "batched":
+        ui.output_flush_timer.start()
+        done_timer = QTimer()
+        done_timer.timeout.connect(check_done)
+        done_timer.start(CONSOLE_FLUSH_INTERVAL_MS)
+        threading.Thread(target=produce, daemon=True).start()
+    else:
+        rendered = [0]
+
+        def render_next():
+            # One line per event loop turn, so the probe timer still gets a chance to run.
+            ui._append_log_to_gui(LINE % rendered[0])
+            rendered[0] += 1
+            if rendered[0] == lines:
+                render_timer.stop()
+                produced.set()
+                check_done()
+        render_timer = QTimer()
+        render_timer.timeout.connect(render_next)
+        render_timer.start(0)
+    last_tick[0] = time.perf_counter()
+    app.exec()
+    elapsed = finished["at"] - started
+    probe_timer.stop()
+    blocks = ui.log_text_area.document().blockCount()
+    ui.feedback_result = ui.collected_result("")
+    ui.log_store.close()
+    return {"mode": mode, "lines": lines, "seconds": round(elapsed, 3), "lines_per_second": round(lines / elapsed),
+            "max_gui_stall_ms": round(gaps[0] * 1000, 1), "console_blocks": blocks,
+            "flush_interval_ms": CONSOLE_FLUSH_INTERVAL_MS}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure how fast the feedback window renders command output.")
+    parser.add_argument("--lines", type=int, default=200000, help="lines of output per mode")
+    parser.add_argument("--mode", choices=MODES, nargs="*", default=MODES, help="modes to measure")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--no-record", action="store_true", help=f"don't append the results to {RESULTS_FILE}")
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_mode(args.mode[0], args.lines)))
+        return
+
+    record = {"timestamp": time.time(), "python": platform.python_version(), "platform": sys.platform, "modes": {}}
+    for mode in args.mode:
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", "--mode", mode, "--lines", str(args.lines)],
+                                cwd=REPO_DIR, capture_output=True, text=True, check=True).stdout
+        result = record["modes"][mode] = json.loads(output.strip().splitlines()[-1])
+        print(f"{mode:8} {result['lines_per_second']:10} lines/s  {result['seconds']:7.2f} s  "
+              f"max GUI stall {result['max_gui_stall_ms']:7.1f} ms  console blocks {result['console_blocks']}")
+
+    if not args.no_record:
+        os.makedirs(os.path.dirname(RESULTS_FILE), exist_ok=True)
+        with open(RESULTS_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+        print(f"Appended to {RESULTS_FILE}")
+
+
+if __name__ == "__main__":
+    main()
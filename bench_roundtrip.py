@@ -0,0 +1,150 @@
+# Round-trip overhead of the MCP server's call to the UI server.
+#
+# A stub UI server (a FastAPI app that answers POST /run_feedback_ui/ at once) runs in a
+# separate uvicorn process, on TCP and on a Unix domain socket. Against it the benchmark
+# times the old client, a sync httpx.Client built per call, and the shared keep-alive
+# httpx.AsyncClient of server.py, both one call at a time and with --concurrency calls in
+# flight. Results are appended to benchmarks/roundtrip.jsonl.
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import logging
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+
+import httpx
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_FILE = os.path.join(REPO_DIR, "benchmarks", "roundtrip.jsonl")
+PAYLOAD = {"project_directory": "/tmp/project", "prompt": "round trip benchmark"}
+
+
+def serve(address: str):
+    # The stub UI server; `address` is "tcp:<port>" or "uds:<path>".
+    import uvicorn
+    from fastapi import FastAPI
+
+    app = FastAPI()
+
+    @app.post("/run_feedback_ui/")
+    async def run_feedback_ui(request: dict):
+        return {"logs": "", "interactive_feedback": f"answer to {request['prompt']}"}
+
+    kind, _, target = address.partition(":")
+    if kind == "uds": uvicorn.run(app, uds=target, log_level="warning")
+    else: uvicorn.run(app, host="127.0.0.1", port=int(target), log_level="warning")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_stub(address: str) -> subprocess.Popen:
+    stub = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--serve", address], cwd=REPO_DIR)
+    kind, _, target = address.partition(":")
+    transport = httpx.HTTPTransport(uds=target) if kind == "uds" else None
+    url = "http://localhost/docs" if kind == "uds" else f"http://127.0.0.1:{target}/docs"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            with httpx.Client(transport=transport) as client:
+                client.get(url)
+            return stub
+        except httpx.TransportError:
+            time.sleep(0.05)
+    stub.kill()
+    raise RuntimeError(f"Stub UI server on {address} did not start")
+
+
+def per_call_client(url: str, uds: str | None, calls: int) -> list[float]:
+    # The client before the shared AsyncClient: a new sync Client (and connection) per tool call.
+    samples = []
+    for _ in range(calls):
+        started = time.perf_counter()
+        with httpx.Client(timeout=3600.0, transport=httpx.HTTPTransport(uds=uds) if uds else None) as client:
+            client.post(url, json=PAYLOAD).raise_for_status()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+async def shared_client(url: str, uds: str | None, calls: int, concurrency: int) -> list[float]:
+    import server
+    logging.getLogger("httpx").setLevel(logging.WARNING) # server.py logs every request at INFO
+    server.API_UDS, server._http_client = uds, None
+    client = server.get_http_client()
+    samples = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def call():
+        async with semaphore:
+            started = time.perf_counter()
+            (await client.post(url, json=PAYLOAD)).raise_for_status()
+            samples.append(time.perf_counter() - started)
+    await client.post(url, json=PAYLOAD) # Open the keep-alive connection
+    await asyncio.gather(*(call() for _ in range(calls)))
+    await client.aclose()
+    return samples
+
+
+def summarize(samples: list[float], wall_seconds: float) -> dict:
+    ordered = sorted(samples)
+    return {"median_us": round(statistics.median(ordered) * 1e6, 1),
+            "p99_us": round(ordered[min(len(ordered) - 1, int(0.99 * len(ordered)))] * 1e6, 1),
+            "calls_per_second": round(len(samples) / wall_seconds, 1)}
+
+
+def measure(client: str, transport: str, url: str, uds: str | None, calls: int, concurrency: int) -> dict:
+    started = time.perf_counter()
+    if client == "per_call": samples = per_call_client(url, uds, calls)
+    else: samples = asyncio.run(shared_client(url, uds, calls, concurrency))
+    return {"client": client, "transport": transport, "concurrency": concurrency if client == "shared" else 1,
+            **summarize(samples, time.perf_counter() - started)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time MCP server -> UI server round trips against a stub UI server.")
+    parser.add_argument("--calls", type=int, default=2000, help="calls per client and transport")
+    parser.add_argument("--concurrency", type=int, default=16, help="calls in flight for the concurrent shared-client run")
+    parser.add_argument("--serve", help=argparse.SUPPRESS)
+    parser.add_argument("--no-record", action="store_true", help=f"don't append the results to {RESULTS_FILE}")
+    args = parser.parse_args()
+    if args.serve:
+        serve(args.serve)
+        return
+
+    record = {"timestamp": time.time(), "python": platform.python_version(), "platform": sys.platform,
+              "httpx": httpx.__version__, "calls": args.calls, "results": []}
+    with tempfile.TemporaryDirectory(prefix="bench-roundtrip-") as directory:
+        port, socket_path = free_port(), os.path.join(directory, "ui.sock")
+        transports = [("tcp", f"tcp:{port}", f"http://localhost:{port}/run_feedback_ui/", None)]
+        if hasattr(socket, "AF_UNIX"):
+            transports.append(("uds", f"uds:{socket_path}", "http://localhost/run_feedback_ui/", socket_path))
+        for transport, address, url, uds in transports:
+            stub = start_stub(address)
+            try:
+                for client, concurrency in (("per_call", 1), ("shared", 1), ("shared", args.concurrency)):
+                    result = measure(client, transport, url, uds, args.calls, concurrency)
+                    record["results"].append(result)
+                    print(f"{transport:3}  {client:8}  concurrency {result['concurrency']:3}  median {result['median_us']:8.1f} us  "
+                          f"p99 {result['p99_us']:8.1f} us  {result['calls_per_second']:8.1f} calls/s")
+            finally:
+                stub.terminate()
+                stub.wait()
+
+    if not args.no_record:
+        os.makedirs(os.path.dirname(RESULTS_FILE), exist_ok=True)
+        with open(RESULTS_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+        print(f"Appended to {RESULTS_FILE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# Startup benchmark for the two entry points (feedback_ui.py and server.py).
+#
+# Each module is imported in a fresh interpreter with `python -X importtime`; the
+# benchmark records the module's cumulative import time, the total import time of the
+# interpreter, the resident set size right after the import and whether PySide6 was
+# loaded. Results are appended to benchmarks/startup.jsonl so they can be tracked over
+# time (run `just bench-startup` before and after a change and compare the last lines).
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+
+import psutil
+
+ENTRY_POINTS = ["feedback_ui", "server"]
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_FILE = os.path.join(REPO_DIR, "benchmarks", "startup.jsonl")
+
+# Imports the module, reports whether Qt came with it, then waits so the parent can sample RSS.
+PROBE = (
+    "import sys, {module}\n"
+    "qt = any(name.split('.')[0] == 'PySide6' for name in sys.modules)\n"
+    "sys.stdout.write('ready %d\\n' % qt); sys.stdout.flush()\n"
+    "sys.stdin.read()\n"
+)
+
+
+def parse_importtime(stderr_text: str, module: str) -> tuple[float, float]:
+    # Lines look like "import time:      self [us] |  cumulative | imported package".
+    module_us, total_us = 0.0, 0.0
+    for line in stderr_text.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        total_us += float(self_us)
+        if name.strip() == module:
+            module_us = float(cumulative_us)
+    return module_us / 1000.0, total_us / 1000.0
+
+
+def measure_once(module: str) -> dict:
+    with tempfile.TemporaryFile(mode="w+") as stderr_file:
+        started = time.perf_counter()
+        probe = subprocess.Popen(
+            [sys.executable, "-X", "importtime", "-c", PROBE.format(module=module)],
+            cwd=REPO_DIR, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=stderr_file, text=True)
+        ready = probe.stdout.readline().split()
+        wall_ms = (time.perf_counter() - started) * 1000.0
+        if not ready or ready[0] != "ready":
+            probe.kill()
+            probe.wait()
+            stderr_file.seek(0)
+            raise RuntimeError(f"Importing {module} failed:\n{stderr_file.read()[-2000:]}")
+        rss_bytes = psutil.Process(probe.pid).memory_info().rss
+        probe.stdin.close()
+        probe.wait()
+        stderr_file.seek(0)
+        module_ms, total_ms = parse_importtime(stderr_file.read(), module)
+    return {"import_ms": module_ms, "total_import_ms": total_ms, "wall_ms": wall_ms,
+            "rss_mb": rss_bytes / (1024 * 1024), "qt_loaded": ready[1] == "1"}
+
+
+def measure(module: str, runs: int) -> dict:
+    samples = [measure_once(module) for _ in range(runs)]
+    result = {key: round(statistics.median(s[key] for s in samples), 2)
+              for key in ("import_ms", "total_import_ms", "wall_ms", "rss_mb")}
+    result["qt_loaded"] = any(s["qt_loaded"] for s in samples)
+    return result
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import time and RSS of the UI server and MCP server.")
+    parser.add_argument("--runs", type=int, default=5, help="imports per entry point; the median is reported")
+    parser.add_argument("--no-record", action="store_true", help=f"don't append the results to {RESULTS_FILE}")
+    args = parser.parse_args()
+
+    record = {"timestamp": time.time(), "revision": git_revision(), "python": platform.python_version(),
+              "platform": sys.platform, "runs": args.runs, "entry_points": {}}
+    for module in ENTRY_POINTS:
+        result = record["entry_points"][module] = measure(module, args.runs)
+        print(f"{module:12} import {result['import_ms']:8.1f} ms  total {result['total_import_ms']:8.1f} ms  "
+              f"rss {result['rss_mb']:7.1f} MiB  qt {'yes' if result['qt_loaded'] else 'no'}")
+
+    if not args.no_record:
+        os.makedirs(os.path.dirname(RESULTS_FILE), exist_ok=True)
+        with open(RESULTS_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+        print(f"Appended to {RESULTS_FILE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# Watch mode benchmark: idle CPU of ProjectWatcher and time from a file change to its callback.
+#
+# Builds a throwaway git work tree with --files files (100 per directory) plus an ignored
+# build/ directory, then for each backend measures the time to start watching, the CPU the
+# process uses while nothing changes, and over --changes edits the latency from the write
+# to on_change (this includes the debounce). Writes under build/ must not trigger at all.
+# Results are appended to benchmarks/watch.jsonl.
+import os
+import sys
+import json
+import time
+import shutil
+import random
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+import statistics
+
+from feedback_watch import ProjectWatcher
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_FILE = os.path.join(REPO_DIR, "benchmarks", "watch.jsonl")
+FILES_PER_DIRECTORY = 100
+
+
+def build_tree(root: str, files: int):
+    subprocess.run(["git", "init", "-q", root], check=True)
+    with open(os.path.join(root, ".gitignore"), "w") as f:
+        f.write("build/\n")
+    for index in range(files):
+        directory = os.path.join(root, "src", f"pkg_{index // (FILES_PER_DIRECTORY * 100)}", f"mod_{index // FILES_PER_DIRECTORY}")
+        if index % FILES_PER_DIRECTORY == 0: os.makedirs(directory)
+        with open(os.path.join(directory, f"file_{index}.py"), "w") as f:
+            f.write(f"VALUE = {index}\n")
+    os.makedirs(os.path.join(root, "build"))
+
+
+def measure(root: str, backend: str, files: int, idle_seconds: float, changes: int, debounce_seconds: float) -> dict:
+    fired = threading.Event()
+    watcher = ProjectWatcher(root, lambda paths: fired.set(), debounce_seconds=debounce_seconds, backend=backend)
+    started = time.perf_counter()
+    watcher.start()
+    if not watcher.ready.wait(600): raise RuntimeError(f"{backend} watcher did not start")
+    setup_seconds = time.perf_counter() - started
+
+    cpu_before, wall_before = time.process_time(), time.perf_counter()
+    time.sleep(idle_seconds)
+    idle_cpu_share = (time.process_time() - cpu_before) / (time.perf_counter() - wall_before)
+
+    rng = random.Random(1)
+    latencies = []
+    for _ in range(changes):
+        index = rng.randrange(files)
+        path = os.path.join(root, "src", f"pkg_{index // (FILES_PER_DIRECTORY * 100)}", f"mod_{index // FILES_PER_DIRECTORY}",
+                            f"file_{index}.py")
+        fired.clear()
+        written = time.perf_counter()
+        with open(path, "a") as f:
+            f.write("# changed\n")
+        if not fired.wait(120): raise RuntimeError(f"{backend} watcher missed a change")
+        latencies.append(time.perf_counter() - written)
+        time.sleep(debounce_seconds)
+
+    fired.clear()
+    with open(os.path.join(root, "build", "output.bin"), "a") as f:
+        f.write("ignored\n")
+    ignored_triggered = fired.wait(max(2.0, 3 * max(latencies)))
+    watcher.stop()
+    return {"backend": type(watcher.backend).__name__, "setup_seconds": round(setup_seconds, 3),
+            "idle_cpu_percent": round(idle_cpu_share * 100, 3), "latency_median_ms": round(statistics.median(latencies) * 1000, 1),
+            "latency_max_ms": round(max(latencies) * 1000, 1), "ignored_change_triggered": ignored_triggered}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure idle CPU and change-to-rerun latency of the project watcher.")
+    parser.add_argument("--files", type=int, default=100000, help="files in the generated tree")
+    parser.add_argument("--idle", type=float, default=10.0, help="seconds to measure idle CPU")
+    parser.add_argument("--changes", type=int, default=10, help="file edits to time")
+    parser.add_argument("--debounce-ms", type=float, default=300.0, help="debounce of the watcher")
+    parser.add_argument("--backend", nargs="*", default=["inotify", "poll"], help="backends to measure")
+    parser.add_argument("--no-record", action="store_true", help=f"don't append the results to {RESULTS_FILE}")
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="bench-watch-")
+    record = {"timestamp": time.time(), "python": platform.python_version(), "platform": sys.platform,
+              "files": args.files, "debounce_ms": args.debounce_ms, "backends": []}
+    try:
+        print(f"Creating {args.files} files in {root}...")
+        build_tree(root, args.files)
+        for backend in args.backend:
+            if backend == "inotify" and not sys.platform.startswith("linux"): continue
+            result = measure(root, backend, args.files, args.idle, args.changes, args.debounce_ms / 1000)
+            record["backends"].append(result)
+            print(f"{result['backend']:15} setup {result['setup_seconds']:7.2f} s  idle CPU {result['idle_cpu_percent']:6.2f} %  "
+                  f"change -> callback median {result['latency_median_ms']:7.1f} ms, max {result['latency_max_ms']:7.1f} ms  "
+                  f"ignored change triggered: {result['ignored_change_triggered']}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    if not args.no_record:
+        os.makedirs(os.path.dirname(RESULTS_FILE), exist_ok=True)
+        with open(RESULTS_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+        print(f"Appended to {RESULTS_FILE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+# Opt-in cache of run_command results, keyed by the command, a subset of its environment and
+# a fingerprint of the project tree.
+#
+# In a git work tree the fingerprint is HEAD's tree hash plus `git status` and the stat of
+# every changed or untracked file, so git's own index does the incremental work. Elsewhere
+# the tree is scanned and file contents are hashed, but only for files whose size, mtime or
+# inode changed since the last scan (the per-file index is persisted next to the results).
+# Both skip ignored files and directories such as .env, node_modules and .venv, so the stat of a
+# configured list of such inputs (UI_COMMAND_CACHE_INPUTS) is added to the fingerprint.
+# Results live in one SQLite file shared by GUI processes and the API (WAL mode).
+import os
+import glob
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import logging
+import threading
+import subprocess
+from contextlib import closing
+from typing import Optional, TypedDict, Dict, Tuple
+
+from feedback_common import CommandStats, PROJECT_ENV_FILE, get_command_environment
+
+logger = logging.getLogger("feedback_command_cache")
+
+COMMAND_CACHE_ENABLED = os.environ.get("UI_COMMAND_CACHE", "0").lower() in ("1", "true", "yes")
+COMMAND_CACHE_DB = os.environ.get("UI_COMMAND_CACHE_DB") or os.path.join(
+    os.path.expanduser("~"), ".interactive-feedback-mcp", "command-cache.sqlite3")
+# Environment variables that are part of the key; a change to any of them is a miss.
+COMMAND_CACHE_ENV_KEYS = [key for key in os.environ.get(
+    "UI_COMMAND_CACHE_ENV", "PATH,VIRTUAL_ENV,PYTHONPATH,NODE_ENV,CC,CXX,CFLAGS,GOFLAGS,RUSTFLAGS").split(",") if key]
+# Runs with more output than this (in characters) are not cached.
+COMMAND_CACHE_MAX_OUTPUT = int(os.environ.get("UI_COMMAND_CACHE_MAX_OUTPUT", 4 * 1024 * 1024))
+COMMAND_CACHE_MAX_ENTRIES = 500
+# Trees without git that have more files than this are not fingerprinted (no caching).
+COMMAND_CACHE_MAX_SCAN_FILES = int(os.environ.get("UI_COMMAND_CACHE_MAX_FILES", 200000))
+# Glob patterns (relative to the project) of inputs that git ignores or the scan skips but that
+# change command results: env files, lockfiles, installed dependencies. A directory counts by
+# its own mtime, which changes when entries are added to or removed from it.
+COMMAND_CACHE_INPUTS = [pattern for pattern in os.environ.get(
+    "UI_COMMAND_CACHE_INPUTS", ".env,.env.*,*.lock,*.lockb,package-lock.json,pnpm-lock.yaml,go.sum,requirements*.txt,"
+    "node_modules,node_modules/.package-lock.json,.venv/lib/python*/site-packages,venv/lib/python*/site-packages,"
+    ".venv/Lib/site-packages,venv/Lib/site-packages").split(",") if pattern]
+if PROJECT_ENV_FILE: COMMAND_CACHE_INPUTS.append(glob.escape(PROJECT_ENV_FILE))
+SCAN_SKIP_DIRS = {".git", ".hg", ".svn", "node_modules", "__pycache__", ".venv", "venv", ".tox", ".mypy_cache", ".pytest_cache"}
+GIT_TIMEOUT_SECONDS = 30.0
+HASH_CHUNK_BYTES = 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS command_results (
+    key TEXT PRIMARY KEY,
+    project_directory TEXT NOT NULL,
+    command TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    output BLOB NOT NULL,
+    stats TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    used_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS command_results_used ON command_results (used_at);
+CREATE TABLE IF NOT EXISTS file_index (
+    project_directory TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    PRIMARY KEY (project_directory, path)
+);
+"""
+
+
+class CachedCommand(TypedDict):
+    output: str
+    stats: CommandStats
+    created_at: float
+    fingerprint: str
+
+
+def _git(project_directory: str, *args: str) -> Optional[bytes]:
+    try:
+        completed = subprocess.run(["git", "--no-optional-locks", "-C", project_directory, *args],
+                                   capture_output=True, timeout=GIT_TIMEOUT_SECONDS)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    return completed.stdout if completed.returncode == 0 else None
+
+
+def git_fingerprint(project_directory: str) -> Optional[str]:
+    # None outside a git work tree (or without git).
+    top = _git(project_directory, "rev-parse", "--show-toplevel")
+    if top is None:
+        return None
+    # HEAD's tree covers committed content; status lists everything that differs from it
+    # (staged, unstaged, untracked), and the stat of those files catches further edits that
+    # leave their status line unchanged. Ignored files (build output) don't count.
+    head = _git(project_directory, "rev-parse", "-q", "--verify", "HEAD^{tree}") or b"" # Empty before the first commit
+    status = _git(project_directory, "status", "--porcelain=v1", "-z", "--untracked-files=all", "--no-renames")
+    if status is None:
+        return None
+    root = os.fsdecode(top.strip())
+    digest = hashlib.sha256(head.strip() + b"\0" + status)
+    for record in status.split(b"\0"):
+        if len(record) < 4: continue
+        try:
+            stat = os.stat(os.path.join(root, os.fsdecode(record[3:])))
+            digest.update(f"{stat.st_size}:{stat.st_mtime_ns}\0".encode())
+        except OSError:
+            digest.update(b"-\0")
+    return "git:" + digest.hexdigest()
+
+
+def inputs_fingerprint(project_directory: str) -> str:
+    # Size and mtime of everything COMMAND_CACHE_INPUTS matches, whether or not git or the scan sees it.
+    digest = hashlib.sha256()
+    for pattern in COMMAND_CACHE_INPUTS:
+        for path in sorted(glob.glob(os.path.join(glob.escape(project_directory), pattern))):
+            try: stat = os.stat(path)
+            except OSError: continue
+            digest.update(f"{os.path.relpath(path, project_directory)}\0{stat.st_size}:{stat.st_mtime_ns}\0"
+                          .encode("utf-8", errors="surrogateescape"))
+    return digest.hexdigest()[:16]
+
+
+def _file_digest(path: str) -> Optional[str]:
+    digest = hashlib.blake2b(digest_size=20)
+    try:
+        with open(path, "rb") as f:
+            while chunk := f.read(HASH_CHUNK_BYTES):
+                digest.update(chunk)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+class CommandCache:
+    """Cached command results and the file index used for non-git fingerprints.
+
+    All methods block (fingerprinting runs git or scans the tree); callers run them on
+    a command's own thread. Each call opens its own short-lived connection.
+    """
+
+    def __init__(self, path: str = COMMAND_CACHE_DB, max_output_size: int = COMMAND_CACHE_MAX_OUTPUT):
+        self.path, self.max_output_size = path, max_output_size
+        directory = os.path.dirname(path)
+        if directory: os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30.0)
+
+    def scan_fingerprint(self, project_directory: str) -> Optional[str]:
+        with closing(self._connect()) as connection:
+            known: Dict[str, Tuple[int, int, int, str]] = {
+                path: (size, mtime_ns, inode, digest) for path, size, mtime_ns, inode, digest in connection.execute(
+                    "SELECT path, size, mtime_ns, inode, digest FROM file_index WHERE project_directory = ?",
+                    (project_directory,))}
+            seen: Dict[str, str] = {}
+            changed = []
+            pending = [project_directory]
+            while pending:
+                try: entries = list(os.scandir(pending.pop()))
+                except OSError: continue
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name not in SCAN_SKIP_DIRS: pending.append(entry.path)
+                            continue
+                        if not entry.is_file(follow_symlinks=False): continue
+                        stat = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    if len(seen) >= COMMAND_CACHE_MAX_SCAN_FILES:
+                        return None
+                    path = os.path.relpath(entry.path, project_directory)
+                    previous = known.get(path)
+                    if previous and previous[:3] == (stat.st_size, stat.st_mtime_ns, stat.st_ino):
+                        seen[path] = previous[3]
+                        continue
+                    digest = _file_digest(entry.path)
+                    if digest is None: continue
+                    seen[path] = digest
+                    changed.append((project_directory, path, stat.st_size, stat.st_mtime_ns, stat.st_ino, digest))
+            removed = [(project_directory, path) for path in known.keys() - seen.keys()]
+            if changed or removed:
+                with connection:
+                    connection.executemany("INSERT OR REPLACE INTO file_index VALUES (?, ?, ?, ?, ?, ?)", changed)
+                    connection.executemany("DELETE FROM file_index WHERE project_directory = ? AND path = ?", removed)
+        digest = hashlib.sha256()
+        for path in sorted(seen):
+            digest.update(f"{path}\0{seen[path]}\0".encode("utf-8", errors="surrogateescape"))
+        return "scan:" + digest.hexdigest()
+
+    def fingerprint(self, project_directory: str) -> Optional[str]:
+        tree = git_fingerprint(project_directory) or self.scan_fingerprint(project_directory)
+        return None if tree is None else f"{tree}+{inputs_fingerprint(project_directory)}"
+
+    def key(self, command: str, project_directory: str) -> Optional[Tuple[str, str]]:
+        # (cache key, fingerprint), or None when the tree can't be fingerprinted.
+        project_directory = os.path.normcase(os.path.realpath(project_directory))
+        fingerprint = self.fingerprint(project_directory)
+        if fingerprint is None:
+            return None
+        environment = get_command_environment(project_directory)
+        env_subset = {key: environment.get(key) for key in COMMAND_CACHE_ENV_KEYS}
+        material = json.dumps([command, project_directory, env_subset, fingerprint])
+        return hashlib.sha256(material.encode("utf-8", errors="surrogateescape")).hexdigest(), fingerprint
+
+    def get(self, key: str) -> Optional[CachedCommand]:
+        with closing(self._connect()) as connection:
+            row = connection.execute("SELECT output, stats, created_at, fingerprint FROM command_results WHERE key = ?",
+                                     (key,)).fetchone()
+            if row is None:
+                return None
+            with connection:
+                connection.execute("UPDATE command_results SET used_at = ? WHERE key = ?", (time.time(), key))
+        return CachedCommand(output=zlib.decompress(row[0]).decode("utf-8", errors="replace"), stats=json.loads(row[1]),
+                             created_at=row[2], fingerprint=row[3])
+
+    def put(self, key: str, fingerprint: str, project_directory: str, output: str, stats: CommandStats):
+        now = time.time()
+        with closing(self._connect()) as connection, connection:
+            connection.execute("INSERT OR REPLACE INTO command_results VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                               (key, project_directory, stats["command"], fingerprint,
+                                zlib.compress(output.encode("utf-8", errors="replace"), 6), json.dumps(stats), now, now))
+            connection.execute("DELETE FROM command_results WHERE key NOT IN "
+                               "(SELECT key FROM command_results ORDER BY used_at DESC LIMIT ?)", (COMMAND_CACHE_MAX_ENTRIES,))
+
+
+_command_cache: Optional[CommandCache] = None
+_command_cache_lock = threading.Lock()
+
+
+def get_command_cache() -> Optional[CommandCache]:
+    # The process-wide cache when UI_COMMAND_CACHE is on, opened on first use; None otherwise.
+    global _command_cache, COMMAND_CACHE_ENABLED
+    if not COMMAND_CACHE_ENABLED:
+        return None
+    with _command_cache_lock:
+        if _command_cache is None:
+            try: _command_cache = CommandCache()
+            except Exception:
+                logger.exception("Could not open command cache %s; command caching is disabled.", COMMAND_CACHE_DB)
+                COMMAND_CACHE_ENABLED = False
+        return _command_cache
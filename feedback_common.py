@@ -0,0 +1,798 @@
+# Shared, Qt-free pieces of the UI server: settings, result types, the command
+# environment, the console log store and the GUI process message protocol.
+# Imported by both the API process (feedback_ui.py) and the GUI processes (feedback_gui.py).
+import os
+import re
+import sys
+import mmap
+import codecs
+import weakref
+import tempfile
+import threading
+import time
+import signal
+import psutil
+import subprocess
+import logging
+from typing import Optional, TypedDict, List, Dict, Iterator, Callable, NotRequired
+from collections import deque
+
+logger = logging.getLogger("feedback_common")
+
+# Largest single read from a command's output pipe.
+READ_CHUNK_BYTES = 64 * 1024
+# Console log store: bytes of output kept from the start and from the end of a run;
+# with UI_LOG_SPILL=1 the complete output also goes to a temp file (for full_logs requests).
+LOG_HEAD_BYTES = int(os.environ.get("UI_LOG_HEAD_BYTES", 256 * 1024))
+LOG_TAIL_BYTES = int(os.environ.get("UI_LOG_TAIL_BYTES", 768 * 1024))
+LOG_SPILL = os.environ.get("UI_LOG_SPILL", "0").lower() in ("1", "true", "yes")
+# Logs larger than this don't travel through the result queue: the GUI process leaves them in a
+# temp file and sends only a LogHandle, which the API maps and streams into the response.
+LOG_HANDLE_THRESHOLD_BYTES = int(os.environ.get("UI_LOG_HANDLE_THRESHOLD", 1024 * 1024))
+LOG_BUFFER_CHUNK_BYTES = 1024 * 1024
+
+# Seconds a stopped command's process group gets between SIGTERM and SIGKILL.
+KILL_GRACE_SECONDS = float(os.environ.get("UI_KILL_GRACE_SECONDS", 3.0))
+
+# Optional limits for run_command (0 = no limit). The rlimits are POSIX-only and apply to each
+# process of the command; the timeout covers the whole run and stops its process group like Stop does.
+COMMAND_CPU_SECONDS = int(os.environ.get("UI_COMMAND_CPU_SECONDS", 0))
+COMMAND_MAX_MEMORY_MB = int(os.environ.get("UI_COMMAND_MAX_MEMORY_MB", 0))
+COMMAND_MAX_OPEN_FILES = int(os.environ.get("UI_COMMAND_MAX_OPEN_FILES", 0))
+COMMAND_TIMEOUT_SECONDS = float(os.environ.get("UI_COMMAND_TIMEOUT_SECONDS", 0))
+# How often a running command's process tree is sampled for CPU time and RSS.
+COMMAND_SAMPLE_INTERVAL_SECONDS = float(os.environ.get("UI_COMMAND_SAMPLE_INTERVAL", 0.25))
+# Named commands (several per project, run by a CommandBatch): how many run at once, and how many
+# bytes of each one's output the result keeps (a quarter from the start, the rest from the end).
+COMMAND_PARALLELISM = max(1, int(os.environ.get("UI_COMMAND_PARALLELISM", 4)))
+NAMED_COMMAND_LOG_BYTES = int(os.environ.get("UI_NAMED_COMMAND_LOG_BYTES", 256 * 1024))
+
+# The user environment used for run_command is cached for this long (0 = re-read every run).
+USER_ENV_CACHE_TTL_SECONDS = float(os.environ.get("UI_ENV_CACHE_TTL", 300.0))
+# Optional per-project env file (e.g. ".env") overlaid on the user environment for run_command.
+PROJECT_ENV_FILE = os.environ.get("UI_PROJECT_ENV_FILE", "")
+
+# --- TypedDicts (can also be Pydantic models for FastAPI response) ---
+class LogHandle(TypedDict):
+    path: str # Temp file holding the UTF-8 logs; owned (and unlinked) by the receiving LogBuffer
+    size: int
+
+class CommandStats(TypedDict):
+    command: str
+    exit_code: int
+    duration_seconds: float
+    cpu_seconds: float # User + system time of the whole process tree, sampled
+    peak_rss_bytes: int # Largest combined RSS of the process tree seen while sampling
+    timed_out: bool
+    cached: NotRequired[bool] # Replayed from the command cache; the other fields describe the original run
+    name: NotRequired[str] # Set for named commands
+
+class NamedCommand(TypedDict):
+    name: str
+    command: str
+
+class NamedCommandResult(TypedDict):
+    name: str
+    command: str
+    logs: str # This command's own output, capped to NAMED_COMMAND_LOG_BYTES (or condensed)
+    stats: Optional[CommandStats] # None if it never ran (stopped before its turn, or failed to start)
+
+class FeedbackResult(TypedDict):
+    logs: str 
+    interactive_feedback: str
+    logs_handle: NotRequired[LogHandle] # Large logs handed over as a file; logs is empty then
+    command_stats: NotRequired[List[CommandStats]] # One entry per command run in the window, in order
+    raw_logs: NotRequired[str] # With a condensed log in logs: the log as it would have been without condensing
+    raw_logs_handle: NotRequired[LogHandle]
+    commands: NotRequired[List[NamedCommandResult]] # The last run of the window's named commands, in order
+
+class FeedbackConfig(TypedDict):
+    # A project's command settings, as kept by the config store (feedback_config.py).
+    run_command: str
+    execute_automatically: bool
+    watch_changes: bool # Rerun the commands when project files change (see feedback_watch.py)
+    named_commands: str # "name: command" lines, see parse_named_commands
+    command_section_visible: bool
+
+class WindowState(TypedDict, total=False):
+    geometry: str # Base64 of QWidget.saveGeometry()
+    state: str # Base64 of QMainWindow.saveState()
+
+class FeedbackSettings(TypedDict):
+    project: Optional[FeedbackConfig] # None: not in the config store yet; the GUI migrates it from QSettings
+    project_overrides: NotRequired[Dict[str, object]] # With project None: fields set through the API, applied over QSettings
+    window: Optional[WindowState]
+
+class CommandLimits(TypedDict, total=False):
+    cpu_seconds: int
+    max_memory_bytes: int
+    max_open_files: int
+    timeout_seconds: float
+
+COMMAND_LIMITS = CommandLimits(cpu_seconds=COMMAND_CPU_SECONDS, max_memory_bytes=COMMAND_MAX_MEMORY_MB * 1024 * 1024,
+                               max_open_files=COMMAND_MAX_OPEN_FILES, timeout_seconds=COMMAND_TIMEOUT_SECONDS)
+
+class LogPolicy(TypedDict, total=False):
+    max_log_bytes: int # Cap for the returned logs (head and tail kept, middle elided)
+    full_logs: bool # Return the complete log from the spill file instead (needs UI_LOG_SPILL)
+    condense: bool # Return a LogCondenser summary as logs; the uncondensed log goes to raw_logs
+
+class FeedbackJobOptions(TypedDict, total=False):
+    stream_logs: bool # Send console output over the result queue as it arrives
+    log_policy: LogPolicy
+    settings: FeedbackSettings # From the config store; without it the window reads and writes QSettings
+
+
+# Messages sent from GUI processes over their result MPQueue are (kind, payload) tuples:
+# ("log", str) carries console output as it arrives when live streaming was requested,
+# ("result", FeedbackResult) is always the last message of a job.
+MSG_LOG = "log"
+MSG_RESULT = "result"
+# ("metrics", dict) carries phase timings (see SessionPhaseTimer in feedback_ui.py) and can arrive at any time.
+MSG_METRICS = "metrics"
+# ("config", dict) carries settings changes for the config store: {"project_directory": str,
+# "project": partial FeedbackConfig, "window": WindowState}, each key optional.
+MSG_CONFIG = "config"
+
+
+# Commands run in their own session (POSIX) or process group (Windows), so kill_tree can
+# signal the whole group at once, including descendants forked while it is running.
+if sys.platform == "win32":
+    PROCESS_GROUP_POPEN_KWARGS = {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+else:
+    PROCESS_GROUP_POPEN_KWARGS = {"start_new_session": True}
+
+
+def _process_group_alive(pgid: int) -> bool:
+    try:
+        os.killpg(pgid, 0)
+        return True
+    except ProcessLookupError: return False
+    except PermissionError: return True
+
+
+def _signal_process(proc: psutil.Process, kill: bool):
+    try: proc.kill() if kill else proc.terminate()
+    except psutil.Error: pass
+
+
+def _kill_tree_blocking(pid: int, grace_seconds: float):
+    # Stragglers that left the group (setsid/daemonizing children) are caught by the psutil
+    # snapshot; it is taken before signalling, while they are still our descendants.
+    try:
+        parent = psutil.Process(pid)
+        tree = parent.children(recursive=True) + [parent]
+    except psutil.NoSuchProcess:
+        tree = []
+    if sys.platform == "win32":
+        for proc in tree: _signal_process(proc, kill=True) # TerminateProcess; there is no softer signal
+        psutil.wait_procs(tree, timeout=grace_seconds)
+        return
+    try: os.killpg(pid, signal.SIGTERM)
+    except ProcessLookupError: pass
+    for proc in tree: _signal_process(proc, kill=False)
+    deadline = time.monotonic() + grace_seconds
+    while time.monotonic() < deadline:
+        if not _process_group_alive(pid) and not any(proc.is_running() for proc in tree): return
+        time.sleep(0.05)
+    try: os.killpg(pid, signal.SIGKILL)
+    except ProcessLookupError: pass
+    for proc in tree: _signal_process(proc, kill=True)
+    psutil.wait_procs(tree, timeout=1.0)
+
+
+def kill_tree(process: subprocess.Popen, grace_seconds: Optional[float] = None) -> threading.Thread:
+    """Stops a command started with PROCESS_GROUP_POPEN_KWARGS and everything it spawned.
+
+    Returns immediately: SIGTERM to the process group and the SIGKILL escalation after
+    grace_seconds run on a background thread, so the GUI thread never waits on the
+    command. The thread is not a daemon, so a GUI process that exits right after
+    closing its window still finishes the escalation first.
+    """
+    killer = threading.Thread(target=_kill_tree_blocking, name=f"kill-tree-{process.pid}",
+                              args=(process.pid, KILL_GRACE_SECONDS if grace_seconds is None else grace_seconds))
+    killer.start()
+    return killer
+
+
+def _ulimit_prefix(limits: CommandLimits) -> str:
+    # Shell lines that set the limits before the command runs, so they apply to the shell and
+    # everything it starts. (Not a preexec_fn: that is unsafe in these multi-threaded processes.)
+    if sys.platform == "win32":
+        return ""
+    import resource
+    wanted = [("-t", resource.RLIMIT_CPU, limits.get("cpu_seconds"), 1),
+              ("-v", resource.RLIMIT_AS, limits.get("max_memory_bytes"), 1024), # ulimit -v counts KiB
+              ("-n", resource.RLIMIT_NOFILE, limits.get("max_open_files"), 1)]
+    lines = []
+    for flag, kind, value, unit in wanted:
+        if not value: continue
+        _, hard = resource.getrlimit(kind)
+        if hard != resource.RLIM_INFINITY: value = min(value, hard) # Only root may raise the hard limit
+        # Sets the soft and the hard limit; a command that can't be limited is not run.
+        lines.append(f"ulimit {flag} {max(1, value // unit)} || exit 125\n")
+    return "".join(lines)
+
+
+def start_command(command: str, project_directory: str, limits: Optional[CommandLimits] = None) -> subprocess.Popen:
+    # stderr is merged into stdout so one reader thread drains a single pipe in raw chunks.
+    # The command gets its own process group so Stop/close can signal all of it at once.
+    return subprocess.Popen(
+        _ulimit_prefix(COMMAND_LIMITS if limits is None else limits) + command, shell=True, cwd=project_directory,
+        stdout=subprocess.PIPE, stderr=subprocess.STDOUT, env=get_command_environment(project_directory),
+        bufsize=0, **PROCESS_GROUP_POPEN_KWARGS)
+
+
+class CommandMonitor:
+    """Resource accounting and the wall-clock timeout for one start_command() process.
+
+    A daemon thread samples the process tree every COMMAND_SAMPLE_INTERVAL_SECONDS:
+    combined RSS, and CPU time including descendants the tree already reaped (the
+    children_* times), so short-lived compiler or test processes are still counted.
+    On timeout it reports through on_output and stops the tree with kill_tree().
+    """
+
+    def __init__(self, process: subprocess.Popen, command: str, limits: Optional[CommandLimits] = None,
+                 on_output: Optional[Callable[[str], None]] = None):
+        self.process, self.command = process, command
+        self.timeout_seconds = (COMMAND_LIMITS if limits is None else limits).get("timeout_seconds") or 0
+        self.on_output = on_output
+        self.started_at = time.monotonic()
+        self.cpu_seconds = 0.0
+        self.peak_rss_bytes = 0
+        self.timed_out = False
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name=f"command-monitor-{process.pid}", daemon=True)
+        self.thread.start()
+
+    def _sample(self):
+        try:
+            root = psutil.Process(self.process.pid)
+            tree = [root] + root.children(recursive=True)
+        except psutil.Error:
+            return
+        cpu, rss = 0.0, 0
+        for proc in tree:
+            try:
+                with proc.oneshot():
+                    times = proc.cpu_times()
+                    cpu += times.user + times.system + getattr(times, "children_user", 0.0) + getattr(times, "children_system", 0.0)
+                    rss += proc.memory_info().rss
+            except psutil.Error: pass # Exited (or a zombie) between listing and sampling
+        self.cpu_seconds = max(self.cpu_seconds, cpu)
+        self.peak_rss_bytes = max(self.peak_rss_bytes, rss)
+
+    def _run(self):
+        while True:
+            self._sample()
+            elapsed = time.monotonic() - self.started_at
+            if self.timeout_seconds and elapsed >= self.timeout_seconds and not self.timed_out:
+                self.timed_out = True
+                if self.on_output: self.on_output(f"\nCommand timed out after {self.timeout_seconds:g} s; stopping it.\n")
+                kill_tree(self.process)
+            if self.stopped.wait(COMMAND_SAMPLE_INTERVAL_SECONDS): return
+
+    def finish(self, exit_code: int) -> CommandStats:
+        # Called once the process has been reaped.
+        self.stopped.set()
+        self.thread.join()
+        return CommandStats(command=self.command, exit_code=exit_code,
+                            duration_seconds=round(time.monotonic() - self.started_at, 3),
+                            cpu_seconds=round(self.cpu_seconds, 3), peak_rss_bytes=self.peak_rss_bytes,
+                            timed_out=self.timed_out)
+
+
+def describe_command_stats(stats: CommandStats) -> str:
+    # The console line shown when a command ends.
+    text = (f"Process exited with code {stats['exit_code']} after {stats['duration_seconds']:.1f} s "
+            f"(CPU {stats['cpu_seconds']:.1f} s, peak RSS {stats['peak_rss_bytes'] / (1024 * 1024):.1f} MiB)")
+    text += ", timed out" if stats["timed_out"] else ""
+    return text + (", cached result" if stats.get("cached") else "")
+
+
+def pump_process_output(process: subprocess.Popen, on_output: Callable[[str], None]) -> int:
+    """Feeds a start_command() process's output to on_output until EOF, then reaps it.
+
+    Blocking; runs on a reader thread. Reads whatever is available (up to
+    READ_CHUNK_BYTES) per syscall and decodes incrementally, so multi-byte characters
+    split across reads are kept intact. Returns the exit code.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+    fd = process.stdout.fileno()
+    try:
+        while True:
+            data = os.read(fd, READ_CHUNK_BYTES)
+            if not data: break
+            text = decoder.decode(data)
+            if text: on_output(text)
+        text = decoder.decode(b"", final=True)
+        if text: on_output(text)
+    except Exception as e: on_output(f"Error reading output: {e}\n")
+    finally:
+        process.stdout.close()
+    # EOF means the command (and anything that inherited its output) is done.
+    return process.wait()
+
+
+class CommandRun:
+    """One run of a command from the feedback window: cache lookup, process, output and stats.
+
+    start() returns at once. A thread then either replays a cached result (when a cache
+    is given and holds one for the current project tree) or starts the command, pumps
+    its output to on_output and stores the result in the cache. on_finished gets the
+    CommandStats, or None if the command could not be started; both callbacks run on
+    that thread. cache is a feedback_command_cache.CommandCache (or anything with its
+    key/get/put methods).
+    """
+
+    def __init__(self, command: str, project_directory: str, on_output: Callable[[str], None],
+                 on_finished: Callable[[Optional[CommandStats]], None], cache=None):
+        self.command, self.project_directory = command, project_directory
+        self.on_output, self.on_finished = on_output, on_finished
+        self.cache = cache
+        self.process: Optional[subprocess.Popen] = None
+        self.stopped = False
+
+    def start(self):
+        threading.Thread(target=self._run, name="command-run", daemon=True).start()
+
+    def stop(self):
+        # Safe from any thread; a run that is still fingerprinting never starts its process.
+        self.stopped = True
+        if self.process: kill_tree(self.process) # Returns at once; SIGTERM -> SIGKILL escalation runs in the background
+
+    def _lookup(self):
+        try:
+            cache_key = self.cache.key(self.command, self.project_directory)
+            return cache_key, (self.cache.get(cache_key[0]) if cache_key else None)
+        except Exception as e:
+            logger.warning("Command cache lookup failed, running the command: %s", e)
+            return None, None
+
+    def _run(self):
+        cache_key, cached = self._lookup() if self.cache is not None else (None, None)
+        if self.stopped:
+            self.on_finished(None)
+            return
+        if cached:
+            stats = CommandStats(**cached["stats"], cached=True)
+            when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(cached["created_at"]))
+            self.on_output(f"[cached result of the run at {when}: same command, environment and project tree]\n")
+            self.on_output(cached["output"])
+            self.on_finished(stats)
+            return
+        try:
+            process = start_command(self.command, self.project_directory)
+        except Exception as e:
+            self.on_output(f"Error running command: {str(e)}\n")
+            self.on_finished(None)
+            return
+        self.process = process
+        if self.stopped: kill_tree(process) # Stop arrived while the process was starting
+        monitor = CommandMonitor(process, self.command, on_output=self.on_output)
+        output: Optional[List[str]] = [] if cache_key else None
+        output_size = 0
+
+        def record(text: str):
+            nonlocal output, output_size
+            self.on_output(text)
+            if output is None: return
+            output_size += len(text)
+            if output_size > self.cache.max_output_size: output = None # Too large to cache
+            else: output.append(text)
+
+        stats = monitor.finish(pump_process_output(process, record))
+        if output is not None and not stats["timed_out"] and not self.stopped:
+            try: self.cache.put(cache_key[0], cache_key[1], self.project_directory, "".join(output), stats)
+            except Exception as e: logger.warning("Could not store command result in the cache: %s", e)
+        self.on_finished(stats)
+
+
+_NAMED_COMMAND_PATTERN = re.compile(r"^([\w.-]+)\s*:\s*(\S.*)$")
+
+
+def parse_named_commands(text: str) -> List[NamedCommand]:
+    # One "name: command" per line; blank lines and # comments are skipped. A line without a
+    # name is named after its first word, and repeated names get a numeric suffix.
+    commands: List[NamedCommand] = []
+    names = set()
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"): continue
+        match = _NAMED_COMMAND_PATTERN.match(line)
+        name, command = (match.group(1), match.group(2)) if match else (line.split()[0], line)
+        unique_name, suffix = name, 2
+        while unique_name in names:
+            unique_name, suffix = f"{name}-{suffix}", suffix + 1
+        names.add(unique_name)
+        commands.append(NamedCommand(name=unique_name, command=command))
+    return commands
+
+
+class CommandBatch:
+    """Runs named commands concurrently, at most `parallelism` at a time, each as a CommandRun.
+
+    on_output(name, text) gets each command's output (starting with its "$ command"
+    line), on_finished(name, stats) is called once per command: with its CommandStats,
+    or None for one that was stopped before its turn or failed to start. Both are called
+    from the runs' threads (or from stop()'s caller for commands that never started).
+    """
+
+    def __init__(self, commands: List[NamedCommand], project_directory: str,
+                 on_output: Callable[[str, str], None], on_finished: Callable[[str, Optional[CommandStats]], None],
+                 cache=None, parallelism: int = COMMAND_PARALLELISM):
+        self.project_directory = project_directory
+        self.on_output, self.on_finished = on_output, on_finished
+        self.cache, self.parallelism = cache, max(1, parallelism)
+        self.pending = deque(commands)
+        self.runs: Dict[str, CommandRun] = {}
+        self.stopped = False
+        self.lock = threading.Lock()
+
+    def start(self):
+        with self.lock:
+            for _ in range(self.parallelism): self._start_next()
+
+    def _start_next(self):
+        # With self.lock held.
+        if self.stopped or not self.pending: return
+        named = self.pending.popleft()
+        name = named["name"]
+        self.on_output(name, f"$ {named['command']}\n")
+        run = self.runs[name] = CommandRun(named["command"], self.project_directory, lambda text: self.on_output(name, text),
+                                           lambda stats: self._finished(name, stats), cache=self.cache)
+        run.start()
+
+    def _finished(self, name: str, stats: Optional[CommandStats]):
+        if stats: stats["name"] = name
+        with self.lock:
+            self.runs.pop(name, None)
+            self._start_next()
+        self.on_finished(name, stats)
+
+    def stop(self):
+        with self.lock:
+            self.stopped = True
+            skipped, self.pending = list(self.pending), deque()
+            runs = list(self.runs.values())
+        for run in runs: run.stop()
+        for named in skipped: self.on_finished(named["name"], None)
+
+
+class NamedCommandLog:
+    """What the result keeps of one named command: its capped (or condensed) output and its stats.
+
+    Not thread-safe; the window appends to log_store from its own thread. condenser is a
+    feedback_condense.LogCondenser fed the same output, if the log policy asks for one.
+    """
+
+    def __init__(self, named: NamedCommand, condenser=None):
+        self.name, self.command = named["name"], named["command"]
+        head_bytes = NAMED_COMMAND_LOG_BYTES // 4
+        self.log_store = LogStore(head_bytes, NAMED_COMMAND_LOG_BYTES - head_bytes)
+        self.condenser = condenser
+        self.stats: Optional[CommandStats] = None
+
+    def result(self, log_policy: LogPolicy) -> NamedCommandResult:
+        if self.condenser is not None: logs = self.condenser.getvalue()
+        else: logs = self.log_store.getvalue(log_policy.get("max_log_bytes"))
+        return NamedCommandResult(name=self.name, command=self.command, logs=logs, stats=self.stats)
+
+
+def _read_user_environment() -> dict[str, str]:
+    if sys.platform != "win32":
+        return os.environ.copy()
+    import ctypes
+    from ctypes import wintypes
+    advapi32, userenv, kernel32 = ctypes.WinDLL("advapi32"), ctypes.WinDLL("userenv"), ctypes.WinDLL("kernel32")
+    TOKEN_QUERY = 0x0008
+    OpenProcessToken, CreateEnvironmentBlock, DestroyEnvironmentBlock, GetCurrentProcess, CloseHandle = \
+        advapi32.OpenProcessToken, userenv.CreateEnvironmentBlock, userenv.DestroyEnvironmentBlock, \
+        kernel32.GetCurrentProcess, kernel32.CloseHandle
+    OpenProcessToken.argtypes = [wintypes.HANDLE, wintypes.DWORD, ctypes.POINTER(wintypes.HANDLE)]
+    OpenProcessToken.restype = wintypes.BOOL
+    CreateEnvironmentBlock.argtypes = [ctypes.POINTER(ctypes.c_void_p), wintypes.HANDLE, wintypes.BOOL]
+    CreateEnvironmentBlock.restype = wintypes.BOOL
+    DestroyEnvironmentBlock.argtypes = [wintypes.LPVOID]
+    DestroyEnvironmentBlock.restype = wintypes.BOOL
+    GetCurrentProcess.argtypes = []
+    GetCurrentProcess.restype = wintypes.HANDLE
+    CloseHandle.argtypes = [wintypes.HANDLE]
+    CloseHandle.restype = wintypes.BOOL
+    token = wintypes.HANDLE()
+    if not OpenProcessToken(GetCurrentProcess(), TOKEN_QUERY, ctypes.byref(token)):
+        logger.warning("Failed to open process token, falling back to os.environ.")
+        return os.environ.copy()
+    try:
+        environment = ctypes.c_void_p()
+        if not CreateEnvironmentBlock(ctypes.byref(environment), token, False):
+            logger.warning("Failed to create environment block, falling back to os.environ.")
+            return os.environ.copy()
+        try:
+            # The block is a sequence of NUL-terminated "KEY=VALUE" strings ending with an empty one.
+            # wstring_at() decodes each entry in one call instead of walking it char by char.
+            result, address, char_size = {}, environment.value, ctypes.sizeof(ctypes.c_wchar)
+            while True:
+                current_string = ctypes.wstring_at(address)
+                if not current_string: break
+                address += (len(current_string) + 1) * char_size
+                key, sep, value = current_string.partition("=")
+                if sep and key: result[key] = value
+            return result
+        finally: DestroyEnvironmentBlock(environment)
+    finally: CloseHandle(token)
+
+
+_user_environment_cache: Optional[tuple[float, dict[str, str]]] = None
+_user_environment_lock = threading.Lock()
+
+def _user_environment_snapshot() -> dict[str, str]:
+    # Shared snapshot; callers must not mutate it. Pool workers inherit it from the
+    # API process when it was warmed up before they were forked.
+    global _user_environment_cache
+    with _user_environment_lock:
+        now = time.monotonic()
+        if _user_environment_cache is None or now - _user_environment_cache[0] > USER_ENV_CACHE_TTL_SECONDS:
+            _user_environment_cache = (now, _read_user_environment())
+        return _user_environment_cache[1]
+
+def get_user_environment() -> dict[str, str]:
+    return dict(_user_environment_snapshot())
+
+def invalidate_user_environment_cache() -> None:
+    global _user_environment_cache
+    with _user_environment_lock:
+        _user_environment_cache = None
+    with _project_env_lock:
+        _project_env_cache.clear()
+
+
+_project_env_cache: dict[str, tuple[tuple[int, int], dict[str, str]]] = {}
+_project_env_lock = threading.Lock()
+
+def _parse_env_file(path: str) -> dict[str, str]:
+    result = {}
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"): continue
+            if line.startswith("export "): line = line[len("export "):].lstrip()
+            key, sep, value = line.partition("=")
+            key, value = key.strip(), value.strip()
+            if not sep or not key: continue
+            if len(value) >= 2 and value[0] == value[-1] and value[0] in ("'", '"'): value = value[1:-1]
+            result[key] = value
+    return result
+
+def get_project_env_overlay(project_directory: str) -> dict[str, str]:
+    # Variables from UI_PROJECT_ENV_FILE (e.g. ".env") in the project; parsed once and
+    # re-read only when the file's mtime or size changes.
+    if not PROJECT_ENV_FILE: return {}
+    path = os.path.join(project_directory, PROJECT_ENV_FILE)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return {}
+    key = (st.st_mtime_ns, st.st_size)
+    with _project_env_lock:
+        cached = _project_env_cache.get(path)
+        if cached and cached[0] == key: return cached[1]
+    try:
+        overlay = _parse_env_file(path)
+    except OSError as e:
+        logger.warning("Could not read project env file %s: %s", path, e)
+        return {}
+    with _project_env_lock:
+        _project_env_cache[path] = (key, overlay)
+    return overlay
+
+def get_command_environment(project_directory: str) -> dict[str, str]:
+    # Environment for run_command: the cached user environment plus the project overlay.
+    base, overlay = _user_environment_snapshot(), get_project_env_overlay(project_directory)
+    if not overlay: return base
+    env = dict(base)
+    env.update(overlay)
+    return env
+
+
+class LogStore:
+    """Byte-capped console log that keeps the head and the tail of the output.
+
+    The first head_bytes of output are kept verbatim, the most recent tail_bytes
+    are kept in a ring of chunks, and everything in between is only counted so
+    the rendered log can say how much was elided. With spill enabled, all output
+    is also appended to a temp file that read_full() maps back in.
+    """
+
+    def __init__(self, head_bytes: int, tail_bytes: int, spill: bool = False):
+        self.head_bytes, self.tail_bytes = head_bytes, tail_bytes
+        self.head: List[str] = []
+        self.head_size = 0
+        self.tail: deque = deque() # (text, byte size) chunks
+        self.tail_size = 0
+        self.elided_bytes = 0
+        self.elided_lines = 0
+        self.total_bytes = 0
+        self.spill_file = tempfile.NamedTemporaryFile(prefix="feedback-log-", suffix=".log", delete=False) if spill else None
+
+    def append(self, text: str):
+        data = text.encode("utf-8", errors="replace")
+        self.total_bytes += len(data)
+        if self.spill_file:
+            self.spill_file.write(data)
+        if self.head_size < self.head_bytes:
+            room = self.head_bytes - self.head_size
+            if len(data) <= room:
+                self.head.append(text)
+                self.head_size += len(data)
+                return
+            head_part = data[:room].decode("utf-8", errors="ignore")
+            self.head.append(head_part)
+            self.head_size = self.head_bytes
+            data = data[len(head_part.encode("utf-8")):]
+            text = data.decode("utf-8", errors="ignore")
+        self.tail.append((text, len(data)))
+        self.tail_size += len(data)
+        while self.tail_size > self.tail_bytes and self.tail:
+            dropped, dropped_size = self.tail.popleft()
+            excess = self.tail_size - self.tail_bytes
+            if dropped_size > excess and not self.tail:
+                # A single oversized chunk: keep its end only.
+                kept = dropped.encode("utf-8")[excess:].decode("utf-8", errors="ignore")
+                self._elide(dropped[:len(dropped) - len(kept)], dropped_size - len(kept.encode("utf-8")))
+                self.tail.append((kept, dropped_size - excess))
+                self.tail_size = dropped_size - excess
+                break
+            self._elide(dropped, dropped_size)
+            self.tail_size -= dropped_size
+
+    def _elide(self, text: str, size: int):
+        self.elided_bytes += size
+        self.elided_lines += text.count("\n")
+
+    def getvalue(self, max_bytes: Optional[int] = None) -> str:
+        head, tail = "".join(self.head), "".join(text for text, _ in self.tail)
+        elided_bytes, elided_lines = self.elided_bytes, self.elided_lines
+        if max_bytes is not None and len(head.encode("utf-8")) + len(tail.encode("utf-8")) > max_bytes:
+            # Re-split the kept output so the returned logs fit in max_bytes.
+            head_data, tail_data = head.encode("utf-8"), tail.encode("utf-8")
+            head_keep = min(len(head_data), max_bytes // 2)
+            tail_keep = min(len(tail_data), max_bytes - head_keep)
+            dropped = head_data[head_keep:] + tail_data[:len(tail_data) - tail_keep]
+            elided_bytes += len(dropped)
+            elided_lines += dropped.count(b"\n")
+            head = head_data[:head_keep].decode("utf-8", errors="ignore")
+            tail = tail_data[len(tail_data) - tail_keep:].decode("utf-8", errors="ignore")
+        if not elided_bytes:
+            return head + tail
+        return f"{head}\n... [{elided_bytes} bytes / {elided_lines} lines of output elided] ...\n{tail}"
+
+    def read_full(self) -> str:
+        if not self.spill_file:
+            return self.getvalue()
+        self.spill_file.flush()
+        if not self.total_bytes:
+            return ""
+        with mmap.mmap(self.spill_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return mapped[:].decode("utf-8", errors="replace")
+
+    def detach_spill(self) -> Optional[LogHandle]:
+        # Hands the complete spilled log over as a file instead of reading it back into memory.
+        if not self.spill_file:
+            return None
+        self.spill_file.close()
+        handle = LogHandle(path=self.spill_file.name, size=self.total_bytes)
+        self.spill_file = None
+        return handle
+
+    def close(self):
+        if self.spill_file:
+            self.spill_file.close()
+            try: os.unlink(self.spill_file.name)
+            except OSError: pass
+            self.spill_file = None
+
+
+def collect_feedback_result(log_store: LogStore, log_policy: LogPolicy, interactive_feedback: str,
+                            command_stats: List[CommandStats], condenser=None,
+                            commands: Optional[List[NamedCommandLog]] = None) -> FeedbackResult:
+    """The result of a feedback window (Qt or browser) as its log policy asks for it.
+
+    logs is the head + tail capped log, the full spilled log, or for a large full log the
+    spill file itself (logs_handle). With a condenser (a feedback_condense.LogCondenser fed
+    the same output), logs is its summary and the uncondensed log moves to raw_logs /
+    raw_logs_handle. commands are the window's named commands, if it ran any.
+    """
+    result = FeedbackResult(logs="", interactive_feedback=interactive_feedback, command_stats=list(command_stats))
+    if commands: result["commands"] = [command.result(log_policy) for command in commands]
+    handle = None
+    if log_policy.get("full_logs") and log_store.total_bytes > LOG_HANDLE_THRESHOLD_BYTES:
+        handle = log_store.detach_spill()
+    if handle:
+        result["logs_handle"] = handle
+    elif log_policy.get("full_logs"):
+        result["logs"] = log_store.read_full()
+    else:
+        result["logs"] = log_store.getvalue(log_policy.get("max_log_bytes"))
+    if condenser is not None:
+        if handle: result["raw_logs_handle"] = result.pop("logs_handle")
+        else: result["raw_logs"] = result["logs"]
+        result["logs"] = condenser.getvalue()
+    return result
+
+
+def _write_log_handle(text: str) -> Optional[LogHandle]:
+    if len(text) * 4 <= LOG_HANDLE_THRESHOLD_BYTES:
+        return None
+    data = text.encode("utf-8", errors="replace")
+    if len(data) <= LOG_HANDLE_THRESHOLD_BYTES:
+        return None
+    with tempfile.NamedTemporaryFile(prefix="feedback-result-", suffix=".log", delete=False) as f:
+        f.write(data)
+    return LogHandle(path=f.name, size=len(data))
+
+
+def externalize_logs(result: FeedbackResult) -> FeedbackResult:
+    # Called in GUI processes right before a result is queued: large logs are written to a
+    # temp file so only a small LogHandle is pickled through the queue.
+    result = FeedbackResult(**result)
+    if "logs_handle" not in result:
+        handle = _write_log_handle(result["logs"])
+        if handle: result["logs"], result["logs_handle"] = "", handle
+    if "raw_logs" in result:
+        handle = _write_log_handle(result["raw_logs"])
+        if handle:
+            del result["raw_logs"]
+            result["raw_logs_handle"] = handle
+    return result
+
+
+def open_log_handles(result: FeedbackResult) -> FeedbackResult:
+    # API side of externalize_logs: maps handed-over files as result["logs_buffer"] / result["raw_logs_buffer"].
+    if "logs_handle" in result:
+        result["logs_buffer"] = LogBuffer(result.pop("logs_handle"))
+    if "raw_logs_handle" in result:
+        result["raw_logs_buffer"] = LogBuffer(result.pop("raw_logs_handle"))
+    return result
+
+
+class LogBuffer:
+    """Read-only memory map of logs a GUI process handed over as a LogHandle.
+
+    The API keeps this instead of a decoded string and streams it into responses in
+    chunks. The mapping is closed and the file unlinked once the last reference (a
+    retained session, the result cache, a response still streaming) goes away.
+    """
+
+    def __init__(self, handle: LogHandle):
+        self.path, self.size = handle["path"], handle["size"]
+        self.mapped: Optional[mmap.mmap] = None
+        try:
+            if self.size:
+                with open(self.path, "rb") as f:
+                    self.mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        finally:
+            weakref.finalize(self, LogBuffer._release, self.mapped, self.path)
+
+    @staticmethod
+    def _release(mapped: Optional[mmap.mmap], path: str):
+        if mapped is not None: mapped.close()
+        try: os.unlink(path)
+        except OSError: pass
+
+    def iter_bytes(self, chunk_bytes: int = LOG_BUFFER_CHUNK_BYTES) -> Iterator[bytes]:
+        if self.mapped is None: return
+        for offset in range(0, self.size, chunk_bytes):
+            yield self.mapped[offset:offset + chunk_bytes]
+
+    def iter_text(self, chunk_bytes: int = LOG_BUFFER_CHUNK_BYTES) -> Iterator[str]:
+        if self.mapped is None: return
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        for chunk in self.iter_bytes(chunk_bytes):
+            text = decoder.decode(chunk)
+            if text: yield text
+        text = decoder.decode(b"", final=True)
+        if text: yield text
+
+    def text(self) -> str:
+        return self.mapped[:].decode("utf-8", errors="replace") if self.mapped is not None else ""
@@ -0,0 +1,289 @@
+# Streaming log condensation: turns a command's raw console output into what an agent needs.
+#
+# LogCondenser is fed output chunks as they arrive and keeps bounded state: the first and
+# last lines of the output and the error/warning blocks in between (with context), after
+# ANSI codes are stripped, progress bars and repeated lines collapsed and repeated stack
+# traces replaced by a reference to the first one. Work per chunk is linear in its size.
+import os
+import re
+import hashlib
+import threading
+from collections import deque
+from typing import Optional, List, Tuple
+
+# Lines kept from the start and from the end of the (cleaned) output.
+CONDENSE_HEAD_LINES = int(os.environ.get("UI_LOG_CONDENSE_HEAD_LINES", 40))
+CONDENSE_TAIL_LINES = int(os.environ.get("UI_LOG_CONDENSE_TAIL_LINES", 80))
+# Lines of context kept around each error or warning line.
+CONDENSE_CONTEXT_LINES = int(os.environ.get("UI_LOG_CONDENSE_CONTEXT", 3))
+# Cap on the lines kept in error/warning blocks; later matches are only counted.
+CONDENSE_MAX_BLOCK_LINES = int(os.environ.get("UI_LOG_CONDENSE_MAX_BLOCK_LINES", 600))
+# Longer lines are cut (minified bundles, base64 blobs, progress bars without newlines).
+CONDENSE_MAX_LINE_CHARS = 2000
+# Stack traces longer than this are passed through instead of buffered for deduplication.
+CONDENSE_MAX_TRACE_LINES = 300
+CONDENSE_MAX_SEEN_TRACES = 1024
+
+ANSI_PATTERN = re.compile(r"\x1b(?:\[[0-?]*[ -/]*[@-~]|\][^\x07\x1b]*(?:\x07|\x1b\\)|[@-Z\\-_])")
+# Progress output: a percentage, a bar of block characters, or a [####    ] / [====>   ] bar.
+PERCENT_PATTERN = re.compile(r"\d\s?%")
+BAR_PATTERN = re.compile(r"[█▉▊▋▌▍▎▏]{2}|\[[#=>.\- ]{5,}\]")
+NUMBER_PATTERN = re.compile(r"\d+")
+ERROR_PATTERN = re.compile(
+    r"\b(?:error|errors|fatal|failed|failure|failures|exception|panic|traceback|segmentation fault|assertionerror)\b"
+    r"|^E\s{2,}|^FAILED\b|^ERROR\b", re.IGNORECASE)
+# Exception class names: ValueError, NullPointerException, ...
+EXCEPTION_NAME_PATTERN = re.compile(r"\b[A-Z]\w*(?:Error|Exception)\b")
+WARNING_PATTERN = re.compile(r"\bwarn(?:ing|ings)?\b|\bdeprecat", re.IGNORECASE)
+# "0 errors", "no failures": summary lines that only look like problems.
+NON_PROBLEM_PATTERN = re.compile(r"\b(?:0|no|zero)\s+(?:errors?|failures?|failed|warnings?)\b", re.IGNORECASE)
+PYTHON_TRACE_START = "Traceback (most recent call last):"
+FRAME_PATTERN = re.compile(r"^\s+(?:at\s|File \")")
+
+
+def strip_ansi(text: str) -> str:
+    return ANSI_PATTERN.sub("", text) if "\x1b" in text else text
+
+
+def _similarity_key(line: str) -> str:
+    # Consecutive lines that differ only in numbers (counters, timestamps, sizes) count as repeats,
+    # and so do consecutive progress lines. The substring checks keep the regexes off most lines.
+    if ("%" in line and PERCENT_PATTERN.search(line)) or (("[" in line or "\u2588" in line) and BAR_PATTERN.search(line)):
+        return "\0progress"
+    return NUMBER_PATTERN.sub("#", line)
+
+
+def _has_problem_hint(lowered: str) -> bool:
+    # Substrings every problem line contains; lines without any skip the regexes. Spelled out
+    # as one expression because this runs for every line.
+    return ("err" in lowered or "fail" in lowered or "fatal" in lowered or "exception" in lowered or "panic" in lowered
+            or "traceback" in lowered or "segmentation" in lowered or "warn" in lowered or "deprecat" in lowered)
+
+
+def _problem_kind(line: str) -> Optional[str]:
+    if not _has_problem_hint(line.lower()) and not line.startswith("E "):
+        return None
+    if NON_PROBLEM_PATTERN.search(line):
+        return None
+    if ERROR_PATTERN.search(line) or EXCEPTION_NAME_PATTERN.search(line):
+        return "error"
+    if WARNING_PATTERN.search(line):
+        return "warning"
+    return None
+
+
+class LogCondenser:
+    """Incremental condenser for console output; feed() chunks, then getvalue().
+
+    Stages run per line in order: line assembly (with carriage-return overwrites
+    resolved), ANSI stripping, collapse of consecutive similar and progress lines,
+    stack trace deduplication, then the bounded sink that keeps head, tail and
+    error/warning blocks with context. getvalue() renders what was fed so far.
+    Both are thread-safe, so command reader threads can do the work instead of the
+    GUI thread or the event loop.
+    """
+
+    def __init__(self, head_lines: int = CONDENSE_HEAD_LINES, tail_lines: int = CONDENSE_TAIL_LINES,
+                 context_lines: int = CONDENSE_CONTEXT_LINES, max_block_lines: int = CONDENSE_MAX_BLOCK_LINES):
+        self.lock = threading.Lock()
+        self.head_lines, self.tail_lines = head_lines, tail_lines
+        self.context_lines, self.max_block_lines = context_lines, max_block_lines
+        self.partial: List[str] = []
+        self.partial_chars = 0
+        self.redraw = False
+        self.input_lines = 0
+        self.input_chars = 0
+        # Repeat collapse: the current run of similar lines as (key, first line, last line, count).
+        self.run: Optional[Tuple[str, Tuple[int, str], Tuple[int, str], int]] = None
+        self.collapsed_lines = 0
+        # Stack trace dedup: frames buffered until the trace ends.
+        self.trace: List[Tuple[int, str]] = []
+        self.trace_is_python = False
+        self.seen_traces: dict = {}
+        self.duplicate_traces = 0
+        # Sink: head, tail and blocks of (output sequence, input line number, text) entries.
+        self.head: List[Tuple[int, int, str]] = []
+        self.tail: deque = deque(maxlen=max(1, tail_lines))
+        self.before: deque = deque(maxlen=max(1, context_lines))
+        self.blocks: List[List[Tuple[int, int, str]]] = []
+        self.block_line_count = 0
+        self.problem_lines: set = set() # Sequences of the block lines that matched (bounded like the blocks)
+        self.after_remaining = 0
+        self.errors = 0
+        self.warnings = 0
+        self.dropped_problem_lines = 0
+        self.output_lines = 0
+
+    # --- Stage 1: line assembly ---
+    def feed(self, text: str):
+        with self.lock:
+            self._feed(text)
+
+    def _feed(self, text: str):
+        self.input_chars += len(text)
+        pieces = text.split("\n")
+        self._add_partial(pieces[0])
+        if len(pieces) == 1:
+            return
+        first = "".join(self.partial)
+        self.partial, self.partial_chars, self.redraw = [], 0, False
+        self.input_lines += 1
+        self._line(self.input_lines, first)
+        for line in pieces[1:-1]:
+            if "\r" in line:
+                # A carriage return redraws the line (progress bars); only the last drawing counts.
+                line = line.rstrip("\r").rpartition("\r")[2]
+            self.input_lines += 1
+            self._line(self.input_lines, line)
+        self._add_partial(pieces[-1])
+
+    def _add_partial(self, piece: str):
+        # Collects an unterminated line across chunks, with the same carriage-return handling.
+        if not piece: return
+        if self.redraw: # The previous piece ended in "\r", so this one draws over it
+            self.partial, self.partial_chars, self.redraw = [], 0, False
+        if "\r" in piece:
+            drawn = piece.rstrip("\r")
+            self.redraw = len(drawn) < len(piece)
+            if "\r" in drawn:
+                self.partial, self.partial_chars = [], 0
+                drawn = drawn.rpartition("\r")[2]
+            piece = drawn
+        room = CONDENSE_MAX_LINE_CHARS - self.partial_chars
+        if room > 0:
+            self.partial.append(piece[:room])
+        self.partial_chars += len(piece)
+
+    # --- Stage 2 and 3: ANSI stripping and repeat collapse ---
+    def _line(self, number: int, line: str):
+        line = strip_ansi(line).rstrip()
+        if len(line) >= CONDENSE_MAX_LINE_CHARS:
+            line = f"{line[:CONDENSE_MAX_LINE_CHARS]}... [line truncated]"
+        # Problem lines only collapse with identical ones: "test_7 FAILED" must not vanish into a
+        # run of "test_N PASSED [ N%]" lines, nor the names of different failing tests into each other.
+        key = line if _problem_kind(line) else _similarity_key(line)
+        if self.run is not None and self.run[0] == key and not self.trace:
+            self.run = (key, self.run[1], (number, line), self.run[3] + 1)
+            return
+        self._flush_run()
+        self.run = (key, (number, line), (number, line), 1)
+        if self.trace or line == PYTHON_TRACE_START or FRAME_PATTERN.match(line):
+            self._flush_run() # Frames are never collapsed; the trace stage sees each one
+
+    def _flush_run(self):
+        if self.run is None: return
+        _, first, last, count = self.run
+        self.run = None
+        self._trace_stage(*first)
+        if count > 2:
+            self.collapsed_lines += count - 2
+            self._trace_stage(first[0], f"... [{count - 2} similar lines collapsed] ...")
+        if count > 1:
+            self._trace_stage(*last)
+
+    # --- Stage 4: stack trace deduplication ---
+    def _trace_stage(self, number: int, line: str):
+        if self.trace:
+            if self.trace_is_python:
+                self.trace.append((number, line))
+                if line[:1] not in (" ", "\t"): # The exception line ends a Python traceback
+                    self._flush_trace()
+                    return
+            elif FRAME_PATTERN.match(line):
+                self.trace.append((number, line))
+            else:
+                self._flush_trace()
+                self._sink(number, line)
+                return
+            if len(self.trace) > CONDENSE_MAX_TRACE_LINES:
+                self._flush_trace(dedupe=False)
+            return
+        if line == PYTHON_TRACE_START or FRAME_PATTERN.match(line):
+            self.trace = [(number, line)]
+            self.trace_is_python = line == PYTHON_TRACE_START
+            return
+        self._sink(number, line)
+
+    def _flush_trace(self, dedupe: bool = True):
+        trace, self.trace = self.trace, []
+        if not trace: return
+        # Frames plus the exception type identify a trace; messages (ids, values) may differ.
+        frames = [line for _, line in trace if line[:1] in (" ", "\t")]
+        exception = trace[-1][1].split(":", 1)[0] if self.trace_is_python else ""
+        digest = hashlib.sha1("\n".join(frames + [exception]).encode("utf-8", errors="replace")).hexdigest()
+        first_seen = self.seen_traces.get(digest) if dedupe else None
+        if first_seen is not None:
+            self.duplicate_traces += 1
+            summary = trace[-1][1] if self.trace_is_python else f"{len(frames)} stack frames"
+            self._sink(trace[0][0], f"[same stack trace as line {first_seen} omitted: {summary}]", problem=True)
+            return
+        if dedupe and len(self.seen_traces) < CONDENSE_MAX_SEEN_TRACES:
+            self.seen_traces[digest] = trace[0][0]
+        for number, line in trace:
+            self._sink(number, line, problem=True) # The whole trace belongs to the error block
+
+    # --- Stage 5: bounded sink with error/warning blocks ---
+    def _sink(self, number: int, line: str, problem: bool = False):
+        # Entries are (output sequence, input line number, text); the sequence decides adjacency.
+        self.output_lines += 1
+        entry = (self.output_lines, number, line)
+        kind = _problem_kind(line)
+        if kind == "error": self.errors += 1
+        elif kind == "warning": self.warnings += 1
+        kind = kind or problem
+        if len(self.head) < self.head_lines:
+            self.head.append(entry)
+            return
+        self.tail.append(entry)
+        if kind and self.block_line_count >= self.max_block_lines:
+            self.dropped_problem_lines += 1
+        elif kind:
+            self._add_to_block(list(self.before) + [entry])
+            self.problem_lines.add(entry[0])
+            self.after_remaining = self.context_lines
+            return
+        elif self.after_remaining > 0 and self.block_line_count < self.max_block_lines:
+            self._add_to_block([entry])
+            self.after_remaining -= 1
+            return
+        self.before.append(entry)
+
+    def _add_to_block(self, entries: List[Tuple[int, int, str]]):
+        # Continues the last block when nothing was skipped in between, else starts a new one.
+        if not self.blocks or entries[0][0] != self.blocks[-1][-1][0] + 1:
+            self.blocks.append([])
+        self.blocks[-1].extend(entries)
+        self.block_line_count += len(entries)
+        self.before.clear()
+
+    def getvalue(self) -> str:
+        with self.lock:
+            return self._render()
+
+    def _render(self) -> str:
+        # Flushes pending lines (an unterminated last line, an open run or trace) first.
+        if self.partial:
+            self.input_lines += 1
+            self._line(self.input_lines, "".join(self.partial))
+            self.partial, self.partial_chars, self.redraw = [], 0, False
+        self._flush_run()
+        self._flush_trace()
+        lines = [f"[condensed log: {self.input_lines} lines in, {self.errors} errors, {self.warnings} warnings; "
+                 f"{self.collapsed_lines} repeated/progress lines collapsed, {self.duplicate_traces} duplicate stack traces omitted; "
+                 "send condense_logs=false or GET /sessions/{session_id}/raw_logs for the raw output]"]
+        lines.extend(line for _, _, line in self.head)
+        if self.output_lines > len(self.head) + len(self.tail):
+            tail_start = self.tail[0][0]
+            blocks = [[entry for entry in block if entry[0] < tail_start] for block in self.blocks]
+            # Context that only leads into the tail is dropped with the rest of its block.
+            blocks = [block for block in blocks if any(entry[0] in self.problem_lines for entry in block)]
+            if blocks:
+                lines.append(f"--- errors and warnings ({sum(len(block) for block in blocks)} lines) ---")
+                for block in blocks:
+                    lines.append(f"@@ line {block[0][1]} @@")
+                    lines.extend(line for _, _, line in block)
+                if self.dropped_problem_lines:
+                    lines.append(f"... [{self.dropped_problem_lines} more error/warning lines not shown] ...")
+            lines.append(f"--- last {len(self.tail)} lines ---")
+        lines.extend(line for _, _, line in self.tail)
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,163 @@
+# Project config store: per-project command settings and the window geometry, in SQLite.
+#
+# The API process owns the store. It loads every row once at startup and serves reads from
+# memory, so starting a window costs no settings I/O: the project's config travels to the
+# GUI process with the job (FeedbackJobOptions["settings"]) and changes come back as
+# MSG_CONFIG messages. Updates only mark rows dirty; a writer thread writes them a moment
+# later in one transaction, so a burst of changes is one write. Projects the store doesn't
+# know yet are migrated from QSettings by the GUI process the first time a window opens for them.
+# A project first configured through PUT /projects/config only holds the fields that were set
+# until then; the migration fills in the rest from QSettings.
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from contextlib import closing
+from typing import Optional, Dict, Set
+
+from feedback_common import FeedbackConfig, WindowState, FeedbackSettings
+
+logger = logging.getLogger("feedback_config")
+
+# Dirty rows are written this long after the first change that made them dirty.
+CONFIG_WRITE_DELAY_SECONDS = 1.0
+# The window geometry is shared by all projects and stored under this name.
+MAIN_WINDOW = "main"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS project_config (
+    project_directory TEXT PRIMARY KEY,
+    config TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    migrated INTEGER NOT NULL DEFAULT 1 -- 0: only the fields set through the API, QSettings not merged yet
+);
+CREATE TABLE IF NOT EXISTS window_state (
+    name TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+DEFAULT_PROJECT_CONFIG = FeedbackConfig(run_command="", execute_automatically=False, watch_changes=False,
+                                        named_commands="", command_section_visible=False)
+
+
+class ConfigStore:
+    """In-memory project configs backed by SQLite, with debounced, batched writes.
+
+    Thread-safe: it is read on the event loop and updated from GUI_WAIT_EXECUTOR threads
+    and the session host router. Keys are normalized project directories.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory: os.makedirs(directory, exist_ok=True)
+        with closing(sqlite3.connect(path, timeout=30.0)) as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+            if "migrated" not in [row[1] for row in connection.execute("PRAGMA table_info(project_config)")]:
+                connection.execute("ALTER TABLE project_config ADD COLUMN migrated INTEGER NOT NULL DEFAULT 1")
+            rows = connection.execute("SELECT project_directory, config, migrated FROM project_config").fetchall()
+            self.projects: Dict[str, FeedbackConfig] = {project_directory: json.loads(config) for project_directory, config, _ in rows}
+            # Projects configured through the API whose QSettings values no window has merged in yet.
+            self.unmigrated: Set[str] = {project_directory for project_directory, _, migrated in rows if not migrated}
+            self.windows: Dict[str, WindowState] = {
+                name: json.loads(state) for name, state in connection.execute("SELECT name, state FROM window_state")}
+        self.lock = threading.Lock()
+        self.dirty_projects: Set[str] = set()
+        self.dirty_windows: Set[str] = set()
+        self.changed = threading.Condition(self.lock)
+        self.closing = False
+        self.writer = threading.Thread(target=self._write_loop, name="config-writer", daemon=True)
+        self.writer.start()
+
+    def project(self, project_directory: str) -> Optional[FeedbackConfig]:
+        # None for a project the store doesn't know (never configured, or not migrated yet).
+        with self.lock:
+            config = self.projects.get(project_directory)
+            return None if config is None else {**DEFAULT_PROJECT_CONFIG, **config}
+
+    def settings(self, project_directory: str) -> FeedbackSettings:
+        # What a GUI process gets with a job for this project. For a project not migrated yet the
+        # GUI reads QSettings and applies the fields set through the API over it.
+        with self.lock:
+            window = self.windows.get(MAIN_WINDOW)
+            if project_directory in self.unmigrated:
+                return FeedbackSettings(project=None, project_overrides=dict(self.projects[project_directory]),
+                                        window=dict(window) if window else None)
+        return FeedbackSettings(project=self.project(project_directory), window=dict(window) if window else None)
+
+    def update(self, project_directory: Optional[str] = None, project: Optional[dict] = None,
+               window: Optional[WindowState] = None) -> Optional[FeedbackConfig]:
+        """Merges changes (any subset of FeedbackConfig's keys) into the stored config and schedules
+        the write; returns the project's new config. A project the store doesn't know yet keeps only
+        the changed fields and stays unmigrated until a window merges its QSettings in (migrate())."""
+        with self.lock:
+            if project_directory is not None and project is not None:
+                if project_directory not in self.projects:
+                    self.projects[project_directory] = {}
+                    self.unmigrated.add(project_directory)
+                self.projects[project_directory].update({key: value for key, value in project.items() if key in DEFAULT_PROJECT_CONFIG})
+                self.dirty_projects.add(project_directory)
+            if window:
+                self.windows[MAIN_WINDOW] = {**self.windows.get(MAIN_WINDOW, {}), **window}
+                self.dirty_windows.add(MAIN_WINDOW)
+            self.changed.notify()
+        return self.project(project_directory) if project_directory is not None else None
+
+    def migrate(self, project_directory: str, project: FeedbackConfig):
+        # A project's QSettings values, read by the first window for it: they fill in what the
+        # store doesn't have; fields already stored (set through the API, or by an earlier
+        # migration) win.
+        with self.lock:
+            if project_directory in self.projects and project_directory not in self.unmigrated: return
+            stored = self.projects.get(project_directory, {})
+            self.projects[project_directory] = {**DEFAULT_PROJECT_CONFIG,
+                                                **{key: value for key, value in project.items() if key in DEFAULT_PROJECT_CONFIG},
+                                                **stored}
+            self.unmigrated.discard(project_directory)
+            self.dirty_projects.add(project_directory)
+            self.changed.notify()
+
+    def apply_message(self, payload: dict):
+        # A MSG_CONFIG payload from a GUI process.
+        if payload.get("migrate"): self.migrate(payload["project_directory"], payload["project"])
+        else: self.update(payload.get("project_directory"), payload.get("project"), payload.get("window"))
+
+    def _take_dirty(self):
+        # With self.lock held.
+        projects = [(d, json.dumps(self.projects[d]), time.time(), d not in self.unmigrated) for d in self.dirty_projects]
+        windows = [(n, json.dumps(self.windows[n]), time.time()) for n in self.dirty_windows]
+        self.dirty_projects, self.dirty_windows = set(), set()
+        return projects, windows
+
+    def _write_loop(self):
+        connection = sqlite3.connect(self.path, timeout=30.0, check_same_thread=False)
+        while True:
+            with self.lock:
+                while not (self.dirty_projects or self.dirty_windows or self.closing):
+                    self.changed.wait()
+                if not self.closing:
+                    # Let the rest of a burst of changes arrive, then write them together.
+                    self.changed.wait_for(lambda: self.closing, timeout=CONFIG_WRITE_DELAY_SECONDS)
+                projects, windows = self._take_dirty()
+                stopping = self.closing
+            try:
+                with connection:
+                    connection.executemany("INSERT OR REPLACE INTO project_config VALUES (?, ?, ?, ?)", projects)
+                    connection.executemany("INSERT OR REPLACE INTO window_state VALUES (?, ?, ?)", windows)
+            except sqlite3.Error:
+                logger.exception("Could not write %d project configs to %s", len(projects), self.path)
+            if stopping:
+                connection.close()
+                return
+
+    def close(self):
+        # Writes what is still dirty and stops the writer.
+        with self.lock:
+            self.closing = True
+            self.changed.notify()
+        self.writer.join(timeout=10.0)
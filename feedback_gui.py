@@ -0,0 +1,947 @@
+# Qt side of the UI server: the feedback window, the session host window and the
+# entry points of GUI processes. Only imported inside GUI processes, never by the API.
+import os
+import sys
+import threading
+import hashlib
+import time
+import traceback
+import logging
+from typing import Optional, List, Callable, Dict
+from multiprocessing import Queue as MPQueue
+
+from PySide6.QtWidgets import (
+    QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
+    QLabel, QLineEdit, QPushButton, QCheckBox, QTextEdit, QPlainTextEdit, QGroupBox, QTabWidget
+)
+from PySide6.QtCore import Qt, Signal, QObject, QTimer, QSettings, QThread, QEvent, QByteArray
+from PySide6.QtGui import QTextCursor, QIcon, QKeyEvent, QFontDatabase, QPalette, QColor
+
+from feedback_common import (
+    LOG_HEAD_BYTES, LOG_TAIL_BYTES, LOG_SPILL, MSG_LOG, MSG_RESULT, MSG_METRICS, MSG_CONFIG, FeedbackSettings, WindowState,
+    COMMAND_PARALLELISM, FeedbackResult, FeedbackConfig, LogPolicy, FeedbackJobOptions, LogStore, externalize_logs,
+    collect_feedback_result, CommandStats, CommandRun, describe_command_stats, NamedCommand, CommandBatch,
+    NamedCommandLog, parse_named_commands,
+)
+from feedback_condense import LogCondenser
+from feedback_command_cache import get_command_cache
+from feedback_watch import ProjectWatcher
+
+logger = logging.getLogger("feedback_gui")
+
+# Console rendering: batched flush interval, and lines kept in the on-screen console.
+CONSOLE_FLUSH_INTERVAL_MS = int(os.environ.get("UI_CONSOLE_FLUSH_MS", 30))
+CONSOLE_MAX_BLOCKS = int(os.environ.get("UI_CONSOLE_MAX_LINES", 5000))
+
+
+# --- Helper Functions (from original script) ---
+def set_dark_title_bar(widget: QWidget, dark_title_bar: bool) -> None:
+    if sys.platform != "win32":
+        return
+    from ctypes import windll, c_uint32, byref
+    build_number = sys.getwindowsversion().build
+    if build_number < 17763:
+        return
+    dark_prop = widget.property("DarkTitleBar")
+    if dark_prop is not None and dark_prop == dark_title_bar:
+        return
+    widget.setProperty("DarkTitleBar", dark_title_bar)
+    dwmapi = windll.dwmapi
+    hwnd = widget.winId()
+    attribute = 20 if build_number >= 18985 else 19
+    c_dark_title_bar = c_uint32(dark_title_bar)
+    dwmapi.DwmSetWindowAttribute(hwnd, attribute, byref(c_dark_title_bar), 4)
+    try:
+        temp_widget = QWidget(None, Qt.FramelessWindowHint | Qt.Tool)
+        temp_widget.resize(1, 1)
+        temp_widget.move(widget.pos().x() - 10000, widget.pos().y() - 10000)
+        temp_widget.show()
+        QTimer.singleShot(50, temp_widget.deleteLater)
+    except Exception as e:
+        logger.debug("Dark title bar redraw hack minor issue: %s", e)
+        pass
+
+
+def get_dark_mode_palette(app: QApplication):
+    darkPalette = app.palette()
+    darkPalette.setColor(QPalette.ColorGroup.Active, QPalette.Window, QColor(53, 53, 53))
+    darkPalette.setColor(QPalette.ColorGroup.Active, QPalette.WindowText, Qt.white)
+    darkPalette.setColor(QPalette.ColorGroup.Disabled, QPalette.WindowText, QColor(127, 127, 127))
+    darkPalette.setColor(QPalette.ColorGroup.Active, QPalette.Base, QColor(42, 42, 42))
+    darkPalette.setColor(QPalette.ColorGroup.Active, QPalette.AlternateBase, QColor(66, 66, 66))
+    darkPalette.setColor(QPalette.ColorGroup.Active, QPalette.ToolTipBase, QColor(53, 53, 53))
+    darkPalette.setColor(QPalette.ColorGroup.Active, QPalette.ToolTipText, Qt.white)
+    darkPalette.setColor(QPalette.ColorGroup.Active, QPalette.Text, Qt.white)
+    darkPalette.setColor(QPalette.ColorGroup.Disabled, QPalette.Text, QColor(127, 127, 127))
+    darkPalette.setColor(QPalette.ColorGroup.Active, QPalette.Dark, QColor(35, 35, 35))
+    darkPalette.setColor(QPalette.ColorGroup.Active, QPalette.Shadow, QColor(20, 20, 20))
+    darkPalette.setColor(QPalette.ColorGroup.Active, QPalette.Button, QColor(53, 53, 53))
+    darkPalette.setColor(QPalette.ColorGroup.Active, QPalette.ButtonText, Qt.white)
+    darkPalette.setColor(QPalette.ColorGroup.Disabled, QPalette.ButtonText, QColor(127, 127, 127))
+    darkPalette.setColor(QPalette.ColorGroup.Active, QPalette.BrightText, Qt.red)
+    darkPalette.setColor(QPalette.ColorGroup.Active, QPalette.Link, QColor(42, 130, 218))
+    darkPalette.setColor(QPalette.ColorGroup.Active, QPalette.Highlight, QColor(42, 130, 218))
+    darkPalette.setColor(QPalette.ColorGroup.Disabled, QPalette.Highlight, QColor(80, 80, 80))
+    darkPalette.setColor(QPalette.ColorGroup.Active, QPalette.HighlightedText, Qt.white)
+    darkPalette.setColor(QPalette.ColorGroup.Disabled, QPalette.HighlightedText, QColor(127, 127, 127))
+    darkPalette.setColor(QPalette.ColorGroup.Active, QPalette.PlaceholderText, QColor(127,127,127))
+    
+    darkPalette.setColor(QPalette.ColorGroup.Inactive, QPalette.Window, QColor(53, 53, 53))
+    darkPalette.setColor(QPalette.ColorGroup.Inactive, QPalette.WindowText, Qt.white)
+    darkPalette.setColor(QPalette.ColorGroup.Inactive, QPalette.Base, QColor(42, 42, 42))
+    darkPalette.setColor(QPalette.ColorGroup.Inactive, QPalette.AlternateBase, QColor(66, 66, 66))
+    darkPalette.setColor(QPalette.ColorGroup.Inactive, QPalette.ToolTipBase, QColor(53, 53, 53))
+    darkPalette.setColor(QPalette.ColorGroup.Inactive, QPalette.ToolTipText, Qt.white)
+    darkPalette.setColor(QPalette.ColorGroup.Inactive, QPalette.Text, Qt.white)
+    darkPalette.setColor(QPalette.ColorGroup.Inactive, QPalette.Button, QColor(53, 53, 53))
+    darkPalette.setColor(QPalette.ColorGroup.Inactive, QPalette.ButtonText, Qt.white)
+    darkPalette.setColor(QPalette.ColorGroup.Inactive, QPalette.Highlight, QColor(42, 130, 218))
+    darkPalette.setColor(QPalette.ColorGroup.Inactive, QPalette.HighlightedText, Qt.white)
+    darkPalette.setColor(QPalette.ColorGroup.Inactive, QPalette.PlaceholderText, QColor(127,127,127))
+    return darkPalette
+
+def get_project_settings_group(project_dir: str) -> str:
+    basename = os.path.basename(os.path.normpath(project_dir))
+    full_hash = hashlib.md5(project_dir.encode('utf-8')).hexdigest()[:8]
+    return f"Project_{basename}_{full_hash}"
+
+def _to_base64(data: QByteArray) -> str:
+    return bytes(data.toBase64()).decode("ascii")
+
+
+class WindowSettings:
+    """Where a FeedbackUI keeps the project's FeedbackConfig and the window geometry.
+
+    With a config store (the job came with settings), values come from the job and
+    changes go to config_sink as MSG_CONFIG payloads. QSettings is then only opened for
+    a project (or geometry) the store doesn't have yet, and what it holds is sent to the
+    store once: that is the migration. Fields set through the API before it (project_overrides)
+    win over QSettings. Without a store, QSettings is read and written as before.
+    """
+
+    # FeedbackConfig keys whose QSettings names differ.
+    QSETTINGS_KEYS = {"command_section_visible": "commandSectionVisible"}
+
+    def __init__(self, project_directory: str, settings: Optional[FeedbackSettings] = None,
+                 config_sink: Optional[Callable[[dict], None]] = None):
+        self.project_directory = project_directory
+        self.project_group_name = get_project_settings_group(project_directory)
+        self.config_sink = config_sink if settings is not None else None
+        self._qsettings: Optional[QSettings] = None
+        project = settings.get("project") if settings else None
+        window = settings.get("window") if settings else None
+        if project is None:
+            project = self._read_project()
+            if self.config_sink: self.config_sink({"project_directory": project_directory, "project": dict(project), "migrate": True})
+            project.update(settings.get("project_overrides", {}) if settings else {})
+        if window is None:
+            window = self._read_window()
+            if window and self.config_sink: self.config_sink({"window": window})
+        self.project: FeedbackConfig = project
+        self.window: WindowState = window
+
+    @property
+    def qsettings(self) -> QSettings:
+        # Opened on first use: parsing the native settings file is what the config store avoids.
+        if self._qsettings is None: self._qsettings = QSettings("InteractiveFeedbackMCP", "InteractiveFeedbackMCP")
+        return self._qsettings
+
+    def _read_project(self) -> FeedbackConfig:
+        settings = self.qsettings
+        settings.beginGroup(self.project_group_name)
+        config = FeedbackConfig(
+            run_command=settings.value("run_command", "", type=str),
+            execute_automatically=settings.value("execute_automatically", False, type=bool),
+            watch_changes=settings.value("watch_changes", False, type=bool),
+            named_commands=settings.value("named_commands", "", type=str),
+            command_section_visible=settings.value("commandSectionVisible", False, type=bool))
+        settings.endGroup()
+        return config
+
+    def _read_window(self) -> WindowState:
+        settings = self.qsettings
+        settings.beginGroup("MainWindow_General")
+        geometry, state = settings.value("geometry"), settings.value("windowState")
+        settings.endGroup()
+        window = WindowState()
+        if isinstance(geometry, QByteArray) and not geometry.isEmpty(): window["geometry"] = _to_base64(geometry)
+        if isinstance(state, QByteArray) and not state.isEmpty(): window["state"] = _to_base64(state)
+        return window
+
+    def save_project(self, **changes):
+        self.project.update(changes)
+        if self.config_sink:
+            self.config_sink({"project_directory": self.project_directory, "project": changes})
+            return
+        settings = self.qsettings
+        settings.beginGroup(self.project_group_name)
+        for key, value in changes.items(): settings.setValue(self.QSETTINGS_KEYS.get(key, key), value)
+        settings.endGroup()
+
+    def geometry(self) -> Optional[QByteArray]:
+        return QByteArray.fromBase64(self.window["geometry"].encode("ascii")) if self.window.get("geometry") else None
+
+    def state(self) -> Optional[QByteArray]:
+        return QByteArray.fromBase64(self.window["state"].encode("ascii")) if self.window.get("state") else None
+
+    def save_window(self, geometry: QByteArray, state: QByteArray):
+        self.window = WindowState(geometry=_to_base64(geometry), state=_to_base64(state))
+        if self.config_sink:
+            self.config_sink({"window": self.window})
+            return
+        settings = self.qsettings
+        settings.beginGroup("MainWindow_General")
+        settings.setValue("geometry", geometry)
+        settings.setValue("windowState", state)
+        settings.endGroup()
+
+
+# --- PySide6 UI Classes ---
+class FeedbackTextEdit(QTextEdit):
+    submitted = Signal()
+    def __init__(self, parent=None): super().__init__(parent)
+    def keyPressEvent(self, event: QKeyEvent):
+        if event.key() == Qt.Key_Return and event.modifiers() == Qt.ControlModifier: self.submitted.emit()
+        else: super().keyPressEvent(event)
+
+def set_window_icon(widget: QWidget) -> None:
+    try:
+        script_dir = os.path.dirname(os.path.abspath(__file__))
+        icon_path = os.path.join(script_dir, "images", "feedback.png")
+        if os.path.exists(icon_path): widget.setWindowIcon(QIcon(icon_path))
+    except Exception as e: logger.warning("Could not load window icon: %s", e)
+
+def create_console_view() -> QPlainTextEdit:
+    view = QPlainTextEdit()
+    view.setReadOnly(True)
+    # Old lines are dropped from the view; the output is still kept by the log store behind it.
+    view.setMaximumBlockCount(CONSOLE_MAX_BLOCKS)
+    fixed_font = QFontDatabase.systemFont(QFontDatabase.SystemFont.FixedFont)
+    fixed_font.setPointSize(9)
+    view.setFont(fixed_font)
+    return view
+
+def append_console_output(view: QPlainTextEdit, text: str):
+    # Only the last CONSOLE_MAX_BLOCKS lines can stay in the view, so a batch with more than that
+    # replaces the view with its tail instead of laying out lines that would be dropped at once.
+    # This bounds the work per flush however fast the command writes.
+    end = len(text)
+    for _ in range(CONSOLE_MAX_BLOCKS):
+        end = text.rfind("\n", 0, end)
+        if end < 0: break
+    if end >= 0:
+        view.setPlainText(text[end + 1:])
+    else:
+        view.moveCursor(QTextCursor.MoveOperation.End)
+        view.insertPlainText(text)
+    view.moveCursor(QTextCursor.MoveOperation.End)
+
+
+class CommandPane:
+    """The output tab of one named command, with the NamedCommandLog that goes into the result.
+
+    Like the main console, run threads only queue output (enqueue); the GUI thread
+    renders it in batches (flush).
+    """
+
+    def __init__(self, named: NamedCommand, condense: bool):
+        self.log = NamedCommandLog(named, LogCondenser() if condense else None)
+        self.view = create_console_view()
+        self._pending: List[str] = []
+        self._pending_lock = threading.Lock()
+
+    def enqueue(self, text: str):
+        if self.log.condenser: self.log.condenser.feed(text)
+        with self._pending_lock:
+            self._pending.append(text)
+
+    def flush(self):
+        with self._pending_lock:
+            if not self._pending: return
+            chunks, self._pending = self._pending, []
+        text = "".join(chunks)
+        self.log.log_store.append(text)
+        append_console_output(self.view, text)
+
+
+class FeedbackUI(QMainWindow):
+    command_finished = Signal(object, object) # CommandRun, CommandStats or None; emitted from the run's thread
+    named_command_finished = Signal(object, str, object) # CommandBatch, name, CommandStats or None; from run threads
+    files_changed = Signal(object, list) # ProjectWatcher, changed paths; emitted from the watcher thread
+    finished = Signal() # emitted once feedback_result is set and the UI is closing
+
+    def __init__(self, project_directory: str, prompt: str, log_sink: Optional[Callable[[str], None]] = None,
+                 log_policy: Optional[LogPolicy] = None, embedded: bool = False,
+                 settings: Optional[FeedbackSettings] = None, config_sink: Optional[Callable[[dict], None]] = None):
+        super().__init__()
+        self.project_directory, self.prompt = project_directory, prompt
+        # Embedded UIs live as tabs of a SessionHostWindow: no own geometry, no app quit on close.
+        self.embedded = embedded
+        # Optional callback that receives console output as it arrives (used for live log streaming).
+        self.log_sink = log_sink
+        self.log_policy: LogPolicy = log_policy or {}
+        self.command_run: Optional[CommandRun] = None
+        # Named commands of the last Run All, by name, and the batch while it runs.
+        self.command_panes: Dict[str, CommandPane] = {}
+        self.command_batch: Optional[CommandBatch] = None
+        self.named_commands_left = 0
+        self.project_watcher: Optional[ProjectWatcher] = None
+        self.log_store = LogStore(LOG_HEAD_BYTES, LOG_TAIL_BYTES, spill=LOG_SPILL)
+        self.command_stats: List[CommandStats] = []
+        self.condenser = LogCondenser() if self.log_policy.get("condense") else None
+        self.feedback_result: Optional[FeedbackResult] = None
+        # Reader threads only collect output here; the GUI thread renders it in batches on
+        # output_flush_timer, so a chatty command costs one repaint per tick, not per line.
+        self._pending_output: List[str] = []
+        self._pending_output_lock = threading.Lock()
+        self.output_flush_timer = QTimer(self)
+        self.output_flush_timer.setInterval(CONSOLE_FLUSH_INTERVAL_MS)
+        self.output_flush_timer.timeout.connect(self._flush_pending_output)
+        self.command_finished.connect(self._on_command_finished)
+        self.named_command_finished.connect(self._on_named_command_finished)
+        self.files_changed.connect(self._on_files_changed)
+        self.setWindowTitle("Interactive Feedback MCP")
+        self.settings = WindowSettings(self.project_directory, settings, config_sink)
+        if embedded: self.setWindowFlags(Qt.Widget)
+        else: self._restore_window_geometry()
+        self.config: FeedbackConfig = FeedbackConfig(**self.settings.project)
+        self._create_ui()
+        command_section_visible = self.config["command_section_visible"]
+        self.command_group.setVisible(command_section_visible)
+        self.toggle_command_button.setText("Hide Command Section" if command_section_visible else "Show Command Section")
+        if not embedded: set_dark_title_bar(self, True)
+        if self.config.get("execute_automatically", False) and self.config.get("run_command"):
+            QTimer.singleShot(100, self._run_command)
+        if self.config.get("execute_automatically", False) and parse_named_commands(self.config["named_commands"]):
+            QTimer.singleShot(100, self._run_all_commands)
+        if self.config["watch_changes"]: self._start_watching()
+        self.feedback_text.setFocus()
+
+    def _restore_window_geometry(self):
+        set_window_icon(self)
+        self.setWindowFlags(self.windowFlags() | Qt.WindowStaysOnTopHint)
+        geometry = self.settings.geometry()
+        if geometry: self.restoreGeometry(geometry)
+        else:
+            self.resize(800, 600)
+            try:
+                screen = QApplication.primaryScreen().geometry()
+                self.move((screen.width() - 800) // 2, (screen.height() - 600) // 2)
+            except AttributeError: logger.warning("Could not get primary screen geometry.")
+        state = self.settings.state()
+        if state: self.restoreState(state)
+
+    def _format_windows_path(self, path: str) -> str:
+        if sys.platform == "win32":
+            path = path.replace("/", "\\")
+            if len(path) >= 2 and path[1] == ":" and path[0].isalpha(): path = path[0].upper() + path[1:]
+        return path
+
+    def _create_ui(self):
+        central_widget = QWidget()
+        self.setCentralWidget(central_widget)
+        main_layout = QVBoxLayout(central_widget)
+        self.toggle_command_button = QPushButton("Show Command Section")
+        self.toggle_command_button.clicked.connect(self._toggle_command_section)
+        main_layout.addWidget(self.toggle_command_button)
+        self.command_group = QGroupBox("Command")
+        command_layout = QVBoxLayout(self.command_group)
+        working_dir_label = QLabel(f"Working directory: {self._format_windows_path(self.project_directory)}")
+        command_layout.addWidget(working_dir_label)
+        command_input_layout = QHBoxLayout()
+        self.command_entry = QLineEdit(self.config["run_command"])
+        self.command_entry.returnPressed.connect(self._run_command)
+        self.command_entry.textChanged.connect(self._update_config_from_ui)
+        self.run_button = QPushButton("&Run")
+        self.run_button.clicked.connect(self._run_command)
+        command_input_layout.addWidget(self.command_entry)
+        command_input_layout.addWidget(self.run_button)
+        command_layout.addLayout(command_input_layout)
+        command_layout.addWidget(QLabel(f"Named commands, one \"name: command\" per line (run {COMMAND_PARALLELISM} at a time):"))
+        named_commands_layout = QHBoxLayout()
+        self.named_commands_entry = QPlainTextEdit(self.config["named_commands"])
+        self.named_commands_entry.setPlaceholderText("lint: ruff check .\ntests: pytest -q\ntypecheck: mypy .")
+        self.named_commands_entry.setMaximumHeight(4 * self.named_commands_entry.fontMetrics().height() + 12)
+        self.run_all_button = QPushButton("Run &All")
+        self.run_all_button.clicked.connect(self._run_all_commands)
+        named_commands_layout.addWidget(self.named_commands_entry)
+        named_commands_layout.addWidget(self.run_all_button, alignment=Qt.AlignTop)
+        command_layout.addLayout(named_commands_layout)
+        auto_layout = QHBoxLayout()
+        self.auto_check = QCheckBox("Execute automatically on next run")
+        self.auto_check.setChecked(self.config.get("execute_automatically", False))
+        self.auto_check.stateChanged.connect(self._update_config_from_ui)
+        self.watch_check = QCheckBox("&Watch for changes and rerun")
+        self.watch_check.setChecked(self.config["watch_changes"])
+        self.watch_check.setToolTip("Stops and reruns the commands when files in the project change (files ignored by git don't count)")
+        self.watch_check.stateChanged.connect(self._toggle_watching)
+        save_button = QPushButton("&Save Configuration")
+        save_button.clicked.connect(self._save_config_to_settings)
+        auto_layout.addWidget(self.auto_check)
+        auto_layout.addWidget(self.watch_check)
+        auto_layout.addStretch()
+        auto_layout.addWidget(save_button)
+        command_layout.addLayout(auto_layout)
+        console_group = QGroupBox("Console")
+        console_layout_internal = QVBoxLayout(console_group)
+        console_group.setMinimumHeight(150)
+        self.log_text_area = create_console_view()
+        # The main console comes first; each named command of the last Run All gets a tab after it.
+        self.output_tabs = QTabWidget()
+        self.output_tabs.addTab(self.log_text_area, "Console")
+        console_layout_internal.addWidget(self.output_tabs)
+        button_layout = QHBoxLayout()
+        self.clear_button = QPushButton("&Clear Logs")
+        self.clear_button.clicked.connect(self.clear_logs_display)
+        button_layout.addStretch()
+        button_layout.addWidget(self.clear_button)
+        console_layout_internal.addLayout(button_layout)
+        command_layout.addWidget(console_group)
+        self.command_group.setVisible(False)  
+        main_layout.addWidget(self.command_group)
+        self.feedback_group = QGroupBox("Feedback")
+        feedback_layout = QVBoxLayout(self.feedback_group)
+        self.description_label = QLabel(self.prompt)
+        self.description_label.setWordWrap(True)
+        feedback_layout.addWidget(self.description_label)
+        self.feedback_text = FeedbackTextEdit()
+        self.feedback_text.submitted.connect(self._submit_feedback_and_close)
+        font_metrics = self.feedback_text.fontMetrics()
+        padding = self.feedback_text.contentsMargins().top() + self.feedback_text.contentsMargins().bottom() + 10
+        self.feedback_text.setMinimumHeight(max(5 * font_metrics.height() + padding, 70))
+        self.feedback_text.setPlaceholderText("Enter your feedback here (Ctrl+Enter to submit, Esc to cancel)")
+        submit_button = QPushButton("&Send Feedback (Ctrl+Enter)")
+        submit_button.clicked.connect(self._submit_feedback_and_close)
+        feedback_layout.addWidget(self.feedback_text)
+        feedback_layout.addWidget(submit_button)
+        main_layout.addWidget(self.feedback_group)
+        contact_label = QLabel('Need to improve? Contact Fábio Ferreira on <a href="https://x.com/fabiomlferreira">X.com</a> or visit <a href="https://dotcursorrules.com/">dotcursorrules.com</a>')
+        contact_label.setOpenExternalLinks(True)
+        contact_label.setAlignment(Qt.AlignCenter)
+        contact_label.setStyleSheet("font-size: 9pt; color: #cccccc;") 
+        main_layout.addWidget(contact_label)
+        central_widget.setLayout(main_layout)
+
+    def _toggle_command_section(self):
+        is_visible = not self.command_group.isVisible()
+        self.command_group.setVisible(is_visible)
+        self.toggle_command_button.setText("Hide Command Section" if is_visible else "Show Command Section")
+        self.config["command_section_visible"] = is_visible
+        self.settings.save_project(command_section_visible=is_visible)
+        self.adjustSize()
+
+    def _update_config_from_ui(self):
+        self.config["run_command"] = self.command_entry.text()
+        self.config["execute_automatically"] = self.auto_check.isChecked()
+        self.config["watch_changes"] = self.watch_check.isChecked()
+        self.config["named_commands"] = self.named_commands_entry.toPlainText()
+
+    def _enqueue_output(self, text: str):
+        # Thread-safe: called from the pipe reader threads, which also do the condensing.
+        if self.condenser: self.condenser.feed(text)
+        with self._pending_output_lock:
+            self._pending_output.append(text)
+
+    def _flush_pending_output(self):
+        for pane in self.command_panes.values(): pane.flush()
+        with self._pending_output_lock:
+            if not self._pending_output: return
+            chunks, self._pending_output = self._pending_output, []
+        text = "".join(chunks)
+        self.log_store.append(text)
+        if self.log_sink:
+            try: self.log_sink(text)
+            except Exception as e: logger.warning("Could not forward log output: %s", e)
+        append_console_output(self.log_text_area, text)
+
+    def _append_log_to_gui(self, text: str):
+        # GUI-thread messages go through the same queue so they stay in order with command output.
+        self._enqueue_output(text)
+        self._flush_pending_output()
+
+    def _on_command_finished(self, run: CommandRun, stats: Optional[CommandStats]):
+        # Delivered (queued) from the run's thread once the command exited (or its cached result was replayed).
+        if stats: self.command_stats.append(stats)
+        if self.command_run is not run: return # A command that was already replaced
+        if not self.command_batch: self.output_flush_timer.stop()
+        if stats: self._append_log_to_gui(f"\n{describe_command_stats(stats)}\n")
+        else: self._flush_pending_output()
+        self.run_button.setText("&Run")
+        self.command_run = None
+        self._watch_run_finished()
+        self.activateWindow()
+        self.feedback_text.setFocus()
+
+    def _run_command(self):
+        if self.command_run:
+            self._append_log_to_gui("Stopping current process...\n")
+            self.command_run.stop()
+            return
+        command_to_run = self.command_entry.text()
+        if not command_to_run:
+            self._append_log_to_gui("Please enter a command to run.\n")
+            return
+        self._append_log_to_gui(f"$ {command_to_run}\n")
+        self.run_button.setText("Sto&p")
+        run = self.command_run = CommandRun(command_to_run, self.project_directory, self._enqueue_output,
+                                            lambda stats: self._emit_command_finished(run, stats), cache=get_command_cache())
+        run.start()
+        self.output_flush_timer.start()
+
+    def _run_all_commands(self):
+        if self.command_batch:
+            self._append_log_to_gui("Stopping named commands...\n")
+            self.command_batch.stop()
+            return
+        named_commands = parse_named_commands(self.named_commands_entry.toPlainText())
+        if not named_commands:
+            self._append_log_to_gui("Please enter named commands to run, one \"name: command\" per line.\n")
+            return
+        # A new Run All replaces the tabs (and results) of the previous one.
+        self._flush_pending_output()
+        for pane in self.command_panes.values():
+            self.output_tabs.removeTab(self.output_tabs.indexOf(pane.view))
+            pane.view.deleteLater()
+        panes = self.command_panes = {named["name"]: CommandPane(named, bool(self.log_policy.get("condense")))
+                                      for named in named_commands}
+        for name, pane in panes.items(): self.output_tabs.addTab(pane.view, name)
+        self._append_log_to_gui(f"Running {len(named_commands)} named commands, up to {COMMAND_PARALLELISM} at a time\n")
+        self.named_commands_left = len(named_commands)
+        self.run_all_button.setText("Stop &All")
+        batch = self.command_batch = CommandBatch(
+            named_commands, self.project_directory, lambda name, text: panes[name].enqueue(text),
+            lambda name, stats: self._emit_named_command_finished(batch, name, stats), cache=get_command_cache())
+        batch.start()
+        self.output_flush_timer.start()
+
+    def _emit_named_command_finished(self, batch: CommandBatch, name: str, stats: Optional[CommandStats]):
+        try: self.named_command_finished.emit(batch, name, stats)
+        except RuntimeError: pass # The window was already closed and deleted
+
+    def _on_named_command_finished(self, batch: CommandBatch, name: str, stats: Optional[CommandStats]):
+        if stats: self.command_stats.append(stats)
+        if self.command_batch is not batch: return # A batch that was already replaced
+        pane = self.command_panes[name]
+        pane.log.stats = stats
+        outcome = describe_command_stats(stats) if stats else "Not run."
+        pane.enqueue(f"\n{outcome}\n")
+        pane.flush()
+        succeeded = stats is not None and stats["exit_code"] == 0
+        self.output_tabs.setTabText(self.output_tabs.indexOf(pane.view), f"{name} {'✓' if succeeded else '✗'}")
+        self._append_log_to_gui(f"[{name}] {outcome}\n")
+        self.named_commands_left -= 1
+        if self.named_commands_left: return
+        self.command_batch = None
+        self.run_all_button.setText("Run &All")
+        if not self.command_run: self.output_flush_timer.stop()
+        self._watch_run_finished()
+        self.activateWindow()
+        self.feedback_text.setFocus()
+
+    def _toggle_watching(self):
+        self._update_config_from_ui()
+        if self.config["watch_changes"]: self._start_watching()
+        else: self._stop_watching()
+
+    def _start_watching(self):
+        if self.project_watcher: return
+        watcher = self.project_watcher = ProjectWatcher(self.project_directory, lambda paths: self._emit_files_changed(watcher, paths))
+        watcher.start()
+        self._append_log_to_gui("Watching the project for changes.\n")
+
+    def _stop_watching(self):
+        if not self.project_watcher: return
+        self.project_watcher.stop()
+        self.project_watcher = None
+
+    def _emit_files_changed(self, watcher: ProjectWatcher, paths: List[str]):
+        try: self.files_changed.emit(watcher, paths)
+        except RuntimeError: pass # The window was already closed and deleted
+
+    def _on_files_changed(self, watcher: ProjectWatcher, paths: List[str]):
+        # Debounced by the watcher: stop whatever is still running (its process group is
+        # killed) and start the configured commands again.
+        if self.project_watcher is not watcher: return
+        shown = ", ".join(paths[:3]) + (f" and {len(paths) - 3} more" if len(paths) > 3 else "")
+        run_single = bool(self.command_entry.text())
+        run_named = bool(parse_named_commands(self.named_commands_entry.toPlainText()))
+        if not run_single and not run_named: return
+        self._append_log_to_gui(f"\nChanged: {shown}; rerunning.\n")
+        watcher.run_started() # Until _watch_run_finished(), the run's own writes don't count
+        if run_single:
+            if self.command_run:
+                self.command_run.stop()
+                self.command_run = None
+            self._run_command()
+        if run_named:
+            if self.command_batch:
+                self.command_batch.stop()
+                self.command_batch = None
+            self._run_all_commands()
+
+    def _watch_run_finished(self):
+        # Once nothing runs any more, the watcher counts changes again (after a quiet period).
+        if self.project_watcher and not self.command_run and not self.command_batch:
+            self.project_watcher.run_finished()
+
+    def _emit_command_finished(self, run: CommandRun, stats: Optional[CommandStats]):
+        # Notifies the GUI thread once the command is done instead of having it poll.
+        try: self.command_finished.emit(run, stats)
+        except RuntimeError: pass # The window was already closed and deleted
+
+    def collected_logs(self) -> str:
+        # The logs field as requested by the log policy: head/tail capped, or the full spilled log.
+        self._flush_pending_output()
+        if self.log_policy.get("full_logs"):
+            return self.log_store.read_full()
+        return self.log_store.getvalue(self.log_policy.get("max_log_bytes"))
+
+    def collected_result(self, interactive_feedback: str) -> FeedbackResult:
+        self._flush_pending_output()
+        return collect_feedback_result(self.log_store, self.log_policy, interactive_feedback, self.command_stats, self.condenser,
+                                       [pane.log for pane in self.command_panes.values()])
+
+    def _submit_feedback_and_close(self):
+        self.feedback_result = self.collected_result(self.feedback_text.toPlainText().strip())
+        self.close()
+
+    def clear_logs_display(self): self.log_text_area.clear()
+
+    def _save_config_to_settings(self):
+        self._update_config_from_ui()
+        self.settings.save_project(run_command=self.config["run_command"], execute_automatically=self.config["execute_automatically"],
+                                   watch_changes=self.config["watch_changes"], named_commands=self.config["named_commands"])
+        self._append_log_to_gui("Configuration saved for this project.\n")
+
+    def keyPressEvent(self, event: QKeyEvent):
+        if event.key() == Qt.Key_Escape and \
+           (not self.feedback_text.hasFocus() or not self.feedback_text.toPlainText().strip()):
+            self.feedback_result = self.collected_result("")
+            self.close()
+            return
+        super().keyPressEvent(event)
+
+    def closeEvent(self, event):
+        if not self.embedded:
+            self.settings.save_window(self.saveGeometry(), self.saveState())
+        if self.command_group.isVisible() != self.settings.project["command_section_visible"]:
+            self.settings.save_project(command_section_visible=self.command_group.isVisible())
+        if self.command_run:
+            self.command_run.stop()
+            self.command_run = None
+        if self.command_batch:
+            self.command_batch.stop()
+            self.command_batch = None
+        self._stop_watching()
+        if self.feedback_result is None:
+            self.feedback_result = self.collected_result("")
+        
+        self.finished.emit()
+        app_instance = QApplication.instance()
+        if app_instance and not self.embedded:
+             # This print now happens within the dedicated GUI process's main thread.
+             logger.debug("Quitting QApplication from FeedbackUI.closeEvent() in process %s, Qt thread %s.", os.getpid(), QThread.currentThread())
+             app_instance.quit()
+        super().closeEvent(event)
+
+# --- Core Function to Run UI (This will run IN THE SEPARATE PROCESS) ---
+def init_qt_application() -> Optional[QApplication]:
+    # QApplication *must* be created in the main thread of the GUI process.
+    # Pool workers call this once at startup; the spawn-per-request path calls it per request.
+    app_for_this_process = QApplication.instance()
+    if app_for_this_process is not None:
+        # This should ideally not happen if it's a fresh process, but safety check.
+        logger.warning("QApplication.instance() already exists in new process %s before creation. This is unexpected. Reusing.", os.getpid())
+    else:
+        logger.debug("Creating new QApplication in process %s, Qt thread %s.", os.getpid(), QThread.currentThread())
+        app_for_this_process = QApplication([])
+
+    if app_for_this_process:
+        app_for_this_process.setPalette(get_dark_mode_palette(app_for_this_process))
+        app_for_this_process.setStyle("Fusion")
+    return app_for_this_process
+
+
+def run_feedback_window(app_for_this_process: QApplication, project_directory: str, prompt: str,
+                        log_sink: Optional[Callable[[str], None]] = None,
+                        log_policy: Optional[LogPolicy] = None,
+                        metrics_sink: Optional[Callable[[dict], None]] = None,
+                        settings: Optional[FeedbackSettings] = None,
+                        config_sink: Optional[Callable[[dict], None]] = None) -> FeedbackResult:
+    # Shows one FeedbackUI on an already initialized QApplication and blocks until it is closed.
+    ui_instance = None
+    try:
+        ui_instance = FeedbackUI(project_directory, prompt, log_sink=log_sink, log_policy=log_policy,
+                                 settings=settings, config_sink=config_sink)
+        ui_instance.show()
+        if metrics_sink: metrics_sink({"window_shown_at": time.time()})
+        
+        logger.debug("Calling exec() on QApplication in process %s, Qt thread %s.", os.getpid(), QThread.currentThread())
+        app_for_this_process.exec() 
+        if metrics_sink: metrics_sink({"window_closed_at": time.time()})
+        logger.debug("QApplication.exec() finished in process %s, Qt thread %s.", os.getpid(), QThread.currentThread())
+
+    except Exception as e_ui:
+        error_during_ui = f"Error during UI execution in process {os.getpid()}, Qt thread {QThread.currentThread()}: {e_ui}"
+        # Log the traceback for better debugging
+        logger.exception(error_during_ui)
+        tb_str = traceback.format_exc()
+        error_during_ui += f"\nTraceback:\n{tb_str}"
+        
+        log_output = error_during_ui
+        if ui_instance and hasattr(ui_instance, 'log_store'): # Check if log_store exists
+             log_output += "\n" + ui_instance.collected_logs()
+        
+        # Ensure feedback_result is set on ui_instance if ui_instance exists, even if it's an error one
+        if ui_instance:
+            ui_instance.feedback_result = FeedbackResult(logs=log_output, interactive_feedback="")
+        else: # if ui_instance itself failed to create
+             return FeedbackResult(logs=log_output, interactive_feedback="")
+
+
+    finally:
+        # Cleanup UI instance
+        if ui_instance:
+            # ui_instance.close() # closeEvent already calls quit, which stops exec. Explicit close might be redundant or cause issues if already closing.
+            ui_instance.deleteLater() 
+            logger.debug("Scheduled ui_instance.deleteLater() in process %s, Qt thread %s.", os.getpid(), QThread.currentThread())
+            # Process events to allow deleteLater to occur before process exits (or before a
+            # pool worker takes its next job, so widget trees don't accumulate).
+            app_for_this_process.processEvents()
+            QApplication.sendPostedEvents(None, QEvent.Type.DeferredDelete)
+            if ui_instance.feedback_result is not None:
+                ui_instance.log_store.close() # Logs are already rendered into the result
+
+
+    # Result should be set by FeedbackUI.closeEvent or by the exception handler above
+    result = ui_instance.feedback_result if ui_instance and ui_instance.feedback_result is not None else None
+    
+    if result:
+        logger.debug("UI interaction completed in process %s. Result: Logs - %s chars, Feedback - '%s'", os.getpid(), len(result['logs']), result['interactive_feedback'])
+        return result
+    else:
+        # This case means feedback_result was None even after normal closure or handled exception.
+        # This should be rare if closeEvent and exception handling are correct.
+        warning_msg = f"WARNING: UI in process {os.getpid()} closed without providing a result (feedback_result is None after exec). Fallback."
+        logger.warning(warning_msg)
+        # Try to get logs if ui_instance exists
+        final_logs = warning_msg
+        if ui_instance and hasattr(ui_instance, 'log_store'):
+            final_logs += "\nCollected Logs:\n" + ui_instance.collected_logs()
+            ui_instance.log_store.close()
+
+        return FeedbackResult(logs=final_logs, interactive_feedback="")
+
+
+def execute_feedback_ui_in_process(project_directory: str, prompt: str,
+                                   log_sink: Optional[Callable[[str], None]] = None,
+                                   log_policy: Optional[LogPolicy] = None,
+                                   metrics_sink: Optional[Callable[[dict], None]] = None,
+                                   settings: Optional[FeedbackSettings] = None,
+                                   config_sink: Optional[Callable[[dict], None]] = None) -> FeedbackResult:
+    # This function is the target for the new process.
+    # It will have its own Python interpreter space (mostly) and can create its own QApplication.
+    logger.debug("execute_feedback_ui_in_process called in PID %s, Python thread %s, Qt thread %s", os.getpid(), threading.get_ident(), QThread.currentThread())
+    
+    init_started = time.perf_counter()
+    app_for_this_process = init_qt_application()
+    if metrics_sink: metrics_sink({"qt_init_seconds": time.perf_counter() - init_started})
+    if not app_for_this_process:
+        # Should not happen if creation is successful.
+        critical_error_msg = f"CRITICAL ERROR: QApplication could not be initialized in process {os.getpid()}."
+        logger.critical(critical_error_msg)
+        # This return will be put into the MPQueue by the process_target_for_gui
+        return FeedbackResult(logs=critical_error_msg, interactive_feedback="")
+
+    return run_feedback_window(app_for_this_process, project_directory, prompt, log_sink, log_policy, metrics_sink,
+                               settings, config_sink)
+
+
+def _queue_log_sink(result_mp_queue: MPQueue) -> Callable[[str], None]:
+    return lambda text: result_mp_queue.put((MSG_LOG, text))
+
+
+def _queue_metrics_sink(result_mp_queue: MPQueue) -> Callable[[dict], None]:
+    return lambda sample: result_mp_queue.put((MSG_METRICS, sample))
+
+
+def _queue_config_sink(result_mp_queue: MPQueue) -> Callable[[dict], None]:
+    return lambda change: result_mp_queue.put((MSG_CONFIG, change))
+
+
+def _queue_result(result_mp_queue: MPQueue, feedback_data: FeedbackResult):
+    result_mp_queue.put((MSG_METRICS, {"result_sent_at": time.time()}))
+    result_mp_queue.put((MSG_RESULT, externalize_logs(feedback_data)))
+
+
+# This function will be the target for the multiprocessing.Process
+def process_target_for_gui(project_dir: str, prompt_str: str, result_mp_queue: MPQueue,
+                           options: Optional[FeedbackJobOptions] = None):
+    # This function runs in the new process.
+    # It calls execute_feedback_ui_in_process which manages its own QApplication specific to this process.
+    logger.debug("process_target_for_gui started in PID %s, Python thread %s. About to call Qt logic.", os.getpid(), threading.get_ident())
+    try:
+        feedback_data = execute_feedback_ui_in_process(
+            project_directory=project_dir,
+            prompt=prompt_str,
+            log_sink=_queue_log_sink(result_mp_queue) if options and options.get("stream_logs") else None,
+            log_policy=options.get("log_policy") if options else None,
+            metrics_sink=_queue_metrics_sink(result_mp_queue),
+            settings=options.get("settings") if options else None,
+            config_sink=_queue_config_sink(result_mp_queue)
+        )
+        _queue_result(result_mp_queue, feedback_data)
+    except Exception as e_proc_target:
+        # Catch-all for unexpected errors within the process target function itself
+        # (though execute_feedback_ui_in_process should also catch its own errors)
+        tb_str = traceback.format_exc()
+        error_msg = f"CRITICAL ERROR in GUI Process {os.getpid()} (process_target_for_gui): {str(e_proc_target)}\nTraceback:\n{tb_str}"
+        logger.critical(error_msg)
+        result_mp_queue.put((MSG_RESULT, FeedbackResult(logs=error_msg, interactive_feedback="")))
+    finally:
+        logger.debug("process_target_for_gui finished in PID %s. Result (or error) placed in MPQueue.", os.getpid())
+
+
+# Target for long-lived pool workers: QApplication, palette and style are set up once,
+# then (project_directory, prompt, FeedbackJobOptions) jobs are taken from job_mp_queue until max_jobs is reached.
+def gui_worker_main(job_mp_queue: MPQueue, result_mp_queue: MPQueue, max_jobs: int):
+    logger.debug("gui_worker_main started in PID %s, Python thread %s.", os.getpid(), threading.get_ident())
+    init_started = time.perf_counter()
+    app_for_this_process = init_qt_application()
+    # Picked up by whichever request waits on this worker first.
+    result_mp_queue.put((MSG_METRICS, {"qt_init_seconds": time.perf_counter() - init_started}))
+    if not app_for_this_process:
+        logger.critical("QApplication could not be initialized in worker %s.", os.getpid())
+        return
+    jobs_done = 0
+    while max_jobs <= 0 or jobs_done < max_jobs:
+        job = job_mp_queue.get()
+        if job is None: # Shutdown sentinel
+            break
+        project_dir, prompt_str, options = job
+        try:
+            feedback_data = run_feedback_window(app_for_this_process, project_dir, prompt_str,
+                                                _queue_log_sink(result_mp_queue) if options.get("stream_logs") else None,
+                                                options.get("log_policy"), _queue_metrics_sink(result_mp_queue),
+                                                options.get("settings"), _queue_config_sink(result_mp_queue))
+        except Exception as e_job:
+            tb_str = traceback.format_exc()
+            error_msg = f"CRITICAL ERROR in GUI worker {os.getpid()} (gui_worker_main): {str(e_job)}\nTraceback:\n{tb_str}"
+            logger.critical(error_msg)
+            feedback_data = FeedbackResult(logs=error_msg, interactive_feedback="")
+        _queue_result(result_mp_queue, feedback_data)
+        jobs_done += 1
+    logger.debug("gui_worker_main in PID %s exiting after %s job(s).", os.getpid(), jobs_done)
+
+
+class SessionHostBridge(QObject):
+    # Hands messages from the job intake thread to the session host's GUI thread (queued).
+    message_received = Signal(object)
+
+
+class SessionHostWindow(QMainWindow):
+    """One window that hosts every pending feedback session of the session host as a tab.
+
+    Each tab is an embedded FeedbackUI; its console output and final result are sent
+    back over event_mp_queue as (session_id, kind, payload) so the API can route them.
+    """
+
+    def __init__(self, event_mp_queue: MPQueue):
+        super().__init__()
+        self.event_mp_queue = event_mp_queue
+        self.sessions: Dict[str, FeedbackUI] = {}
+        self.tabs = QTabWidget()
+        self.tabs.setDocumentMode(True)
+        self.setCentralWidget(self.tabs)
+        self.setWindowTitle("Interactive Feedback MCP")
+        set_window_icon(self)
+        self.setWindowFlags(self.windowFlags() | Qt.WindowStaysOnTopHint)
+        self.resize(800, 600)
+
+    def open_session(self, session_id: str, project_directory: str, prompt: str, options: FeedbackJobOptions):
+        log_sink = None
+        if options.get("stream_logs"):
+            log_sink = lambda text: self.event_mp_queue.put((session_id, MSG_LOG, text))
+        ui = FeedbackUI(project_directory, prompt, log_sink=log_sink, log_policy=options.get("log_policy"), embedded=True,
+                        settings=options.get("settings"),
+                        config_sink=lambda change: self.event_mp_queue.put((session_id, MSG_CONFIG, change)))
+        ui.finished.connect(lambda: self._finish_session(session_id))
+        self.sessions[session_id] = ui
+        index = self.tabs.addTab(ui, os.path.basename(os.path.normpath(project_directory)) or project_directory)
+        self.tabs.setTabToolTip(index, prompt)
+        self.tabs.setCurrentIndex(index)
+        self.setWindowTitle(f"Interactive Feedback MCP ({len(self.sessions)} pending)")
+        if not self.isVisible():
+            self.show()
+            set_dark_title_bar(self, True)
+        self.raise_()
+        self.activateWindow()
+        ui.feedback_text.setFocus()
+        self.event_mp_queue.put((session_id, MSG_METRICS, {"window_shown_at": time.time()}))
+
+    def cancel_session(self, session_id: str):
+        ui = self.sessions.get(session_id)
+        if ui: ui.close() # closeEvent records an empty result and emits finished
+
+    def _finish_session(self, session_id: str):
+        ui = self.sessions.pop(session_id, None)
+        if ui is None: return
+        result = externalize_logs(ui.feedback_result or ui.collected_result(""))
+        ui.log_store.close()
+        self.event_mp_queue.put((session_id, MSG_METRICS, {"window_closed_at": time.time(), "result_sent_at": time.time()}))
+        self.event_mp_queue.put((session_id, MSG_RESULT, result))
+        index = self.tabs.indexOf(ui)
+        if index >= 0: self.tabs.removeTab(index)
+        ui.deleteLater()
+        self.setWindowTitle(f"Interactive Feedback MCP ({len(self.sessions)} pending)")
+        if not self.sessions: self.hide()
+
+    def closeEvent(self, event):
+        # Closing the host window answers every pending session with empty feedback;
+        # the process itself keeps running for the next request.
+        for session_id in list(self.sessions):
+            self.cancel_session(session_id)
+        event.ignore()
+        self.hide()
+
+
+# Target for the session host process: one QApplication that shows every session as a tab.
+# Messages on job_mp_queue: ("open", session_id, project_directory, prompt, options),
+# ("cancel", session_id), or None to shut down.
+def session_host_main(job_mp_queue: MPQueue, event_mp_queue: MPQueue):
+    logger.debug("session_host_main started in PID %s, Python thread %s.", os.getpid(), threading.get_ident())
+    init_started = time.perf_counter()
+    app_for_this_process = init_qt_application()
+    event_mp_queue.put((None, MSG_METRICS, {"qt_init_seconds": time.perf_counter() - init_started}))
+    if not app_for_this_process:
+        logger.critical("QApplication could not be initialized in session host %s.", os.getpid())
+        return
+    app_for_this_process.setQuitOnLastWindowClosed(False)
+    host_window = SessionHostWindow(event_mp_queue)
+    bridge = SessionHostBridge()
+
+    def handle_message(message):
+        if message is None:
+            for session_id in list(host_window.sessions):
+                host_window.cancel_session(session_id)
+            app_for_this_process.quit()
+        elif message[0] == "open":
+            try: host_window.open_session(*message[1:])
+            except Exception as e_open:
+                tb_str = traceback.format_exc()
+                error_msg = f"CRITICAL ERROR in session host {os.getpid()} opening session: {str(e_open)}\nTraceback:\n{tb_str}"
+                logger.critical(error_msg)
+                event_mp_queue.put((message[1], MSG_RESULT, FeedbackResult(logs=error_msg, interactive_feedback="")))
+        elif message[0] == "cancel":
+            host_window.cancel_session(message[1])
+
+    def intake():
+        while True:
+            message = job_mp_queue.get()
+            bridge.message_received.emit(message)
+            if message is None: break
+
+    bridge.message_received.connect(handle_message)
+    threading.Thread(target=intake, daemon=True).start()
+    app_for_this_process.exec()
+    logger.debug("session_host_main in PID %s exiting.", os.getpid())
@@ -0,0 +1,194 @@
+# Feedback history: an append-only SQLite log of every feedback session the UI server ran.
+#
+# The API hands finished sessions to HistoryStore.record(), which only enqueues them; a
+# writer thread inserts them in batches (one transaction per batch). Large logs are stored
+# zlib-compressed. Queries open their own short-lived connection, so they can run on any
+# thread while the writer is busy (the database is in WAL mode). After each batch the writer
+# deletes entries past the retention period and the oldest ones beyond the entry cap; SQLite
+# reuses the freed pages, so the file stops growing.
+import os
+import time
+import zlib
+import queue
+import hashlib
+import sqlite3
+import logging
+import threading
+from contextlib import closing
+from typing import Optional, List, Iterator
+
+logger = logging.getLogger("feedback_history")
+
+# Logs larger than this many bytes are stored zlib-compressed.
+HISTORY_COMPRESS_MIN_BYTES = int(os.environ.get("UI_HISTORY_COMPRESS_BYTES", 4096))
+# The writer commits once this many sessions are queued, or after this many seconds.
+HISTORY_BATCH_SIZE = 64
+HISTORY_FLUSH_INTERVAL_SECONDS = 1.0
+HISTORY_MAX_QUERY_LIMIT = 500
+# Entries older than this many days are deleted (0 keeps them).
+HISTORY_RETENTION_DAYS = float(os.environ.get("UI_HISTORY_RETENTION_DAYS", 30))
+# At most this many entries are kept; the oldest go first (0: no cap).
+HISTORY_MAX_ENTRIES = int(os.environ.get("UI_HISTORY_MAX_ENTRIES", 10000))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS feedback_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    project_directory TEXT NOT NULL,
+    prompt TEXT NOT NULL,
+    prompt_hash TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    finished_at REAL,
+    interactive_feedback TEXT,
+    error TEXT,
+    logs BLOB,
+    logs_size INTEGER NOT NULL DEFAULT 0,
+    logs_compressed INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS feedback_history_project ON feedback_history (project_directory, created_at);
+CREATE INDEX IF NOT EXISTS feedback_history_created ON feedback_history (created_at);
+CREATE INDEX IF NOT EXISTS feedback_history_prompt ON feedback_history (prompt_hash, created_at);
+"""
+
+SUMMARY_COLUMNS = ("id", "session_id", "project_directory", "prompt", "prompt_hash", "status", "created_at",
+                   "finished_at", "interactive_feedback", "error", "logs_size")
+
+
+def prompt_hash(prompt: str) -> str:
+    # Whitespace-insensitive, like the request dedup key, so reworded spacing still matches.
+    return hashlib.sha256(" ".join(prompt.split()).encode("utf-8")).hexdigest()
+
+
+def _encode_logs(logs: str, chunks: Optional[Iterator[bytes]] = None) -> tuple[bytes, int, bool]:
+    # chunks (raw UTF-8 bytes) is used for logs that only exist as a LogBuffer mapping.
+    if chunks is None:
+        data = logs.encode("utf-8", errors="replace")
+        if len(data) < HISTORY_COMPRESS_MIN_BYTES:
+            return data, len(data), False
+        return zlib.compress(data, 6), len(data), True
+    compressor, parts, size = zlib.compressobj(6), [], 0
+    for chunk in chunks:
+        size += len(chunk)
+        parts.append(compressor.compress(chunk))
+    parts.append(compressor.flush())
+    return b"".join(parts), size, True
+
+
+class HistoryStore:
+    def __init__(self, path: str, retention_days: float = HISTORY_RETENTION_DAYS, max_entries: int = HISTORY_MAX_ENTRIES):
+        self.path = path
+        self.retention_days = retention_days
+        self.max_entries = max_entries
+        self.pending: queue.SimpleQueue = queue.SimpleQueue()
+        self.written = 0
+        self.failed = 0
+        self.pruned = 0
+        directory = os.path.dirname(path)
+        if directory: os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+            self._prune(connection)
+        self.writer = threading.Thread(target=self._write_loop, name="history-writer", daemon=True)
+        self.writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=30.0)
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    def record(self, entry: dict):
+        """Queues one finished session. Never blocks; the writer thread does the I/O.
+
+        entry has the table's columns, with logs as a str and, for large results, a
+        LogBuffer under "logs_buffer" (kept alive until it has been written).
+        """
+        self.pending.put(entry)
+
+    def _row(self, entry: dict) -> tuple:
+        buffer = entry.get("logs_buffer")
+        logs, logs_size, compressed = _encode_logs(
+            entry.get("logs") or "", buffer.iter_bytes() if buffer is not None else None)
+        return (entry["session_id"], entry["project_directory"], entry["prompt"], prompt_hash(entry["prompt"]),
+                entry["status"], entry["created_at"], entry.get("finished_at"), entry.get("interactive_feedback"),
+                entry.get("error"), logs, logs_size, int(compressed))
+
+    def _write_loop(self):
+        connection = self._connect()
+        stopping = False
+        while not stopping:
+            batch = [self.pending.get()]
+            deadline = time.monotonic() + HISTORY_FLUSH_INTERVAL_SECONDS
+            while len(batch) < HISTORY_BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0: break
+                try: batch.append(self.pending.get(timeout=remaining))
+                except queue.Empty: break
+            if None in batch: # Shutdown sentinel; write what came before it
+                batch, stopping = batch[:batch.index(None)], True
+            if not batch: continue
+            try:
+                rows = [self._row(entry) for entry in batch]
+                with connection:
+                    connection.executemany(
+                        "INSERT INTO feedback_history (session_id, project_directory, prompt, prompt_hash, status, "
+                        "created_at, finished_at, interactive_feedback, error, logs, logs_size, logs_compressed) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                self.written += len(rows)
+                self._prune(connection)
+            except Exception:
+                self.failed += len(batch)
+                logger.exception("Could not write %d feedback history entries", len(batch))
+        connection.close()
+
+    def _prune(self, connection: sqlite3.Connection):
+        # Retention: entries past retention_days, then the oldest beyond max_entries.
+        with connection:
+            if self.retention_days > 0:
+                self.pruned += connection.execute("DELETE FROM feedback_history WHERE created_at < ?",
+                                                  (time.time() - self.retention_days * 86400,)).rowcount
+            if self.max_entries > 0:
+                self.pruned += connection.execute(
+                    "DELETE FROM feedback_history WHERE id IN (SELECT id FROM feedback_history "
+                    "ORDER BY created_at DESC LIMIT -1 OFFSET ?)", (self.max_entries,)).rowcount
+
+    def query(self, project_directory: Optional[str] = None, prompt: Optional[str] = None,
+              status: Optional[str] = None, since: Optional[float] = None, until: Optional[float] = None,
+              limit: int = 50, include_logs: bool = False) -> List[dict]:
+        # Blocking; the API runs it on an executor thread. Newest entries first.
+        clauses, params = [], []
+        if project_directory is not None:
+            clauses.append("project_directory = ?"); params.append(project_directory)
+        if prompt is not None:
+            clauses.append("prompt_hash = ?"); params.append(prompt_hash(prompt))
+        if status is not None:
+            clauses.append("status = ?"); params.append(status)
+        if since is not None:
+            clauses.append("created_at >= ?"); params.append(since)
+        if until is not None:
+            clauses.append("created_at < ?"); params.append(until)
+        columns = ", ".join(SUMMARY_COLUMNS + (("logs", "logs_compressed") if include_logs else ()))
+        sql = f"SELECT {columns} FROM feedback_history"
+        if clauses: sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY created_at DESC LIMIT ?"
+        params.append(max(1, min(limit, HISTORY_MAX_QUERY_LIMIT)))
+        with closing(self._connect()) as connection:
+            rows = connection.execute(sql, params).fetchall()
+        entries = []
+        for row in rows:
+            entry = {column: row[column] for column in SUMMARY_COLUMNS}
+            if include_logs:
+                data = row["logs"] or b""
+                entry["logs"] = (zlib.decompress(data) if row["logs_compressed"] else data).decode("utf-8", errors="replace")
+            entries.append(entry)
+        return entries
+
+    def stats(self) -> dict:
+        return {"path": self.path, "written": self.written, "failed": self.failed, "pruned": self.pruned,
+                "pending": self.pending.qsize()}
+
+    def close(self, timeout: float = 10.0):
+        self.pending.put(None)
+        self.writer.join(timeout)
+
@@ -0,0 +1,80 @@
+# Logging setup shared by the UI server, its GUI processes and the MCP server.
+#
+# Records are put on an in-process queue by a QueueHandler and written by a QueueListener
+# thread, so formatting and stream I/O never happen on a request path or the Qt GUI thread.
+# Output always goes to stderr: the MCP server's stdout is its stdio transport.
+import os
+import sys
+import copy
+import queue
+import atexit
+import logging
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+# Verbosity: DEBUG, INFO (default), WARNING, ERROR.
+LOG_LEVEL = os.environ.get("UI_LOG_LEVEL", "INFO").upper()
+# Longest message written; the rest is replaced by a "[N chars truncated]" marker (0 = unlimited).
+LOG_MAX_MESSAGE_CHARS = int(os.environ.get("UI_LOG_MAX_CHARS", 2000))
+LOG_FORMAT = "%(asctime)s %(levelname)-7s %(processName)s[%(process)d] %(name)s: %(message)s"
+
+
+def truncate(text: str, limit: int = LOG_MAX_MESSAGE_CHARS) -> str:
+    # Also meant for callers: cut large payloads (logs, results) before they are logged.
+    if limit <= 0 or len(text) <= limit:
+        return text
+    return f"{text[:limit]}... [{len(text) - limit} chars truncated]"
+
+
+class TruncatingFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        return truncate(super().format(record), LOG_MAX_MESSAGE_CHARS + 200) # Room for the prefix and traceback start
+
+
+class DeferredQueueHandler(QueueHandler):
+    # The stock prepare() formats the message in the calling thread so the record can be
+    # pickled; our queue never leaves the process, so formatting is left to the listener.
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return copy.copy(record)
+
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[DeferredQueueHandler] = None
+
+
+def _start_listener():
+    global _listener
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(TruncatingFormatter(LOG_FORMAT))
+    _queue_handler.queue = log_queue
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=False)
+    _listener.start()
+
+
+def flush_logging():
+    # Writes out everything still queued and stops the writer thread. Run at exit, and by
+    # multiprocessing children explicitly, since they leave through os._exit() without atexit.
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def configure_logging() -> None:
+    """Routes the root logger through a queue to a stderr writer thread. Idempotent.
+
+    Forked children (GUI workers) get a fresh queue and writer thread of their own,
+    since threads do not survive fork.
+    """
+    global _queue_handler
+    if _queue_handler is not None:
+        return
+    _queue_handler = DeferredQueueHandler(queue.SimpleQueue())
+    root = logging.getLogger()
+    root.handlers[:] = [_queue_handler]
+    root.setLevel(getattr(logging, LOG_LEVEL, logging.INFO))
+    _start_listener()
+    atexit.register(flush_logging)
+    if hasattr(os, "register_at_fork"):
+        os.register_at_fork(after_in_child=_start_listener)
@@ -1,631 +1,1490 @@
 import os
-import sys
 import json
-import psutil
 import threading
-# import argparse # No longer needed
-import subprocess
-# import threading # No longer using Python threads for GUI directly from FastAPI endpoint
 import hashlib
-# import queue # For thread-safe communication, will use multiprocessing.Queue
-from typing import Optional, TypedDict, List
+import uuid
+import time
+import asyncio
+import heapq
+import itertools
+import ipaddress
+from typing import Optional, List, Callable, Dict, AsyncIterator, Iterator, Union, Literal
+from collections import deque, OrderedDict
 
 from multiprocessing import Process, Queue as MPQueue # For inter-process communication
 import queue # Standard queue module for MPQueue.get() timeout exception
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 
-from PySide6.QtWidgets import (
-    QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-    QLabel, QLineEdit, QPushButton, QCheckBox, QTextEdit, QGroupBox
-)
-from PySide6.QtCore import Qt, Signal, QObject, QTimer, QSettings, QThread
-from PySide6.QtGui import QTextCursor, QIcon, QKeyEvent, QFont, QFontDatabase, QPalette, QColor
-
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse, PlainTextResponse, HTMLResponse
 from pydantic import BaseModel
 import uvicorn
+import logging
+
+# Qt is deliberately not imported here: the API process never draws anything, and GUI
+# processes import feedback_gui (and PySide6) themselves, see the entry points below.
+from feedback_common import (
+    MSG_LOG, MSG_RESULT, MSG_METRICS, MSG_CONFIG, FeedbackResult, LogPolicy, FeedbackJobOptions, LogBuffer, open_log_handles,
+    get_user_environment, invalidate_user_environment_cache,
+)
+from feedback_logging import configure_logging, flush_logging
+from feedback_history import HistoryStore
+from feedback_config import ConfigStore, DEFAULT_PROJECT_CONFIG
+from feedback_web import (
+    BrowserFeedbackSession, session_token, token_matches, render_feedback_page, render_notice_page, open_in_browser,
+)
+
+# Module level, so GUI children started with the 'spawn' method (which re-import this module) log too.
+configure_logging()
+logger = logging.getLogger("feedback_ui")
 
 API_PORT = int(os.environ.get("UI_SERVER_PORT", 50689))
+# Optional Unix domain socket to listen on instead of TCP (see UI_SERVER_UDS in server.py).
+API_UDS = os.environ.get("UI_SERVER_UDS") or None
+# How long a single feedback window may stay open before the request times out.
+GUI_TIMEOUT_SECONDS = float(os.environ.get("UI_GUI_TIMEOUT_SECONDS", 3600.0))
+# Blocking waits on GUI processes (MPQueue.get / join) run on this pool instead of the
+# event loop. Its size bounds how many feedback windows can be awaited at the same time.
+MAX_PENDING_WINDOWS = int(os.environ.get("UI_MAX_PENDING_WINDOWS", 64))
+GUI_WAIT_EXECUTOR = ThreadPoolExecutor(max_workers=MAX_PENDING_WINDOWS, thread_name_prefix="gui-wait")
+# Short blocking chores (reaping GUI processes, saving results, history queries, opening a
+# browser) get their own pool, so they never queue behind threads parked on open windows.
+BACKGROUND_EXECUTOR = ThreadPoolExecutor(max_workers=int(os.environ.get("UI_BACKGROUND_THREADS", 8)), thread_name_prefix="ui-background")
+# Live log streaming: chunks kept for late SSE subscribers, and per-subscriber queue bound.
+LOG_STREAM_BACKLOG_CHUNKS = 256
+LOG_STREAM_SUBSCRIBER_CHUNKS = 4096
+LOG_STREAM_LINGER_SECONDS = 30.0
+# Answers to identical (project_directory, prompt) requests are reused for this long after submission.
+RESULT_CACHE_TTL_SECONDS = float(os.environ.get("UI_RESULT_CACHE_TTL", 60.0))
+RESULT_CACHE_MAX_ENTRIES = int(os.environ.get("UI_RESULT_CACHE_SIZE", 64))
+# Job API: finished sessions stay pollable this long; a single long-poll waits at most this long.
+SESSION_RETENTION_SECONDS = float(os.environ.get("UI_SESSION_RETENTION_SECONDS", 600.0))
+LONG_POLL_MAX_SECONDS = 60.0
+# Session-manager mode: one long-lived Qt process shows every request as a tab (replaces the pool).
+SESSION_HOST_MODE = os.environ.get("UI_SESSION_HOST", "0").lower() in ("1", "true", "yes")
+# Number of pre-warmed GUI worker processes (0 = spawn a fresh process per request).
+GUI_POOL_SIZE = int(os.environ.get("UI_WORKER_POOL_SIZE", 1))
+# Jobs a pool worker serves before it is recycled (0 = never recycle).
+GUI_WORKER_MAX_JOBS = int(os.environ.get("UI_WORKER_MAX_JOBS", 20))
+# Admission control for new sessions (0 = unlimited, the default): windows open at once overall
+# and per project, and how many more may wait for a slot before requests are rejected with 429.
+MAX_ACTIVE_SESSIONS = int(os.environ.get("UI_MAX_ACTIVE_SESSIONS", 0))
+MAX_SESSIONS_PER_PROJECT = int(os.environ.get("UI_MAX_SESSIONS_PER_PROJECT", 0))
+MAX_QUEUED_SESSIONS = int(os.environ.get("UI_MAX_QUEUED_SESSIONS", 32))
+ADMISSION_RETRY_AFTER_SECONDS = int(os.environ.get("UI_ADMISSION_RETRY_AFTER", 30))
+# Condense returned logs by default (see feedback_condense.py); requests can override it.
+LOG_CONDENSE = os.environ.get("UI_LOG_CONDENSE", "0").lower() in ("1", "true", "yes")
 
-# --- TypedDicts (can also be Pydantic models for FastAPI response) ---
-class FeedbackResult(TypedDict):
-    logs: str 
-    interactive_feedback: str
+# Default feedback form: "qt" (a desktop window from a GUI process) or "browser" (an HTML page
+# served by this API at /ui/{session_id}). Requests can pick one with their "backend" field.
+FEEDBACK_BACKEND = os.environ.get("UI_BACKEND", "qt").lower()
+# Base of the form URLs handed out for browser sessions (e.g. when the API sits behind a proxy).
+BROWSER_BASE_URL = (os.environ.get("UI_BROWSER_BASE_URL") or f"http://localhost:{API_PORT}").rstrip("/")
+# Also open browser forms with the default browser of the machine running the API.
+BROWSER_OPEN = os.environ.get("UI_BROWSER_OPEN", "0").lower() in ("1", "true", "yes")
+# Seconds between reloads of a form page whose session still waits for an admission slot.
+BROWSER_QUEUED_REFRESH_SECONDS = 3
 
-class FeedbackConfig(TypedDict):
-    run_command: str
-    execute_automatically: bool
+# SQLite file recording every feedback session ("" or "off" disables the history).
+HISTORY_DB_PATH = os.environ.get("UI_HISTORY_DB", os.path.join(os.path.expanduser("~"), ".interactive-feedback-mcp", "history.sqlite3"))
+# Also keep each session's command log in the history. Off by default: commands can print secrets.
+HISTORY_STORE_LOGS = os.environ.get("UI_HISTORY_LOGS", "0").lower() in ("1", "true", "yes")
+# SQLite file with per-project command settings and the window geometry ("" or "off": windows use QSettings).
+CONFIG_DB_PATH = os.environ.get("UI_CONFIG_DB", os.path.join(os.path.expanduser("~"), ".interactive-feedback-mcp", "config.sqlite3"))
 
-# --- Helper Functions (from original script) ---
-def set_dark_title_bar(widget: QWidget, dark_title_bar: bool) -> None:
-    if sys.platform != "win32":
-        return
-    from ctypes import windll, c_uint32, byref
-    build_number = sys.getwindowsversion().build
-    if build_number < 17763:
-        return
-    dark_prop = widget.property("DarkTitleBar")
-    if dark_prop is not None and dark_prop == dark_title_bar:
-        return
-    widget.setProperty("DarkTitleBar", dark_title_bar)
-    dwmapi = windll.dwmapi
-    hwnd = widget.winId()
-    attribute = 20 if build_number >= 18985 else 19
-    c_dark_title_bar = c_uint32(dark_title_bar)
-    dwmapi.DwmSetWindowAttribute(hwnd, attribute, byref(c_dark_title_bar), 4)
-    try:
-        temp_widget = QWidget(None, Qt.FramelessWindowHint | Qt.Tool)
-        temp_widget.resize(1, 1)
-        temp_widget.move(widget.pos().x() - 10000, widget.pos().y() - 10000)
-        temp_widget.show()
-        QTimer.singleShot(50, temp_widget.deleteLater)
-    except Exception as e:
-        print(f"Note: Dark title bar redraw hack minor issue: {e}")
-        pass
-
-
-def get_dark_mode_palette(app: QApplication):
-    darkPalette = app.palette()
-    darkPalette.setColor(QPalette.ColorGroup.Active, QPalette.Window, QColor(53, 53, 53))
-    darkPalette.setColor(QPalette.ColorGroup.Active, QPalette.WindowText, Qt.white)
-    darkPalette.setColor(QPalette.ColorGroup.Disabled, QPalette.WindowText, QColor(127, 127, 127))
-    darkPalette.setColor(QPalette.ColorGroup.Active, QPalette.Base, QColor(42, 42, 42))
-    darkPalette.setColor(QPalette.ColorGroup.Active, QPalette.AlternateBase, QColor(66, 66, 66))
-    darkPalette.setColor(QPalette.ColorGroup.Active, QPalette.ToolTipBase, QColor(53, 53, 53))
-    darkPalette.setColor(QPalette.ColorGroup.Active, QPalette.ToolTipText, Qt.white)
-    darkPalette.setColor(QPalette.ColorGroup.Active, QPalette.Text, Qt.white)
-    darkPalette.setColor(QPalette.ColorGroup.Disabled, QPalette.Text, QColor(127, 127, 127))
-    darkPalette.setColor(QPalette.ColorGroup.Active, QPalette.Dark, QColor(35, 35, 35))
-    darkPalette.setColor(QPalette.ColorGroup.Active, QPalette.Shadow, QColor(20, 20, 20))
-    darkPalette.setColor(QPalette.ColorGroup.Active, QPalette.Button, QColor(53, 53, 53))
-    darkPalette.setColor(QPalette.ColorGroup.Active, QPalette.ButtonText, Qt.white)
-    darkPalette.setColor(QPalette.ColorGroup.Disabled, QPalette.ButtonText, QColor(127, 127, 127))
-    darkPalette.setColor(QPalette.ColorGroup.Active, QPalette.BrightText, Qt.red)
-    darkPalette.setColor(QPalette.ColorGroup.Active, QPalette.Link, QColor(42, 130, 218))
-    darkPalette.setColor(QPalette.ColorGroup.Active, QPalette.Highlight, QColor(42, 130, 218))
-    darkPalette.setColor(QPalette.ColorGroup.Disabled, QPalette.Highlight, QColor(80, 80, 80))
-    darkPalette.setColor(QPalette.ColorGroup.Active, QPalette.HighlightedText, Qt.white)
-    darkPalette.setColor(QPalette.ColorGroup.Disabled, QPalette.HighlightedText, QColor(127, 127, 127))
-    darkPalette.setColor(QPalette.ColorGroup.Active, QPalette.PlaceholderText, QColor(127,127,127))
-    
-    darkPalette.setColor(QPalette.ColorGroup.Inactive, QPalette.Window, QColor(53, 53, 53))
-    darkPalette.setColor(QPalette.ColorGroup.Inactive, QPalette.WindowText, Qt.white)
-    darkPalette.setColor(QPalette.ColorGroup.Inactive, QPalette.Base, QColor(42, 42, 42))
-    darkPalette.setColor(QPalette.ColorGroup.Inactive, QPalette.AlternateBase, QColor(66, 66, 66))
-    darkPalette.setColor(QPalette.ColorGroup.Inactive, QPalette.ToolTipBase, QColor(53, 53, 53))
-    darkPalette.setColor(QPalette.ColorGroup.Inactive, QPalette.ToolTipText, Qt.white)
-    darkPalette.setColor(QPalette.ColorGroup.Inactive, QPalette.Text, Qt.white)
-    darkPalette.setColor(QPalette.ColorGroup.Inactive, QPalette.Button, QColor(53, 53, 53))
-    darkPalette.setColor(QPalette.ColorGroup.Inactive, QPalette.ButtonText, Qt.white)
-    darkPalette.setColor(QPalette.ColorGroup.Inactive, QPalette.Highlight, QColor(42, 130, 218))
-    darkPalette.setColor(QPalette.ColorGroup.Inactive, QPalette.HighlightedText, Qt.white)
-    darkPalette.setColor(QPalette.ColorGroup.Inactive, QPalette.PlaceholderText, QColor(127,127,127))
-    return darkPalette
-
-def kill_tree(process: subprocess.Popen):
-    try:
-        parent = psutil.Process(process.pid)
-        children = parent.children(recursive=True)
-        for proc in children:
-            try: proc.kill()
-            except psutil.Error: pass
-        try: parent.kill()
-        except psutil.Error: pass
-        gone, alive = psutil.wait_procs(children + [parent], timeout=3)
-        for p in alive:
-            try:
-                p.terminate()
-                p.wait(timeout=1)
-            except psutil.Error: pass
-    except psutil.NoSuchProcess: pass
-    except Exception as e: print(f"Error in kill_tree: {e}")
-
-
-def get_user_environment() -> dict[str, str]:
-    if sys.platform != "win32":
-        return os.environ.copy()
-    import ctypes
-    from ctypes import wintypes
-    advapi32, userenv, kernel32 = ctypes.WinDLL("advapi32"), ctypes.WinDLL("userenv"), ctypes.WinDLL("kernel32")
-    TOKEN_QUERY = 0x0008
-    OpenProcessToken, CreateEnvironmentBlock, DestroyEnvironmentBlock, GetCurrentProcess, CloseHandle = \
-        advapi32.OpenProcessToken, userenv.CreateEnvironmentBlock, userenv.DestroyEnvironmentBlock, \
-        kernel32.GetCurrentProcess, kernel32.CloseHandle
-    OpenProcessToken.argtypes = [wintypes.HANDLE, wintypes.DWORD, ctypes.POINTER(wintypes.HANDLE)]
-    OpenProcessToken.restype = wintypes.BOOL
-    CreateEnvironmentBlock.argtypes = [ctypes.POINTER(ctypes.c_void_p), wintypes.HANDLE, wintypes.BOOL]
-    CreateEnvironmentBlock.restype = wintypes.BOOL
-    DestroyEnvironmentBlock.argtypes = [wintypes.LPVOID]
-    DestroyEnvironmentBlock.restype = wintypes.BOOL
-    GetCurrentProcess.argtypes = []
-    GetCurrentProcess.restype = wintypes.HANDLE
-    CloseHandle.argtypes = [wintypes.HANDLE]
-    CloseHandle.restype = wintypes.BOOL
-    token = wintypes.HANDLE()
-    if not OpenProcessToken(GetCurrentProcess(), TOKEN_QUERY, ctypes.byref(token)):
-        print("Warning: Failed to open process token, falling back to os.environ.")
-        return os.environ.copy()
-    try:
-        environment = ctypes.c_void_p()
-        if not CreateEnvironmentBlock(ctypes.byref(environment), token, False):
-            print("Warning: Failed to create environment block, falling back to os.environ.")
-            return os.environ.copy()
-        try:
-            result, env_ptr, offset = {}, ctypes.cast(environment, ctypes.POINTER(ctypes.c_wchar)), 0
-            while True:
-                current_string, char_offset = "", offset
-                while env_ptr[char_offset] != "\0":
-                    current_string += env_ptr[char_offset]
-                    char_offset += 1
-                offset = char_offset + 1
-                if not current_string: break
-                try:
-                    key, value = current_string.split("=", 1)
-                    result[key] = value
-                except ValueError: pass
-            return result
-        finally: DestroyEnvironmentBlock(environment)
-    finally: CloseHandle(token)
-
-def get_project_settings_group(project_dir: str) -> str:
-    basename = os.path.basename(os.path.normpath(project_dir))
-    full_hash = hashlib.md5(project_dir.encode('utf-8')).hexdigest()[:8]
-    return f"Project_{basename}_{full_hash}"
-
-# --- PySide6 UI Classes ---
-class FeedbackTextEdit(QTextEdit):
-    submitted = Signal()
-    def __init__(self, parent=None): super().__init__(parent)
-    def keyPressEvent(self, event: QKeyEvent):
-        if event.key() == Qt.Key_Return and event.modifiers() == Qt.ControlModifier: self.submitted.emit()
-        else: super().keyPressEvent(event)
-
-class LogSignals(QObject):
-    append_log = Signal(str)
-
-class FeedbackUI(QMainWindow):
-    def __init__(self, project_directory: str, prompt: str):
-        super().__init__()
-        self.project_directory, self.prompt = project_directory, prompt
-        self.process: Optional[subprocess.Popen] = None
-        self.log_buffer: List[str] = []
-        self.feedback_result: Optional[FeedbackResult] = None
-        self.log_signals = LogSignals()
-        self.log_signals.append_log.connect(self._append_log_to_gui)
-        self.setWindowTitle("Interactive Feedback MCP")
-        try:
-            script_dir = os.path.dirname(os.path.abspath(__file__))
-            icon_path = os.path.join(script_dir, "images", "feedback.png")
-            if os.path.exists(icon_path): self.setWindowIcon(QIcon(icon_path))
-        except Exception as e: print(f"Warning: Could not load window icon: {e}")
-        self.setWindowFlags(self.windowFlags() | Qt.WindowStaysOnTopHint)
-        self.settings = QSettings("InteractiveFeedbackMCP", "InteractiveFeedbackMCP")
-        self.settings.beginGroup("MainWindow_General")
-        geometry = self.settings.value("geometry")
-        if geometry: self.restoreGeometry(geometry)
-        else:
-            self.resize(800, 600)
-            try:
-                screen = QApplication.primaryScreen().geometry()
-                self.move((screen.width() - 800) // 2, (screen.height() - 600) // 2)
-            except AttributeError: print("Warning: Could not get primary screen geometry.")
-        state = self.settings.value("windowState")
-        if state: self.restoreState(state)
-        self.settings.endGroup()
-        self.project_group_name = get_project_settings_group(self.project_directory)
-        self.settings.beginGroup(self.project_group_name)
-        loaded_run_command = self.settings.value("run_command", "", type=str)
-        loaded_execute_auto = self.settings.value("execute_automatically", False, type=bool)
-        command_section_visible = self.settings.value("commandSectionVisible", False, type=bool)
-        self.settings.endGroup()
-        self.config: FeedbackConfig = {"run_command": loaded_run_command, "execute_automatically": loaded_execute_auto}
-        self._create_ui()
-        self.command_group.setVisible(command_section_visible)
-        self.toggle_command_button.setText("Hide Command Section" if command_section_visible else "Show Command Section")
-        set_dark_title_bar(self, True)
-        if self.config.get("execute_automatically", False) and self.config.get("run_command"):
-            QTimer.singleShot(100, self._run_command)
-        self.feedback_text.setFocus()
-
-    def _format_windows_path(self, path: str) -> str:
-        if sys.platform == "win32":
-            path = path.replace("/", "\\")
-            if len(path) >= 2 and path[1] == ":" and path[0].isalpha(): path = path[0].upper() + path[1:]
-        return path
-
-    def _create_ui(self):
-        central_widget = QWidget()
-        self.setCentralWidget(central_widget)
-        main_layout = QVBoxLayout(central_widget)
-        self.toggle_command_button = QPushButton("Show Command Section")
-        self.toggle_command_button.clicked.connect(self._toggle_command_section)
-        main_layout.addWidget(self.toggle_command_button)
-        self.command_group = QGroupBox("Command")
-        command_layout = QVBoxLayout(self.command_group)
-        working_dir_label = QLabel(f"Working directory: {self._format_windows_path(self.project_directory)}")
-        command_layout.addWidget(working_dir_label)
-        command_input_layout = QHBoxLayout()
-        self.command_entry = QLineEdit(self.config["run_command"])
-        self.command_entry.returnPressed.connect(self._run_command)
-        self.command_entry.textChanged.connect(self._update_config_from_ui)
-        self.run_button = QPushButton("&Run")
-        self.run_button.clicked.connect(self._run_command)
-        command_input_layout.addWidget(self.command_entry)
-        command_input_layout.addWidget(self.run_button)
-        command_layout.addLayout(command_input_layout)
-        auto_layout = QHBoxLayout()
-        self.auto_check = QCheckBox("Execute automatically on next run")
-        self.auto_check.setChecked(self.config.get("execute_automatically", False))
-        self.auto_check.stateChanged.connect(self._update_config_from_ui)
-        save_button = QPushButton("&Save Configuration")
-        save_button.clicked.connect(self._save_config_to_settings)
-        auto_layout.addWidget(self.auto_check)
-        auto_layout.addStretch()
-        auto_layout.addWidget(save_button)
-        command_layout.addLayout(auto_layout)
-        console_group = QGroupBox("Console")
-        console_layout_internal = QVBoxLayout(console_group)
-        console_group.setMinimumHeight(150)
-        self.log_text_area = QTextEdit()
-        self.log_text_area.setReadOnly(True)
-        fixed_font = QFontDatabase.systemFont(QFontDatabase.SystemFont.FixedFont)
-        fixed_font.setPointSize(9)
-        self.log_text_area.setFont(fixed_font)
-        console_layout_internal.addWidget(self.log_text_area)
-        button_layout = QHBoxLayout()
-        self.clear_button = QPushButton("&Clear Logs")
-        self.clear_button.clicked.connect(self.clear_logs_display)
-        button_layout.addStretch()
-        button_layout.addWidget(self.clear_button)
-        console_layout_internal.addLayout(button_layout)
-        command_layout.addWidget(console_group)
-        self.command_group.setVisible(False)  
-        main_layout.addWidget(self.command_group)
-        self.feedback_group = QGroupBox("Feedback")
-        feedback_layout = QVBoxLayout(self.feedback_group)
-        self.description_label = QLabel(self.prompt)
-        self.description_label.setWordWrap(True)
-        feedback_layout.addWidget(self.description_label)
-        self.feedback_text = FeedbackTextEdit()
-        self.feedback_text.submitted.connect(self._submit_feedback_and_close)
-        font_metrics = self.feedback_text.fontMetrics()
-        padding = self.feedback_text.contentsMargins().top() + self.feedback_text.contentsMargins().bottom() + 10
-        self.feedback_text.setMinimumHeight(max(5 * font_metrics.height() + padding, 70))
-        self.feedback_text.setPlaceholderText("Enter your feedback here (Ctrl+Enter to submit, Esc to cancel)")
-        submit_button = QPushButton("&Send Feedback (Ctrl+Enter)")
-        submit_button.clicked.connect(self._submit_feedback_and_close)
-        feedback_layout.addWidget(self.feedback_text)
-        feedback_layout.addWidget(submit_button)
-        main_layout.addWidget(self.feedback_group)
-        contact_label = QLabel('Need to improve? Contact Fábio Ferreira on <a href="https://x.com/fabiomlferreira">X.com</a> or visit <a href="https://dotcursorrules.com/">dotcursorrules.com</a>')
-        contact_label.setOpenExternalLinks(True)
-        contact_label.setAlignment(Qt.AlignCenter)
-        contact_label.setStyleSheet("font-size: 9pt; color: #cccccc;") 
-        main_layout.addWidget(contact_label)
-        central_widget.setLayout(main_layout)
-
-    def _toggle_command_section(self):
-        is_visible = not self.command_group.isVisible()
-        self.command_group.setVisible(is_visible)
-        self.toggle_command_button.setText("Hide Command Section" if is_visible else "Show Command Section")
-        self.settings.beginGroup(self.project_group_name)
-        self.settings.setValue("commandSectionVisible", is_visible)
-        self.settings.endGroup()
-        self.adjustSize()
-
-    def _update_config_from_ui(self):
-        self.config["run_command"] = self.command_entry.text()
-        self.config["execute_automatically"] = self.auto_check.isChecked()
-
-    def _append_log_to_gui(self, text: str):
-        self.log_buffer.append(text)
-        self.log_text_area.append(text.rstrip())
-        cursor = self.log_text_area.textCursor()
-        cursor.movePosition(QTextCursor.MoveOperation.End)
-        self.log_text_area.setTextCursor(cursor)
-
-    def _check_process_status(self):
-        if self.process and self.process.poll() is not None:
-            if hasattr(self, 'status_timer') and self.status_timer.isActive(): self.status_timer.stop()
-            self._append_log_to_gui(f"\nProcess exited with code {self.process.returncode}\n")
-            self.run_button.setText("&Run")
-            self.process = None
-            self.activateWindow()
-            self.feedback_text.setFocus()
-
-    def _run_command(self):
-        if self.process:
-            self._append_log_to_gui("Stopping current process...\n")
-            kill_tree(self.process)
-            return
-        command_to_run = self.command_entry.text()
-        if not command_to_run:
-            self._append_log_to_gui("Please enter a command to run.\n")
-            return
-        self._append_log_to_gui(f"$ {command_to_run}\n")
-        self.run_button.setText("Sto&p")
-        try:
-            self.process = subprocess.Popen(
-                command_to_run, shell=True, cwd=self.project_directory,
-                stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=get_user_environment(),
-                text=True, bufsize=1, encoding="utf-8", errors="ignore")
-            # Note: If FeedbackUI runs in a separate process, these threads are fine within that process.
-            process_read_stdout_thread = threading.Thread(target=self._read_output_pipe, args=(self.process.stdout,), daemon=True)
-            process_read_stdout_thread.start()
-            process_read_stderr_thread = threading.Thread(target=self._read_output_pipe, args=(self.process.stderr,), daemon=True)
-            process_read_stderr_thread.start()
-            
-            self.status_timer = QTimer(self)
-            self.status_timer.timeout.connect(self._check_process_status)
-            self.status_timer.start(200)
-        except Exception as e:
-            self._append_log_to_gui(f"Error running command: {str(e)}\n")
-            self.run_button.setText("&Run")
-            self.process = None
-
-    def _read_output_pipe(self, pipe):
-        try:
-            for line in iter(pipe.readline, ""):
-                if line: self.log_signals.append_log.emit(line)
-        except Exception as e: self.log_signals.append_log.emit(f"Error reading output: {e}\n")
-        finally:
-            if pipe: pipe.close()
-
-    def _submit_feedback_and_close(self):
-        self.feedback_result = FeedbackResult(
-            logs="".join(self.log_buffer),
-            interactive_feedback=self.feedback_text.toPlainText().strip())
-        self.close()
-
-    def clear_logs_display(self): self.log_text_area.clear()
-
-    def _save_config_to_settings(self):
-        self._update_config_from_ui()
-        self.settings.beginGroup(self.project_group_name)
-        self.settings.setValue("run_command", self.config["run_command"])
-        self.settings.setValue("execute_automatically", self.config["execute_automatically"])
-        self.settings.endGroup()
-        self._append_log_to_gui("Configuration saved for this project.\n")
-
-    def keyPressEvent(self, event: QKeyEvent):
-        if event.key() == Qt.Key_Escape and \
-           (not self.feedback_text.hasFocus() or not self.feedback_text.toPlainText().strip()):
-            self.feedback_result = FeedbackResult(logs="".join(self.log_buffer), interactive_feedback="")
-            self.close()
-            return
-        super().keyPressEvent(event)
-
-    def closeEvent(self, event):
-        self.settings.beginGroup("MainWindow_General")
-        self.settings.setValue("geometry", self.saveGeometry())
-        self.settings.setValue("windowState", self.saveState())
-        self.settings.endGroup()
-        self.settings.beginGroup(self.project_group_name)
-        self.settings.setValue("commandSectionVisible", self.command_group.isVisible())
-        self.settings.endGroup()
-        if self.process:
-            kill_tree(self.process)
-            self.process = None
-        if self.feedback_result is None:
-            self.feedback_result = FeedbackResult(
-                logs="".join(self.log_buffer), interactive_feedback="")
-        
-        app_instance = QApplication.instance()
-        if app_instance:
-             # This print now happens within the dedicated GUI process's main thread.
-             print(f"DEBUG: Quitting QApplication from FeedbackUI.closeEvent() in process {os.getpid()}, Qt thread {QThread.currentThread()}.")
-             app_instance.quit()
-        super().closeEvent(event)
-
-# --- Core Function to Run UI (This will run IN THE SEPARATE PROCESS) ---
-def execute_feedback_ui_in_process(project_directory: str, prompt: str) -> FeedbackResult:
-    # This function is the target for the new process.
-    # It will have its own Python interpreter space (mostly) and can create its own QApplication.
-    print(f"DEBUG: execute_feedback_ui_in_process called in PID {os.getpid()}, Python thread {threading.get_ident()}, Qt thread {QThread.currentThread()}")
-    
-    # QApplication *must* be created here, in the main thread of this new process.
-    app_for_this_process = QApplication.instance()
-    if app_for_this_process is not None:
-        # This should ideally not happen if it's a fresh process, but safety check.
-        print(f"WARNING: QApplication.instance() already exists in new process {os.getpid()} before creation. This is unexpected. Reusing.")
-    else:
-        print(f"DEBUG: Creating new QApplication in process {os.getpid()}, Qt thread {QThread.currentThread()}.")
-        app_for_this_process = QApplication([])
 
-    if not app_for_this_process:
-        # Should not happen if creation is successful.
-        critical_error_msg = f"CRITICAL ERROR: QApplication could not be initialized in process {os.getpid()}."
-        print(critical_error_msg)
-        # This return will be put into the MPQueue by the process_target_for_gui
-        return FeedbackResult(logs=critical_error_msg, interactive_feedback="")
+# --- Metrics (Prometheus text format, no external dependency) ---
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name, self.help_text = name, help_text
+        self.value = 0
+        self.lock = threading.Lock()
 
-    app_for_this_process.setPalette(get_dark_mode_palette(app_for_this_process))
-    app_for_this_process.setStyle("Fusion")
+    def inc(self, amount: float = 1):
+        with self.lock: self.value += amount
 
-    ui_instance = None
-    try:
-        ui_instance = FeedbackUI(project_directory, prompt)
-        ui_instance.show()
-        
-        print(f"DEBUG: Calling exec() on QApplication in process {os.getpid()}, Qt thread {QThread.currentThread()}.")
-        app_for_this_process.exec() 
-        print(f"DEBUG: QApplication.exec() finished in process {os.getpid()}, Qt thread {QThread.currentThread()}.")
-
-    except Exception as e_ui:
-        error_during_ui = f"Error during UI execution in process {os.getpid()}, Qt thread {QThread.currentThread()}: {e_ui}"
-        print(error_during_ui)
-        # Log the traceback for better debugging
-        import traceback
-        tb_str = traceback.format_exc()
-        print(tb_str)
-        error_during_ui += f"\nTraceback:\n{tb_str}"
-        
-        log_output = error_during_ui
-        if ui_instance and hasattr(ui_instance, 'log_buffer'): # Check if log_buffer exists
-             log_output += "\n" + "".join(ui_instance.log_buffer)
-        
-        # Ensure feedback_result is set on ui_instance if ui_instance exists, even if it's an error one
-        if ui_instance:
-            ui_instance.feedback_result = FeedbackResult(logs=log_output, interactive_feedback="")
-        else: # if ui_instance itself failed to create
-             return FeedbackResult(logs=log_output, interactive_feedback="")
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter", f"{self.name} {self.value}"]
 
 
-    finally:
-        # Cleanup UI instance
-        if ui_instance:
-            # ui_instance.close() # closeEvent already calls quit, which stops exec. Explicit close might be redundant or cause issues if already closing.
-            ui_instance.deleteLater() 
-            print(f"DEBUG: Scheduled ui_instance.deleteLater() in process {os.getpid()}, Qt thread {QThread.currentThread()}.")
-            # Process events to allow deleteLater to occur before process exits
-            app_for_this_process.processEvents()
+class Histogram:
+    # Thread-safe: observed from the event loop, GUI_WAIT_EXECUTOR threads and the session host router.
+    def __init__(self, name: str, help_text: str, buckets: List[float]):
+        self.name, self.help_text = name, help_text
+        self.buckets = sorted(buckets)
+        self.bucket_counts = [0] * len(self.buckets)
+        self.count, self.sum = 0, 0.0
+        self.lock = threading.Lock()
 
+    def observe(self, value: float):
+        with self.lock:
+            self.count += 1
+            self.sum += value
+            for i, bound in enumerate(self.buckets):
+                if value <= bound: self.bucket_counts[i] += 1
 
-    # Result should be set by FeedbackUI.closeEvent or by the exception handler above
-    result = ui_instance.feedback_result if ui_instance and ui_instance.feedback_result is not None else None
-    
-    if result:
-        print(f"DEBUG: UI interaction completed in process {os.getpid()}. Result: Logs - {len(result['logs'])} chars, Feedback - '{result['interactive_feedback']}'")
-        return result
-    else:
-        # This case means feedback_result was None even after normal closure or handled exception.
-        # This should be rare if closeEvent and exception handling are correct.
-        warning_msg = f"WARNING: UI in process {os.getpid()} closed without providing a result (feedback_result is None after exec). Fallback."
-        print(warning_msg)
-        # Try to get logs if ui_instance exists
-        final_logs = warning_msg
-        if ui_instance and hasattr(ui_instance, 'log_buffer'):
-            final_logs += "\nCollected Logs:\n" + "".join(ui_instance.log_buffer)
+    def render(self) -> List[str]:
+        with self.lock:
+            lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+            lines += [f'{self.name}_bucket{{le="{bound:g}"}} {n}' for bound, n in zip(self.buckets, self.bucket_counts)]
+            lines += [f'{self.name}_bucket{{le="+Inf"}} {self.count}', f"{self.name}_sum {self.sum}", f"{self.name}_count {self.count}"]
+        return lines
+
+
+class Gauge:
+    def __init__(self, name: str, help_text: str, read: Callable[[], float]):
+        self.name, self.help_text, self.read = name, help_text, read
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge", f"{self.name} {self.read()}"]
+
+
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0]
+HUMAN_BUCKETS = [1, 5, 15, 30, 60, 120, 300, 600, 1200, 1800, 3600]
+BYTES_BUCKETS = [1024, 16 * 1024, 128 * 1024, 1024 ** 2, 8 * 1024 ** 2, 64 * 1024 ** 2, 256 * 1024 ** 2]
+
+METRIC_PROCESS_SPAWN = Histogram("feedback_gui_process_spawn_seconds", "Time to start a GUI process (spawn-per-request, pool worker or session host).", LATENCY_BUCKETS)
+METRIC_QT_INIT = Histogram("feedback_qt_app_init_seconds", "Time to create and style the QApplication inside a GUI process.", LATENCY_BUCKETS)
+METRIC_WINDOW_SHOWN = Histogram("feedback_window_shown_seconds", "Time from receiving a request until its feedback window is shown.", LATENCY_BUCKETS)
+METRIC_HUMAN_RESPONSE = Histogram("feedback_human_response_seconds", "Time the feedback window was open before the human answered or closed it.", HUMAN_BUCKETS)
+METRIC_LOG_BYTES = Histogram("feedback_log_bytes", "Size of the logs field returned per session.", BYTES_BUCKETS)
+METRIC_QUEUE_TRANSFER = Histogram("feedback_result_transfer_seconds", "Time for a result to travel from the GUI process over its MPQueue.", LATENCY_BUCKETS)
+METRIC_ADMISSION_WAIT = Histogram("feedback_admission_wait_seconds", "Time new sessions waited in the admission queue.", HUMAN_BUCKETS)
+METRIC_ADMISSION_REJECTED = Counter("feedback_admission_rejected_total", "Requests rejected with 429 because the admission queue was full.")
+METRIC_ACTIVE_SESSIONS = Gauge("feedback_active_sessions", "Sessions currently holding an admission slot.", lambda: admission.active)
+METRIC_QUEUED_SESSIONS = Gauge("feedback_queued_sessions", "Sessions waiting in the admission queue.", lambda: len(admission.waiting))
+METRIC_TIMEOUTS = Counter("feedback_timeouts_total", "Feedback sessions that timed out (HTTP 504).")
+METRIC_ERRORS = Counter("feedback_errors_total", "Feedback sessions that failed with HTTP 500.")
+METRIC_TERMINATES = Counter("feedback_gui_terminate_total", "GUI processes that had to be terminated (SIGTERM).")
+METRIC_KILLS = Counter("feedback_gui_kill_total", "GUI processes that had to be killed (SIGKILL) after terminate failed.")
+ALL_METRICS = [METRIC_PROCESS_SPAWN, METRIC_QT_INIT, METRIC_WINDOW_SHOWN, METRIC_HUMAN_RESPONSE, METRIC_LOG_BYTES,
+               METRIC_QUEUE_TRANSFER, METRIC_ADMISSION_WAIT, METRIC_ADMISSION_REJECTED, METRIC_ACTIVE_SESSIONS,
+               METRIC_QUEUED_SESSIONS, METRIC_TIMEOUTS, METRIC_ERRORS, METRIC_TERMINATES, METRIC_KILLS]
+
+
+def start_gui_process(process: Process):
+    started = time.perf_counter()
+    process.start()
+    METRIC_PROCESS_SPAWN.observe(time.perf_counter() - started)
 
-        return FeedbackResult(logs=final_logs, interactive_feedback="")
+
+class SessionPhaseTimer:
+    """Turns the phase samples a GUI process sends as ("metrics", {...}) into histogram observations.
+
+    Samples are wall-clock timestamps taken in the GUI process (same host), except
+    qt_init_seconds which is already a duration.
+    """
+
+    def __init__(self):
+        self.received_at = time.time()
+        self.shown_at: Optional[float] = None
+        self.result_sent_at: Optional[float] = None
+
+    def __call__(self, sample: dict):
+        if "qt_init_seconds" in sample:
+            METRIC_QT_INIT.observe(sample["qt_init_seconds"])
+        if "window_shown_at" in sample:
+            self.shown_at = sample["window_shown_at"]
+            METRIC_WINDOW_SHOWN.observe(max(0.0, self.shown_at - self.received_at))
+        if "window_closed_at" in sample and self.shown_at is not None:
+            METRIC_HUMAN_RESPONSE.observe(max(0.0, sample["window_closed_at"] - self.shown_at))
+        if "result_sent_at" in sample:
+            self.result_sent_at = sample["result_sent_at"]
+
+    def result_received(self, result: FeedbackResult):
+        if self.result_sent_at is not None:
+            METRIC_QUEUE_TRANSFER.observe(max(0.0, time.time() - self.result_sent_at))
+        buffer = result.get("logs_buffer")
+        METRIC_LOG_BYTES.observe(buffer.size if buffer else len(result.get("logs", "").encode("utf-8", errors="replace")))
 
 
 # --- FastAPI Application ---
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    global gui_pool, session_host, history, config_store, admission
+    admission = create_admission_controller()
+    # Warm the environment snapshot so forked GUI workers inherit it instead of each building one.
+    get_user_environment()
+    if SESSION_HOST_MODE:
+        session_host = GuiSessionHost()
+        session_host.start()
+    elif GUI_POOL_SIZE > 0:
+        gui_pool = GuiWorkerPool(GUI_POOL_SIZE, GUI_WORKER_MAX_JOBS)
+        gui_pool.start()
+    if HISTORY_DB_PATH and HISTORY_DB_PATH.lower() not in ("0", "off", "false", "no"):
+        try: history = HistoryStore(HISTORY_DB_PATH)
+        except Exception:
+            logger.exception("Could not open feedback history %s; history is disabled.", HISTORY_DB_PATH)
+    if CONFIG_DB_PATH and CONFIG_DB_PATH.lower() not in ("0", "off", "false", "no"):
+        try: config_store = ConfigStore(CONFIG_DB_PATH)
+        except Exception:
+            logger.exception("Could not open config store %s; windows use QSettings.", CONFIG_DB_PATH)
+    try:
+        yield
+    finally:
+        if history:
+            history.close() # Flushes queued entries
+            history = None
+        if config_store:
+            config_store.close() # Writes pending changes
+            config_store = None
+        if session_host:
+            session_host.shutdown()
+            session_host = None
+        if gui_pool:
+            gui_pool.shutdown()
+            gui_pool = None
+
+
 app = FastAPI(
     title="Interactive Feedback API",
     description="API to trigger a PySide6 GUI for collecting user feedback.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 class FeedbackRequest(BaseModel):
     project_directory: str
     prompt: str
     server_save_path: Optional[str] = None
+    # When set, console output is published live on GET /sessions/{session_id}/logs.
+    session_id: Optional[str] = None
+    # Cap for the returned logs; the head and tail are kept and the middle is marked as elided.
+    max_log_bytes: Optional[int] = None
+    # Return the complete output from the spill file (UI_LOG_SPILL=1) instead of head + tail.
+    full_logs: bool = False
+    # Return a condensed log (errors and warnings with context, head and tail); UI_LOG_CONDENSE when omitted.
+    # The uncondensed log stays available on GET /sessions/{session_id}/raw_logs.
+    condense_logs: Optional[bool] = None
+    # Join an identical in-flight request / reuse a just-submitted answer instead of opening a new window.
+    dedupe: bool = True
+    # Higher values are admitted first when sessions have to wait for a free slot.
+    priority: int = 0
+    # "qt" or "browser"; UI_BACKEND when omitted.
+    backend: Optional[Literal["qt", "browser"]] = None
+
+class CommandStatsResponse(BaseModel):
+    command: str
+    exit_code: int
+    duration_seconds: float
+    cpu_seconds: float
+    peak_rss_bytes: int
+    timed_out: bool = False
+    cached: bool = False # Replayed from the command cache (UI_COMMAND_CACHE)
+    name: Optional[str] = None # Set for named commands
+
+class NamedCommandResponse(BaseModel):
+    name: str
+    command: str
+    logs: str # This command's own output (capped, or condensed like logs)
+    stats: Optional[CommandStatsResponse] = None # None if it never ran
 
 class FeedbackResponse(BaseModel):
     logs: str
     interactive_feedback: str
+    # Resource usage of each command run while the window was open (see CommandMonitor).
+    command_stats: List[CommandStatsResponse] = []
+    commands: List[NamedCommandResponse] = [] # Named commands run in parallel from the window, in order
+
+class ProjectConfigResponse(BaseModel):
+    project_directory: str
+    stored: bool # False: defaults (a project not configured yet, or still only in QSettings)
+    run_command: str
+    execute_automatically: bool
+    watch_changes: bool
+    named_commands: str
+    command_section_visible: bool
+
+class ProjectConfigUpdate(BaseModel):
+    # Fields left out (null) keep their stored values.
+    project_directory: str
+    run_command: Optional[str] = None
+    execute_automatically: Optional[bool] = None
+    watch_changes: Optional[bool] = None
+    named_commands: Optional[str] = None
+    command_section_visible: Optional[bool] = None
+
+class FeedbackSessionStatus(BaseModel):
+    session_id: str
+    status: str # pending | completed | failed | cancelled
+    created_at: float
+    finished_at: Optional[float] = None
+    result: Optional[FeedbackResponse] = None
+    error: Optional[str] = None
+    # True while the session waits in the admission queue for a free slot.
+    queued: bool = False
+    # Browser backend: where the human answers (also logged by the API).
+    ui_url: Optional[str] = None
+
+
+# GUI process entry points. feedback_gui (and with it PySide6) is imported in the child
+# only, so the API process and everything forked from it before this point stay Qt-free.
+def process_target_for_gui(project_dir: str, prompt_str: str, result_mp_queue: MPQueue,
+                           options: Optional[FeedbackJobOptions] = None):
+    from feedback_gui import process_target_for_gui as target
+    try: target(project_dir, prompt_str, result_mp_queue, options)
+    finally: flush_logging() # Children exit through os._exit(), which skips atexit
+
+
+def gui_worker_main(job_mp_queue: MPQueue, result_mp_queue: MPQueue, max_jobs: int):
+    from feedback_gui import gui_worker_main as target
+    try: target(job_mp_queue, result_mp_queue, max_jobs)
+    finally: flush_logging()
+
+
+def session_host_main(job_mp_queue: MPQueue, event_mp_queue: MPQueue):
+    from feedback_gui import session_host_main as target
+    try: target(job_mp_queue, event_mp_queue)
+    finally: flush_logging()
+
+
+class GuiWorker:
+    # Parent-side handle of one pool worker process and its private job/result queues.
+    def __init__(self, max_jobs: int):
+        self.job_queue: MPQueue = MPQueue()
+        self.result_queue: MPQueue = MPQueue()
+        self.process = Process(target=gui_worker_main, args=(self.job_queue, self.result_queue, max_jobs))
+        self.process.daemon = True
+        self.jobs_done = 0
+        self.busy = False
+
+    def start(self):
+        start_gui_process(self.process)
+        logger.debug("Started GUI pool worker %s", self.process.pid)
+
+    def submit(self, project_directory: str, prompt: str, options: FeedbackJobOptions):
+        self.busy = True
+        self.jobs_done += 1
+        self.job_queue.put((project_directory, prompt, options))
+
+    def close_queues(self):
+        for q in (self.job_queue, self.result_queue):
+            q.close()
+
+
+class GuiWorkerPool:
+    """Pre-warmed GUI worker processes that already have a QApplication set up.
+
+    All bookkeeping happens on the event loop thread; blocking joins of retired
+    workers are handed to BACKGROUND_EXECUTOR. A worker is replaced after
+    max_jobs_per_worker jobs, when it crashes, or when its window had to be killed.
+    """
+
+    def __init__(self, size: int, max_jobs_per_worker: int):
+        self.size = size
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.workers: List[GuiWorker] = []
+        self.recycled = 0
+        self.crashed = 0
+        self.fallback_spawns = 0
+
+    def start(self):
+        for _ in range(self.size):
+            self._spawn()
+
+    def _spawn(self) -> GuiWorker:
+        worker = GuiWorker(self.max_jobs_per_worker)
+        worker.start()
+        self.workers.append(worker)
+        return worker
+
+    def _retire(self, worker: GuiWorker, terminate_first: bool):
+        if worker in self.workers:
+            self.workers.remove(worker)
+
+        def _reap():
+            _reap_gui_process(worker.process, terminate_first)
+            worker.close_queues()
+        BACKGROUND_EXECUTOR.submit(_reap)
+
+    def acquire(self) -> Optional[GuiWorker]:
+        for worker in list(self.workers):
+            if worker.busy:
+                continue
+            if not worker.process.is_alive():
+                logger.warning("Idle GUI pool worker %s died (exit code %s). Replacing.", worker.process.pid, worker.process.exitcode)
+                self.crashed += 1
+                self._retire(worker, terminate_first=False)
+                worker = self._spawn()
+            worker.busy = True
+            return worker
+        self.fallback_spawns += 1
+        return None
+
+    def release(self, worker: GuiWorker, healthy: bool):
+        worker.busy = False
+        if not healthy or not worker.process.is_alive():
+            self.crashed += 1
+            self._retire(worker, terminate_first=True)
+            self._spawn()
+        elif self.max_jobs_per_worker > 0 and worker.jobs_done >= self.max_jobs_per_worker:
+            # The worker exits on its own after its last job; just reap it and replace it.
+            self.recycled += 1
+            self._retire(worker, terminate_first=False)
+            self._spawn()
+
+    def recycle_idle(self):
+        # Replaces idle workers so they fork again from the API process's current state
+        # (e.g. a freshly invalidated environment snapshot). Busy workers are left alone.
+        for worker in list(self.workers):
+            if worker.busy: continue
+            if worker.process.is_alive():
+                worker.job_queue.put(None)
+            self.recycled += 1
+            self._retire(worker, terminate_first=False)
+            self._spawn()
+
+    def shutdown(self):
+        for worker in list(self.workers):
+            if worker.process.is_alive():
+                worker.job_queue.put(None)
+            self._retire(worker, terminate_first=False)
+
+    def stats(self) -> dict:
+        busy = sum(1 for w in self.workers if w.busy)
+        return {
+            "size": self.size,
+            "idle": len(self.workers) - busy,
+            "busy": busy,
+            "max_jobs_per_worker": self.max_jobs_per_worker,
+            "recycled": self.recycled,
+            "crashed": self.crashed,
+            "fallback_spawns": self.fallback_spawns,
+        }
+
+
+gui_pool: Optional[GuiWorkerPool] = None
+
+
+class GuiSessionHost:
+    """Parent-side handle of the session host process.
+
+    A router thread reads the host's shared event queue and forwards every message
+    to the thread-safe queue of its session, which the request waits on exactly like
+    a per-process result queue. The host is restarted if it dies.
+    """
+
+    def __init__(self):
+        self.process: Optional[Process] = None
+        self.job_queue: Optional[MPQueue] = None
+        self.routes: Dict[str, queue.Queue] = {}
+        self.routes_lock = threading.Lock()
+        self.restarts = 0
+
+    def start(self):
+        self.job_queue, event_queue = MPQueue(), MPQueue()
+        self.process = Process(target=session_host_main, args=(self.job_queue, event_queue))
+        self.process.daemon = True
+        start_gui_process(self.process)
+        logger.debug("Started GUI session host %s", self.process.pid)
+        threading.Thread(target=self._route_events, args=(self.process, event_queue), daemon=True,
+                         name="session-host-router").start()
+
+    def _route_events(self, process: Process, event_queue: MPQueue):
+        while True:
+            try:
+                session_id, kind, payload = event_queue.get(timeout=1.0)
+            except queue.Empty:
+                if not process.is_alive(): break
+                continue
+            if session_id is None: # Host-level samples (QApplication init) belong to no session
+                if kind == MSG_METRICS: SessionPhaseTimer()(payload)
+                continue
+            if kind == MSG_CONFIG: # Applied here, so changes sent while a tab closes are never lost
+                apply_config_change(payload)
+                continue
+            with self.routes_lock:
+                route = self.routes.get(session_id)
+            if route: route.put((kind, payload))
+            elif kind == MSG_RESULT:
+                open_log_handles(payload) # Nobody waits for it anymore; the buffers unlink their files when dropped
+        event_queue.close()
+
+    def open_session(self, session_id: str, project_directory: str, prompt: str,
+                     options: FeedbackJobOptions) -> tuple[Process, queue.Queue]:
+        if not self.process.is_alive():
+            logger.warning("GUI session host %s died (exit code %s). Restarting.", self.process.pid, self.process.exitcode)
+            self.restarts += 1
+            self.job_queue.close()
+            self.start()
+        route: queue.Queue = queue.Queue()
+        with self.routes_lock:
+            self.routes[session_id] = route
+        self.job_queue.put(("open", session_id, project_directory, prompt, options))
+        return self.process, route
+
+    def close_session(self, session_id: str, cancel: bool):
+        with self.routes_lock:
+            self.routes.pop(session_id, None)
+        if cancel and self.process.is_alive():
+            self.job_queue.put(("cancel", session_id))
+
+    def shutdown(self):
+        if self.process.is_alive():
+            self.job_queue.put(None)
+        BACKGROUND_EXECUTOR.submit(_reap_gui_process, self.process, False)
+
+    def stats(self) -> dict:
+        with self.routes_lock:
+            pending = len(self.routes)
+        return {"pid": self.process.pid, "alive": self.process.is_alive(), "pending_sessions": pending,
+                "restarts": self.restarts}
+
+
+session_host: Optional[GuiSessionHost] = None
+
+
+class SessionLogStream:
+    """Fans live console output of one feedback session out to SSE subscribers.
+
+    A short backlog is replayed to late subscribers, since the client usually
+    connects right around the time the session starts. Lives on the event loop
+    thread; producers on other threads go through loop.call_soon_threadsafe.
+    """
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.backlog: deque = deque(maxlen=LOG_STREAM_BACKLOG_CHUNKS)
+        self.subscribers: List[asyncio.Queue] = []
+        self.producer_attached = False
+        self.closed = False
+        self.merged_into: Optional["SessionLogStream"] = None
+
+    def publish(self, text: str):
+        self.backlog.append(text)
+        for subscriber in self.subscribers:
+            try: subscriber.put_nowait(text)
+            except asyncio.QueueFull: pass # Slow consumer; it keeps what it already has queued.
+
+    def close(self):
+        self.closed = True
+        for subscriber in self.subscribers:
+            self._end(subscriber)
+
+    @staticmethod
+    def _end(subscriber: asyncio.Queue):
+        try: subscriber.put_nowait(None)
+        except asyncio.QueueFull:
+            # Make room for the end marker so the consumer always terminates.
+            subscriber.get_nowait()
+            subscriber.put_nowait(None)
+
+    async def subscribe(self) -> AsyncIterator[str]:
+        subscriber: asyncio.Queue = asyncio.Queue(maxsize=LOG_STREAM_SUBSCRIBER_CHUNKS)
+        for text in self.backlog:
+            subscriber.put_nowait(text)
+        if self.closed:
+            subscriber.put_nowait(None)
+        self.subscribers.append(subscriber)
+        try:
+            while True:
+                text = await subscriber.get()
+                if text is None:
+                    return
+                yield text
+        finally:
+            stream = self
+            while subscriber not in stream.subscribers and stream.merged_into:
+                stream = stream.merged_into
+            stream.subscribers.remove(subscriber)
+            if not stream.subscribers and not stream.producer_attached:
+                stream.discard() # Subscriber gave up before the session ever started.
+
+    def merge_into(self, target: "SessionLogStream"):
+        # Subscribers that connected under a coalesced request's id before the request
+        # arrived continue on the stream of the session it was coalesced onto.
+        self.merged_into = target
+        for subscriber in self.subscribers:
+            for text in target.backlog:
+                try: subscriber.put_nowait(text)
+                except asyncio.QueueFull: break
+            if target.closed: self._end(subscriber)
+            target.subscribers.append(subscriber)
+        self.subscribers = []
+
+    def discard(self):
+        # Also drops aliases registered for requests coalesced onto this session.
+        for session_id in [sid for sid, stream in log_streams.items() if stream is self]:
+            del log_streams[session_id]
+
+
+log_streams: Dict[str, SessionLogStream] = {}
+
+
+def get_log_stream(session_id: str) -> SessionLogStream:
+    stream = log_streams.get(session_id)
+    if stream is None:
+        stream = log_streams[session_id] = SessionLogStream(session_id)
+    return stream
+
+
+def end_log_stream(session_id: str):
+    # For a request that publishes no output of its own: its SSE feed just gets "end".
+    stream = get_log_stream(session_id)
+    stream.producer_attached = True
+    stream.close()
+    asyncio.get_running_loop().call_later(LOG_STREAM_LINGER_SECONDS, stream.discard)
+
+
+async def _end_log_stream_with(session: "FeedbackSession", session_id: str):
+    await session.done.wait()
+    end_log_stream(session_id)
+
+
+def alias_log_stream(session_id: str, session: "FeedbackSession"):
+    # A request coalesced onto an in-flight session follows that session's output. An SSE
+    # subscriber may already be waiting under the request's own id (server.py subscribes
+    # before it POSTs); it is moved onto the in-flight stream.
+    if not session.streams_logs:
+        get_log_stream(session_id).producer_attached = True
+        asyncio.create_task(_end_log_stream_with(session, session_id))
+        return
+    target = get_log_stream(session.session_id) # Created early if the session is still queued
+    existing = log_streams.get(session_id)
+    if existing is not None and existing is not target:
+        existing.merge_into(target)
+    log_streams[session_id] = target
+
+
+def _wait_for_gui_result(mp_result_queue: MPQueue, gui_process: Process, timeout: float,
+                         on_log: Optional[Callable[[str], None]] = None,
+                         on_metrics: Optional[Callable[[dict], None]] = None) -> FeedbackResult:
+    # Blocking wait for the GUI process result; runs on GUI_WAIT_EXECUTOR, never on the loop.
+    # Streamed ("log", text) messages are handed to on_log until the ("result", ...) arrives.
+    # The get() is sliced so a crashed (or terminated) GUI process is noticed within a
+    # second instead of holding the executor thread until the full timeout.
+    deadline = time.monotonic() + timeout
+    exited = False
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise queue.Empty
+        try:
+            kind, payload = mp_result_queue.get(timeout=0.5 if exited else min(remaining, 1.0))
+        except queue.Empty:
+            if exited:
+                raise RuntimeError(f"GUI process {gui_process.pid} exited (code {gui_process.exitcode}) without returning a result.")
+            # One last look after this: the result may have landed right before the process exited.
+            exited = not gui_process.is_alive()
+            continue
+        if kind == MSG_RESULT:
+            # Large logs arrive as a file; map it here, off the event loop. The API keeps the
+            # mapping (result["logs_buffer"]) and streams it into responses.
+            return open_log_handles(payload)
+        if kind == MSG_LOG and on_log:
+            on_log(payload)
+        elif kind == MSG_METRICS and on_metrics:
+            on_metrics(payload)
+        elif kind == MSG_CONFIG:
+            apply_config_change(payload)
+
+
+def _reap_gui_process(gui_process: Process, terminate_first: bool = False) -> None:
+    # Blocking join/terminate/kill escalation for a finished (or hung) GUI process.
+    # Always called through BACKGROUND_EXECUTOR so the event loop never waits on join().
+    if terminate_first and gui_process.is_alive():
+        logger.debug("Terminating GUI process %s.", gui_process.pid)
+        METRIC_TERMINATES.inc()
+        gui_process.terminate() # Send SIGTERM
+        gui_process.join(timeout=5.0) # Wait a bit
+        if gui_process.is_alive():
+            logger.warning("GUI process %s did not terminate after SIGTERM, attempting SIGKILL.", gui_process.pid)
+            METRIC_KILLS.inc()
+            gui_process.kill() # Send SIGKILL
+            gui_process.join(timeout=5.0) # Wait a bit more
+
+    # Ensure the process is joined (waited for) to clean up resources,
+    # regardless of how the request exited.
+    if gui_process.is_alive():
+        logger.debug("GUI process %s is still alive after result/exception, joining...", gui_process.pid)
+        gui_process.join(timeout=10.0) # Wait for the process to finish
+
+    if gui_process.is_alive(): # If still alive after join attempt
+        logger.warning("GUI process %s did not exit cleanly after join. Terminating forcefully.", gui_process.pid)
+        METRIC_TERMINATES.inc()
+        gui_process.terminate()
+        gui_process.join(timeout=5.0)
+        if gui_process.is_alive():
+            logger.warning("GUI process %s still alive after terminate. Killing.", gui_process.pid)
+            METRIC_KILLS.inc()
+            gui_process.kill()
+            gui_process.join(timeout=5.0) # Final wait
+
+    if gui_process.exitcode is not None:
+        logger.debug("GUI process %s finished. Exit code: %s.", gui_process.pid, gui_process.exitcode)
+    else:
+        logger.debug("GUI process %s finished. Exit code not available or process was killed.", gui_process.pid)
 
 
-# This function will be the target for the multiprocessing.Process
-def process_target_for_gui(project_dir: str, prompt_str: str, result_mp_queue: MPQueue):
-    # This function runs in the new process.
-    # It calls execute_feedback_ui_in_process which manages its own QApplication specific to this process.
-    print(f"DEBUG: process_target_for_gui started in PID {os.getpid()}, Python thread {threading.get_ident()}. About to call Qt logic.")
+class AdmissionTicket:
+    # One new session's claim on an admission slot; admitted is set once it may open its window.
+    def __init__(self, project: str, priority: int):
+        self.project, self.priority = project, priority
+        self.enqueued_at = time.monotonic()
+        self.admitted = asyncio.Event()
+        self.released = False
+
+
+class AdmissionController:
+    """Caps how many feedback windows are open at once, overall and per project.
+
+    Sessions that cannot open right away wait in a bounded priority queue (higher
+    priority first, FIFO within a priority); a waiter whose project is at its limit
+    is skipped so other projects are not held up behind it. When the queue is full,
+    new sessions are rejected with 429 and a Retry-After hint. Lives on the event
+    loop thread only.
+    """
+
+    def __init__(self, max_active: int, max_per_project: int, max_queued: int, retry_after_seconds: int):
+        self.max_active, self.max_per_project = max_active, max_per_project
+        self.max_queued, self.retry_after_seconds = max_queued, retry_after_seconds
+        self.active = 0
+        self.active_by_project: Dict[str, int] = {}
+        self.waiting: List[tuple[int, int, AdmissionTicket]] = [] # heap of (-priority, seq, ticket)
+        self.sequence = itertools.count()
+        self.admitted_total = 0
+        self.rejected_total = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def _has_slot(self, project: str) -> bool:
+        if self.max_active > 0 and self.active >= self.max_active: return False
+        return self.max_per_project <= 0 or self.active_by_project.get(project, 0) < self.max_per_project
+
+    def _admit(self, ticket: AdmissionTicket):
+        waited = time.monotonic() - ticket.enqueued_at
+        self.active += 1
+        self.active_by_project[ticket.project] = self.active_by_project.get(ticket.project, 0) + 1
+        self.admitted_total += 1
+        self.wait_seconds_total += waited
+        self.wait_seconds_max = max(self.wait_seconds_max, waited)
+        METRIC_ADMISSION_WAIT.observe(waited)
+        ticket.admitted.set()
+
+    def reserve(self, project: str, priority: int) -> AdmissionTicket:
+        # Called synchronously when a new session is created, so a full queue fails the request itself.
+        ticket = AdmissionTicket(project, priority)
+        if self._has_slot(project):
+            self._admit(ticket)
+        elif self.max_queued > 0 and len(self.waiting) >= self.max_queued:
+            self.rejected_total += 1
+            METRIC_ADMISSION_REJECTED.inc()
+            raise HTTPException(status_code=429, headers={"Retry-After": str(self.retry_after_seconds)},
+                                detail=f"Too many feedback sessions ({self.active} open, {len(self.waiting)} queued). Retry later.")
+        else:
+            heapq.heappush(self.waiting, (-priority, next(self.sequence), ticket))
+        return ticket
+
+    def release(self, ticket: AdmissionTicket):
+        if ticket.released: return
+        ticket.released = True
+        if not ticket.admitted.is_set():
+            # Cancelled while still queued.
+            self.waiting = [entry for entry in self.waiting if entry[2] is not ticket]
+            heapq.heapify(self.waiting)
+            return
+        self.active -= 1
+        remaining = self.active_by_project[ticket.project] - 1
+        if remaining: self.active_by_project[ticket.project] = remaining
+        else: del self.active_by_project[ticket.project]
+        self._dispatch()
+
+    def _dispatch(self):
+        blocked = []
+        while self.waiting and (self.max_active <= 0 or self.active < self.max_active):
+            entry = heapq.heappop(self.waiting)
+            if self._has_slot(entry[2].project): self._admit(entry[2])
+            else: blocked.append(entry)
+        for entry in blocked:
+            heapq.heappush(self.waiting, entry)
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        queued_by_project: Dict[str, int] = {}
+        for _, _, ticket in self.waiting:
+            queued_by_project[ticket.project] = queued_by_project.get(ticket.project, 0) + 1
+        return {
+            "max_active": self.max_active,
+            "max_per_project": self.max_per_project,
+            "max_queued": self.max_queued,
+            "active": self.active,
+            "queued": len(self.waiting),
+            "active_by_project": dict(self.active_by_project),
+            "queued_by_project": queued_by_project,
+            "oldest_queued_seconds": max((now - t.enqueued_at for _, _, t in self.waiting), default=0.0),
+            "admitted": self.admitted_total,
+            "rejected": self.rejected_total,
+            "average_wait_seconds": self.wait_seconds_total / self.admitted_total if self.admitted_total else 0.0,
+            "max_wait_seconds": self.wait_seconds_max,
+        }
+
+
+def create_admission_controller() -> AdmissionController:
+    return AdmissionController(MAX_ACTIVE_SESSIONS, MAX_SESSIONS_PER_PROJECT, MAX_QUEUED_SESSIONS, ADMISSION_RETRY_AFTER_SECONDS)
+
+
+# Replaced by lifespan at startup, from the settings as they are then.
+admission = create_admission_controller()
+
+
+def normalized_project_directory(project_directory: str) -> str:
+    return os.path.normcase(os.path.normpath(os.path.abspath(project_directory)))
+
+
+async def run_admitted_feedback_session(request: FeedbackRequest, session_id: str, ticket: AdmissionTicket) -> FeedbackResult:
+    # Waits for the admission slot (if queued), then runs the session; the slot is freed however it ends.
     try:
-        feedback_data = execute_feedback_ui_in_process(
-            project_directory=project_dir,
-            prompt=prompt_str
-        )
-        result_mp_queue.put(feedback_data)
-    except Exception as e_proc_target:
-        # Catch-all for unexpected errors within the process target function itself
-        # (though execute_feedback_ui_in_process should also catch its own errors)
-        tb_str = traceback.format_exc()
-        error_msg = f"CRITICAL ERROR in GUI Process {os.getpid()} (process_target_for_gui): {str(e_proc_target)}\nTraceback:\n{tb_str}"
-        print(error_msg)
-        result_mp_queue.put(FeedbackResult(logs=error_msg, interactive_feedback=""))
+        if not ticket.admitted.is_set():
+            logger.debug("Session %s queued for admission (%s waiting).", session_id, len(admission.waiting))
+            await ticket.admitted.wait()
+        return await run_feedback_session(request, session_id)
     finally:
-        print(f"DEBUG: process_target_for_gui finished in PID {os.getpid()}. Result (or error) placed in MPQueue.")
+        admission.release(ticket)
 
 
-@app.post("/run_feedback_ui/", response_model=FeedbackResponse)
-async def api_trigger_feedback_ui(request: FeedbackRequest):
-    # Use multiprocessing.Queue for inter-process communication
-    mp_result_queue = MPQueue()
+def feedback_backend(request: FeedbackRequest) -> str:
+    backend = request.backend or FEEDBACK_BACKEND
+    if backend not in ("qt", "browser"):
+        logger.warning("Unknown UI_BACKEND %r; using the Qt window.", backend)
+        return "qt"
+    return backend
 
-    print(f"DEBUG: FastAPI (PID {os.getpid()}): Received request. Creating GUI process for: {request.project_directory}")
-    
-    # Create and start the new process
-    # Important: On some platforms (like Windows, or macOS with 'spawn' start method), 
-    # the target function and its arguments must be picklable. Standard types are fine.
-    gui_process = Process(target=process_target_for_gui, args=(
-        request.project_directory,
-        request.prompt,
-        mp_result_queue
-    ))
-    gui_process.daemon = True # Allows main FastAPI process to exit even if child hangs, though we try to join.
-    gui_process.start()
-    print(f"DEBUG: FastAPI: Started GUI process {gui_process.pid}")
+
+def feedback_log_policy(request: FeedbackRequest) -> LogPolicy:
+    log_policy = LogPolicy(full_logs=request.full_logs,
+                           condense=LOG_CONDENSE if request.condense_logs is None else request.condense_logs)
+    if request.max_log_bytes is not None:
+        log_policy["max_log_bytes"] = request.max_log_bytes
+    return log_policy
+
+
+def browser_ui_url(session_id: str) -> str:
+    return f"{BROWSER_BASE_URL}/ui/{session_id}?token={session_token(session_id)}"
+
+
+browser_sessions: Dict[str, BrowserFeedbackSession] = {}
+
+
+async def run_browser_feedback_session(request: FeedbackRequest, session_id: str) -> FeedbackResult:
+    # Browser backend: no GUI process; the form is served at /ui/{session_id} and its command runs
+    # in this process. The page follows its console over the session's SSE log stream.
+    loop = asyncio.get_running_loop()
+    phase_timer = SessionPhaseTimer()
+    log_stream = get_log_stream(session_id)
+    log_stream.producer_attached = True
+    log_policy = feedback_log_policy(request)
+    session = BrowserFeedbackSession(request.project_directory, request.prompt, log_policy,
+                                     on_output=log_stream.publish, metrics_sink=phase_timer)
+    browser_sessions[session_id] = session
+    url = browser_ui_url(session_id)
+    logger.info("Feedback form for %s is open at %s", request.project_directory, url)
+    if BROWSER_OPEN:
+        loop.run_in_executor(BACKGROUND_EXECUTOR, open_in_browser, url)
+    try:
+        result = await asyncio.wait_for(session.result, GUI_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        logger.error("Browser feedback session %s timed out.", session_id)
+        METRIC_TIMEOUTS.inc()
+        raise HTTPException(status_code=504, detail="GUI interaction timed out.")
+    finally:
+        del browser_sessions[session_id]
+        session.close()
+        log_stream.close()
+        loop.call_later(LOG_STREAM_LINGER_SECONDS, log_stream.discard)
+    result = await loop.run_in_executor(BACKGROUND_EXECUTOR, open_log_handles, result)
+    phase_timer.result_received(result)
+    return result
+
+
+async def run_feedback_session(request: FeedbackRequest, session_id: str) -> FeedbackResult:
+    # Shows one feedback UI (session host tab, pool worker or fresh process) and waits for its result.
+    if feedback_backend(request) == "browser":
+        return await run_browser_feedback_session(request, session_id)
+    loop = asyncio.get_running_loop()
+    phase_timer = SessionPhaseTimer()
+    worker = gui_pool.acquire() if gui_pool and not session_host else None
+    log_stream = get_log_stream(request.session_id) if request.session_id else None
+    on_log = None
+    if log_stream:
+        log_stream.producer_attached = True
+        on_log = lambda text: loop.call_soon_threadsafe(log_stream.publish, text)
+    job_options = FeedbackJobOptions(stream_logs=log_stream is not None, log_policy=feedback_log_policy(request))
+    if config_store:
+        job_options["settings"] = config_store.settings(normalized_project_directory(request.project_directory))
+
+    if session_host:
+        # Session-manager mode: the shared Qt process opens this request as one more tab.
+        logger.debug("Received request. Opening session %s in GUI session host for: %s", session_id, request.project_directory)
+        gui_process, mp_result_queue = session_host.open_session(session_id, request.project_directory, request.prompt, job_options)
+    elif worker:
+        # A pre-warmed worker already has its QApplication; hand it the job directly.
+        logger.debug("Received request. Dispatching to GUI pool worker %s for: %s", worker.process.pid, request.project_directory)
+        worker.submit(request.project_directory, request.prompt, job_options)
+        gui_process, mp_result_queue = worker.process, worker.result_queue
+    else:
+        # Use multiprocessing.Queue for inter-process communication
+        mp_result_queue = MPQueue()
+        logger.debug("Received request. Creating GUI process for: %s", request.project_directory)
+
+        # Create and start the new process
+        # Important: On some platforms (like Windows, or macOS with 'spawn' start method), 
+        # the target function and its arguments must be picklable. Standard types are fine.
+        gui_process = Process(target=process_target_for_gui, args=(
+            request.project_directory,
+            request.prompt,
+            mp_result_queue,
+            job_options
+        ))
+        gui_process.daemon = True # Allows main FastAPI process to exit even if child hangs, though we try to join.
+        start_gui_process(gui_process)
+        logger.debug("Started GUI process %s", gui_process.pid)
 
     final_result = None
+    terminate_first = False
+    cancelled = False
     try:
-        # Wait for the result from the process queue. Timeout is crucial.
-        final_result = mp_result_queue.get(timeout=3600.0) # 1 hour timeout
-        print(f"DEBUG: FastAPI: Got result from process queue (PID {gui_process.pid}): Logs len {len(final_result['logs']) if final_result and 'logs' in final_result else -1}")
+        # Wait for the result from the process queue without blocking the event loop:
+        # the blocking get() runs on GUI_WAIT_EXECUTOR, so other requests (and health
+        # checks) keep being served while a human is answering.
+        final_result = await loop.run_in_executor(
+            GUI_WAIT_EXECUTOR, _wait_for_gui_result, mp_result_queue, gui_process, GUI_TIMEOUT_SECONDS, on_log, phase_timer)
+        phase_timer.result_received(final_result)
+        logger.debug("Got result from process queue (PID %s): Logs len %s", gui_process.pid, final_result['logs_buffer'].size if 'logs_buffer' in final_result else len(final_result['logs']))
     except queue.Empty: # This is the correct exception for MPQueue.get(timeout=...)
-        print(f"ERROR: FastAPI: GUI interaction (multiprocessing PID {gui_process.pid}) timed out.")
-        if gui_process.is_alive():
-            print(f"DEBUG: FastAPI: Terminating hung GUI process {gui_process.pid} due to timeout.")
-            gui_process.terminate() # Send SIGTERM
-            gui_process.join(timeout=5.0) # Wait a bit
-            if gui_process.is_alive():
-                 print(f"WARNING: FastAPI: GUI process {gui_process.pid} did not terminate after SIGTERM, attempting SIGKILL.")
-                 gui_process.kill() # Send SIGKILL
-                 gui_process.join(timeout=5.0) # Wait a bit more
+        logger.error("GUI interaction (multiprocessing PID %s) timed out.", gui_process.pid)
+        terminate_first = True
+        METRIC_TIMEOUTS.inc()
         raise HTTPException(status_code=504, detail="GUI interaction timed out.")
+    except asyncio.CancelledError:
+        # Client went away; don't leave the window (and its process) behind.
+        logger.debug("Request cancelled, closing GUI process %s.", gui_process.pid)
+        terminate_first = cancelled = True
+        raise
     except Exception as e_queue:
-        print(f"ERROR: FastAPI: Error retrieving result from process queue (PID {gui_process.pid}): {e_queue}")
-        if gui_process.is_alive(): # Clean up process on other errors too
-            gui_process.terminate()
-            gui_process.join(timeout=5.0)
+        logger.error("Error retrieving result from process queue (PID %s): %s", gui_process.pid, e_queue)
+        terminate_first = True # Clean up process on other errors too
+        METRIC_ERRORS.inc()
         raise HTTPException(status_code=500, detail=f"Error processing GUI result: {str(e_queue)}")
     finally:
-        # Ensure the process is joined (waited for) to clean up resources,
-        # regardless of how the try block exited.
-        if gui_process.is_alive():
-            print(f"DEBUG: FastAPI: GUI process {gui_process.pid} is still alive after result/exception, joining...")
-            gui_process.join(timeout=10.0) # Wait for the process to finish
-        
-        if gui_process.is_alive(): # If still alive after join attempt
-            print(f"WARNING: FastAPI: GUI process {gui_process.pid} did not exit cleanly after join. Terminating forcefully.")
-            gui_process.terminate()
-            gui_process.join(timeout=5.0)
-            if gui_process.is_alive():
-                print(f"WARNING: FastAPI: GUI process {gui_process.pid} still alive after terminate. Killing.")
-                gui_process.kill()
-                gui_process.join(timeout=5.0) # Final wait
-
-        exit_code_msg = f"DEBUG: FastAPI: GUI process {gui_process.pid} finished."
-        if hasattr(gui_process, 'exitcode') and gui_process.exitcode is not None:
-            exit_code_msg += f" Exit code: {gui_process.exitcode}."
+        if log_stream:
+            # Queued behind any call_soon_threadsafe publishes, so subscribers see every chunk first.
+            loop.call_soon_threadsafe(log_stream.close)
+            # Linger briefly so a subscriber arriving just after the end still gets backlog + "end".
+            loop.call_later(LOG_STREAM_LINGER_SECONDS, log_stream.discard)
+        if session_host:
+            # Only this session's tab is closed (if still open); the host keeps serving others.
+            session_host.close_session(session_id, cancel=terminate_first)
+        elif worker:
+            # Pool workers stay alive for the next job unless their window had to be killed.
+            gui_pool.release(worker, healthy=not terminate_first)
         else:
-            exit_code_msg += " Exit code not available or process was killed."
-        print(exit_code_msg)
-        
-        # Close the queue from the parent side to signal no more data will be sent/received
-        # and help with resource cleanup.
-        mp_result_queue.close()
-        mp_result_queue.join_thread() # Wait for the queue's feeder thread to finish
+            # Joining may take a while (or escalate to terminate/kill), so it is handed to
+            # BACKGROUND_EXECUTOR. Not awaited when cancelled: the task is already being torn down.
+            reap_future = loop.run_in_executor(BACKGROUND_EXECUTOR, _reap_gui_process, gui_process, terminate_first)
+            if not cancelled:
+                await reap_future
+            # Close the queue from the parent side to signal no more data will be sent/received
+            # and help with resource cleanup. join_thread() is skipped: the parent never put()
+            # anything, so there is no feeder thread to wait for.
+            mp_result_queue.close()
 
 
     if final_result is None: 
         # This case should be less likely if process_target_for_gui always puts something.
+        METRIC_ERRORS.inc()
         raise HTTPException(status_code=500, detail="GUI process did not return a valid result (None received).")
     
     if "CRITICAL ERROR" in final_result.get("logs", "") or "Fatal Qt Error" in final_result.get("logs", ""):
-         print(f"ERROR: FastAPI: Critical error reported from GUI process {gui_process.pid if gui_process else 'N/A'}: {final_result['logs']}")
+         logger.error("Critical error reported from GUI process %s: %s", gui_process.pid if gui_process else 'N/A', final_result['logs'])
+    return final_result
 
-    if request.server_save_path:
-        try:
-            output_dir = os.path.dirname(request.server_save_path)
-            if output_dir: os.makedirs(output_dir, exist_ok=True)
-            with open(request.server_save_path, "w", encoding="utf-8") as f:
-                json.dump(final_result, f, indent=4)
-            print(f"INFO: FastAPI: Feedback result saved to: {request.server_save_path}")
-        except Exception as e:
-            print(f"WARNING: FastAPI: Could not save feedback result to {request.server_save_path}: {e}")
 
-    return FeedbackResponse(**final_result)
+def feedback_request_key(request: FeedbackRequest) -> str:
+    # Identical questions about the same project share one window and one answer.
+    project_directory = normalized_project_directory(request.project_directory)
+    prompt = " ".join(request.prompt.split())
+    return hashlib.sha256(f"{project_directory}\0{prompt}".encode("utf-8")).hexdigest()
+
+
+class FeedbackResultCache:
+    """Small LRU of recently submitted answers with a TTL, keyed by feedback_request_key().
+
+    Lives on the event loop thread. Expired entries are dropped by a timer as well, since
+    a cached result may hold a mapped log file that is only deleted once it is released.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries, self.ttl_seconds = max_entries, ttl_seconds
+        self.entries: "OrderedDict[str, tuple[float, FeedbackResult]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[FeedbackResult]:
+        entry = self.entries.get(key)
+        if entry is None: return None
+        if entry[0] < time.monotonic():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, key: str, result: FeedbackResult):
+        if self.max_entries <= 0 or self.ttl_seconds <= 0: return
+        self.purge_expired()
+        self.entries[key] = (time.monotonic() + self.ttl_seconds, result)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        asyncio.get_running_loop().call_later(self.ttl_seconds, self.purge_expired)
+
+    def purge_expired(self):
+        now = time.monotonic()
+        for key in [key for key, (expires_at, _) in self.entries.items() if expires_at <= now]:
+            del self.entries[key]
+
+
+class FeedbackSession:
+    """A feedback session as seen by the API: the task showing its UI and the outcome.
+
+    Sessions are shared by every identical request coalesced onto them, can be
+    polled and cancelled through /sessions/{id}, and are kept for
+    SESSION_RETENTION_SECONDS after they finish so a client can still fetch the result.
+    """
+
+    def __init__(self, session_id: str, key: str):
+        self.session_id, self.key = session_id, key
+        self.status = "pending" # pending | completed | failed | cancelled
+        self.result: Optional[FeedbackResult] = None
+        self.error: Optional[HTTPException] = None
+        self.created_at, self.finished_at = time.time(), None
+        self.done = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.waiters = 0 # Blocking /run_feedback_ui/ requests currently waiting on it
+        self.detached = False # Created through POST /sessions: only DELETE or the timeout end it
+        self.save_paths: List[str] = []
+        self.ticket: Optional[AdmissionTicket] = None
+        self.ui_url: Optional[str] = None # Browser backend only
+        self.streams_logs = False # Output is published on log_streams[session_id]
+
+    def finish(self, status: str, result: Optional[FeedbackResult] = None, error: Optional[HTTPException] = None):
+        self.status, self.result, self.error = status, result, error
+        self.finished_at = time.time()
+        self.done.set()
+        if result is not None:
+            for path in self.save_paths:
+                BACKGROUND_EXECUTOR.submit(save_feedback_result, path, result)
+
+    def cancel(self):
+        if self.task and not self.task.done():
+            self.task.cancel()
+
+    def outcome(self) -> FeedbackResult:
+        # The result of a finished session, or the HTTP error it ended with.
+        if self.status == "completed":
+            return self.result
+        if self.status == "cancelled":
+            raise HTTPException(status_code=410, detail="Feedback session was cancelled.")
+        raise self.error
+
+    def describe(self) -> "FeedbackSessionStatus":
+        return FeedbackSessionStatus(
+            session_id=self.session_id, status=self.status,
+            created_at=self.created_at, finished_at=self.finished_at,
+            result=FeedbackResponse(**self.result) if self.result is not None else None,
+            error=self.error.detail if self.error is not None else None,
+            queued=self.status == "pending" and self.ticket is not None and not self.ticket.admitted.is_set(),
+            ui_url=self.ui_url)
+
+
+result_cache = FeedbackResultCache(RESULT_CACHE_MAX_ENTRIES, RESULT_CACHE_TTL_SECONDS)
+feedback_sessions: Dict[str, FeedbackSession] = {}
+inflight_feedback: Dict[str, FeedbackSession] = {}
+
+
+def save_feedback_result(path: str, result: FeedbackResult):
+    # Runs on BACKGROUND_EXECUTOR so the file write never blocks the event loop.
+    try:
+        output_dir = os.path.dirname(path)
+        if output_dir: os.makedirs(output_dir, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            if "logs_buffer" in result:
+                f.writelines(iter_feedback_json(result))
+            else:
+                json.dump(result, f, indent=4)
+        logger.info("Feedback result saved to: %s", path)
+    except Exception as e:
+        logger.warning("Could not save feedback result to %s: %s", path, e)
+
+
+def _iter_json_with_logs(document: dict, placeholder: str, buffer: LogBuffer) -> Iterator[str]:
+    # Renders document as JSON with the placeholder string replaced by the buffer's text,
+    # escaped chunk by chunk so the logs are never materialized as one string.
+    prefix, suffix = json.dumps(document).split(json.dumps(placeholder), 1)
+    yield prefix + '"'
+    for text in buffer.iter_text():
+        yield json.dumps(text)[1:-1]
+    yield '"' + suffix
+
+
+def iter_feedback_json(result: FeedbackResult) -> Iterator[str]:
+    placeholder = f"logs-{uuid.uuid4().hex}"
+    document = FeedbackResponse(logs=placeholder, interactive_feedback=result["interactive_feedback"],
+                                command_stats=result.get("command_stats", []), commands=result.get("commands", [])).model_dump()
+    return _iter_json_with_logs(document, placeholder, result["logs_buffer"])
+
+
+def feedback_response(result: FeedbackResult) -> Union[FeedbackResponse, StreamingResponse]:
+    # Results with mapped logs are streamed straight from the buffer (sync iterators run in a threadpool).
+    if "logs_buffer" not in result:
+        return FeedbackResponse(**result)
+    return StreamingResponse(iter_feedback_json(result), media_type="application/json")
+
+
+def session_status_response(session: FeedbackSession) -> Union[FeedbackSessionStatus, StreamingResponse]:
+    status = session.describe()
+    if session.result is None or "logs_buffer" not in session.result:
+        return status
+    placeholder = f"logs-{uuid.uuid4().hex}"
+    status.result.logs = placeholder
+    return StreamingResponse(_iter_json_with_logs(status.model_dump(), placeholder, session.result["logs_buffer"]),
+                             media_type="application/json")
+
+
+def _forget_session(session: FeedbackSession):
+    if feedback_sessions.get(session.session_id) is session:
+        del feedback_sessions[session.session_id]
+
+
+history: Optional[HistoryStore] = None
+config_store: Optional[ConfigStore] = None
+
+
+def apply_config_change(payload: dict):
+    # A MSG_CONFIG from a GUI process; called from GUI_WAIT_EXECUTOR threads and the session host router.
+    if config_store is None: return
+    if payload.get("project_directory") is not None:
+        payload = {**payload, "project_directory": normalized_project_directory(payload["project_directory"])}
+    config_store.apply_message(payload)
+
+
+def record_session_history(session: FeedbackSession, request: FeedbackRequest):
+    # Hands the finished session to the history writer thread; nothing is written on the loop.
+    if history is None: return
+    entry = {
+        "session_id": session.session_id,
+        "project_directory": normalized_project_directory(request.project_directory),
+        "prompt": request.prompt,
+        "status": session.status,
+        "created_at": session.created_at,
+        "finished_at": session.finished_at,
+        "error": session.error.detail if session.error is not None else None,
+    }
+    if session.result is not None:
+        entry["interactive_feedback"] = session.result["interactive_feedback"]
+        if HISTORY_STORE_LOGS:
+            entry["logs"] = session.result["logs"]
+            if "logs_buffer" in session.result: entry["logs_buffer"] = session.result["logs_buffer"]
+    history.record(entry)
+
+
+def _on_session_task_done(session: FeedbackSession, request: FeedbackRequest, task: asyncio.Task):
+    # Normally already released by run_admitted_feedback_session; not if the task was cancelled before it started.
+    if session.ticket: admission.release(session.ticket)
+    if inflight_feedback.get(session.key) is session:
+        del inflight_feedback[session.key]
+    if task.cancelled():
+        session.finish("cancelled")
+    elif isinstance(task.exception(), HTTPException):
+        session.finish("failed", error=task.exception())
+    elif task.exception() is not None:
+        METRIC_ERRORS.inc()
+        session.finish("failed", error=HTTPException(status_code=500, detail=f"Error processing GUI result: {task.exception()}"))
+    else:
+        session.finish("completed", result=task.result())
+        if request.dedupe: result_cache.put(session.key, session.result)
+    record_session_history(session, request)
+    asyncio.get_running_loop().call_later(SESSION_RETENTION_SECONDS, _forget_session, session)
+
+
+def start_feedback_session(request: FeedbackRequest) -> FeedbackSession:
+    # Returns the session answering this request: a cached answer, an identical in-flight
+    # session (single flight), or a newly started one.
+    session_id = request.session_id or uuid.uuid4().hex
+    key = feedback_request_key(request)
+    if request.dedupe:
+        cached = result_cache.get(key)
+        if cached is not None:
+            logger.debug("Returning cached answer for an identical request (%s).", key[:12])
+            session = FeedbackSession(session_id, key)
+            if request.server_save_path: session.save_paths.append(request.server_save_path)
+            session.finish("completed", result=cached)
+            if request.session_id: end_log_stream(request.session_id)
+            record_session_history(session, request)
+            feedback_sessions[session_id] = session
+            asyncio.get_running_loop().call_later(SESSION_RETENTION_SECONDS, _forget_session, session)
+            return session
+        session = inflight_feedback.get(key)
+        if session is not None:
+            # A retry of a question the human is already answering: join that window.
+            logger.debug("Coalescing request onto in-flight session %s (%s).", session.session_id, key[:12])
+            if request.session_id and request.session_id != session.session_id:
+                alias_log_stream(request.session_id, session)
+            if request.server_save_path: session.save_paths.append(request.server_save_path)
+            return session
+    # Only sessions that will open a window go through admission control (raises 429 when full).
+    ticket = admission.reserve(normalized_project_directory(request.project_directory), request.priority)
+    session = FeedbackSession(session_id, key)
+    session.ticket = ticket
+    if feedback_backend(request) == "browser": session.ui_url = browser_ui_url(session_id)
+    session.streams_logs = request.session_id is not None or session.ui_url is not None
+    if request.server_save_path: session.save_paths.append(request.server_save_path)
+    session.task = asyncio.create_task(run_admitted_feedback_session(request, session_id, ticket))
+    session.task.add_done_callback(lambda task: _on_session_task_done(session, request, task))
+    feedback_sessions[session_id] = session
+    if request.dedupe: inflight_feedback[key] = session
+    return session
+
+
+@app.post("/run_feedback_ui/", response_model=FeedbackResponse)
+async def api_trigger_feedback_ui(request: FeedbackRequest, http_request: Request):
+    # Blocking variant: holds the request open until the human answers.
+    # Prefer POST /sessions + GET /sessions/{id} for long waits.
+    if feedback_backend(request) == "browser": _require_local_client(http_request, "Browser feedback sessions")
+    session = start_feedback_session(request)
+    session.waiters += 1
+    try:
+        await session.done.wait()
+    finally:
+        session.waiters -= 1
+        # The last waiter going away (client disconnect) closes the window, as before.
+        if session.waiters == 0 and not session.detached:
+            session.cancel()
+    return feedback_response(session.outcome())
+
+
+@app.post("/sessions", response_model=FeedbackSessionStatus)
+async def api_create_feedback_session(request: FeedbackRequest, http_request: Request):
+    # Job-style API: returns at once; poll GET /sessions/{id} for the answer.
+    if feedback_backend(request) == "browser": _require_local_client(http_request, "Browser feedback sessions")
+    session = start_feedback_session(request)
+    session.detached = True
+    return session_status_response(session)
+
+
+@app.get("/sessions/{session_id}", response_model=FeedbackSessionStatus)
+async def api_get_feedback_session(session_id: str, wait: float = 0.0):
+    # Long-poll: waits up to `wait` seconds (capped at LONG_POLL_MAX_SECONDS) for the session to finish.
+    session = feedback_sessions.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail=f"Unknown feedback session {session_id}.")
+    if wait > 0 and not session.done.is_set():
+        try: await asyncio.wait_for(session.done.wait(), timeout=min(wait, LONG_POLL_MAX_SECONDS))
+        except asyncio.TimeoutError: pass
+    return session_status_response(session)
+
+
+@app.delete("/sessions/{session_id}", response_model=FeedbackSessionStatus)
+async def api_cancel_feedback_session(session_id: str):
+    # Closes the session's window (killing its GUI worker, or just its tab in session-host mode).
+    session = feedback_sessions.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail=f"Unknown feedback session {session_id}.")
+    session.cancel()
+    await session.done.wait()
+    return session_status_response(session)
+
+
+@app.get("/sessions/{session_id}/logs")
+async def api_stream_session_logs(session_id: str):
+    # Server-sent events: one "log" event per output chunk, then a single "end" event
+    # once the session's window has closed. Subscribing before the session starts is fine.
+    stream = get_log_stream(session_id)
+
+    async def event_source():
+        async for text in stream.subscribe():
+            yield f"event: log\ndata: {json.dumps({'text': text})}\n\n"
+        yield "event: end\ndata: {}\n\n"
+
+    return StreamingResponse(event_source(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+class BrowserCommand(BaseModel):
+    command: str
+
+class BrowserAnswer(BaseModel):
+    interactive_feedback: str = ""
+
+
+def _require_local_client(request: Request, what: str):
+    # The server listens on all interfaces, but whatever can run commands on this machine (a
+    # browser session's form, a stored run_command) or read their output is only served to
+    # clients on it: loopback (including SSH port forwards) or the Unix domain socket.
+    if request.client is None or not request.client.host: return # Unix domain socket
+    try: local = ipaddress.ip_address(request.client.host).is_loopback
+    except ValueError: local = False
+    if not local:
+        raise HTTPException(status_code=403, detail=f"{what} can only be used from this machine.")
+
+
+def get_browser_session(session_id: str, token: Optional[str], request: Request) -> BrowserFeedbackSession:
+    _require_local_client(request, "Browser feedback sessions")
+    if not token_matches(session_id, token):
+        raise HTTPException(status_code=403, detail="Invalid or missing token.")
+    session = browser_sessions.get(session_id)
+    if session is None:
+        pending = feedback_sessions.get(session_id)
+        if pending is not None and pending.status == "pending":
+            raise HTTPException(status_code=409, detail="The session is still waiting for a free slot.")
+        raise HTTPException(status_code=404, detail="Feedback session is not open.")
+    return session
+
+
+@app.get("/ui/{session_id}", response_class=HTMLResponse)
+async def api_browser_feedback_page(session_id: str, request: Request, token: Optional[str] = None):
+    # The feedback form of a browser-backend session; its actions are the POST /ui/{session_id}/... endpoints.
+    _require_local_client(request, "Browser feedback sessions")
+    if not token_matches(session_id, token):
+        raise HTTPException(status_code=403, detail="Invalid or missing token.")
+    session = browser_sessions.get(session_id)
+    if session is None:
+        pending = feedback_sessions.get(session_id)
+        if pending is not None and pending.status == "pending":
+            return HTMLResponse(render_notice_page("Waiting for a free feedback slot...", BROWSER_QUEUED_REFRESH_SECONDS))
+        return HTMLResponse(render_notice_page("This feedback session has ended."), status_code=404)
+    session.mark_shown()
+    stored = config_store.project(normalized_project_directory(session.project_directory)) if config_store else None
+    return HTMLResponse(render_feedback_page(session_id, token, session.project_directory, session.prompt,
+                                             stored["run_command"] if stored else ""))
+
+
+@app.get("/ui/{session_id}/state")
+async def api_browser_session_state(session_id: str, request: Request, token: Optional[str] = None):
+    return get_browser_session(session_id, token, request).state()
+
+
+@app.post("/ui/{session_id}/run")
+async def api_browser_run_command(session_id: str, body: BrowserCommand, request: Request, token: Optional[str] = None):
+    session = get_browser_session(session_id, token, request)
+    if not session.run(body.command.strip()):
+        raise HTTPException(status_code=409, detail="A command is already running.")
+    return session.state()
+
+
+@app.post("/ui/{session_id}/stop")
+async def api_browser_stop_command(session_id: str, request: Request, token: Optional[str] = None):
+    session = get_browser_session(session_id, token, request)
+    session.stop()
+    return session.state()
+
+
+@app.post("/ui/{session_id}/submit")
+async def api_browser_submit_feedback(session_id: str, body: BrowserAnswer, request: Request, token: Optional[str] = None):
+    session = get_browser_session(session_id, token, request)
+    if not session.submit(body.interactive_feedback):
+        raise HTTPException(status_code=409, detail="Feedback was already submitted.")
+    return session.state()
+
+
+@app.post("/ui/{session_id}/cancel")
+async def api_browser_cancel_feedback(session_id: str, request: Request, token: Optional[str] = None):
+    # Like closing the Qt window: the session completes with empty feedback.
+    session = get_browser_session(session_id, token, request)
+    if not session.submit(""):
+        raise HTTPException(status_code=409, detail="Feedback was already submitted.")
+    return session.state()
+
+
+@app.get("/sessions/{session_id}/raw_logs", response_class=PlainTextResponse)
+async def api_session_raw_logs(session_id: str):
+    # The uncondensed log of a finished session (its logs field as-is when it was not condensed).
+    session = feedback_sessions.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail=f"Unknown feedback session {session_id}.")
+    if session.status != "completed":
+        raise HTTPException(status_code=409, detail=f"Feedback session is {session.status}.")
+    result = session.result
+    buffer = result.get("raw_logs_buffer") or (None if "raw_logs" in result else result.get("logs_buffer"))
+    if buffer is not None:
+        return StreamingResponse(buffer.iter_text(), media_type="text/plain; charset=utf-8")
+    return PlainTextResponse(result.get("raw_logs", result["logs"]))
+
+
+@app.post("/environment/invalidate/")
+async def api_invalidate_environment():
+    # Drops the cached user environment and project env overlays, then re-forks idle pool
+    # workers from the fresh snapshot. Busy workers pick it up once they are recycled.
+    invalidate_user_environment_cache()
+    get_user_environment()
+    if gui_pool:
+        gui_pool.recycle_idle()
+    return {"invalidated": True}
+
+
+@app.get("/workers/")
+async def api_worker_pool_status():
+    # Reports how many pre-warmed GUI workers are idle or busy (or the session host's load).
+    if session_host is not None:
+        return {"enabled": False, "size": 0, "idle": 0, "busy": 0, "session_host": session_host.stats()}
+    if gui_pool is None:
+        return {"size": 0, "idle": 0, "busy": 0, "enabled": False}
+    return {"enabled": True, **gui_pool.stats()}
+
+
+@app.get("/history")
+async def api_feedback_history(request: Request, project_directory: Optional[str] = None, prompt: Optional[str] = None,
+                               status: Optional[str] = None, since: Optional[float] = None,
+                               until: Optional[float] = None, limit: int = 50, include_logs: bool = False):
+    # Past sessions, newest first. prompt matches by (whitespace-normalized) hash; since/until are epoch seconds.
+    _require_local_client(request, "Feedback history")
+    if history is None:
+        raise HTTPException(status_code=404, detail="Feedback history is disabled (UI_HISTORY_DB).")
+    if project_directory is not None:
+        project_directory = normalized_project_directory(project_directory)
+    entries = await asyncio.get_running_loop().run_in_executor(
+        BACKGROUND_EXECUTOR, lambda: history.query(project_directory, prompt, status, since, until, limit, include_logs))
+    return {"entries": entries, "writer": history.stats()}
+
+
+def _require_config_store() -> ConfigStore:
+    if config_store is None:
+        raise HTTPException(status_code=404, detail="The config store is disabled (UI_CONFIG_DB).")
+    return config_store
+
+
+@app.get("/projects/config", response_model=ProjectConfigResponse)
+async def get_project_config(project_directory: str, request: Request):
+    # Served from memory; projects not in the store yet get the defaults (stored: false).
+    _require_local_client(request, "Project configs")
+    store = _require_config_store()
+    key = normalized_project_directory(project_directory)
+    config = store.project(key)
+    return ProjectConfigResponse(project_directory=key, stored=config is not None, **(config or DEFAULT_PROJECT_CONFIG))
+
+
+@app.put("/projects/config", response_model=ProjectConfigResponse)
+async def update_project_config(update: ProjectConfigUpdate, request: Request):
+    # Takes effect for the next window of the project; the write to disk is debounced. A project
+    # still only in QSettings gets the rest of its config from there when its first window opens.
+    _require_local_client(request, "Project configs")
+    store = _require_config_store()
+    key = normalized_project_directory(update.project_directory)
+    config = store.update(key, update.model_dump(exclude_none=True, exclude={"project_directory"}))
+    return ProjectConfigResponse(project_directory=key, stored=True, **config)
+
+
+@app.get("/admission/")
+async def api_admission_status():
+    # Admission control: open and queued sessions (overall and per project) and queue wait times.
+    return admission.stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def api_metrics():
+    # Prometheus text exposition of per-phase latency histograms and failure counters.
+    lines = []
+    for metric in ALL_METRICS:
+        lines += metric.render()
+    return PlainTextResponse("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
 
 
 if __name__ == "__main__":
@@ -641,8 +1500,11 @@ if __name__ == "__main__":
     # import multiprocessing as mp
     # mp.set_start_method('spawn', force=True) # if needed, place at very top of script
 
-    print("Starting FastAPI server...")
+    logger.info("Starting FastAPI server...")
     # To run the FastAPI server:
     # uvicorn your_script_name:app --host 0.0.0.0 --port API_PORT
-    uvicorn.run(app, host="0.0.0.0", port=API_PORT)
+    if API_UDS:
+        uvicorn.run(app, uds=API_UDS)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=API_PORT)
 
@@ -0,0 +1,353 @@
+# Watch mode for the feedback window: notices changes under the project directory and calls
+# back after a quiet period, so the window can stop the running command and rerun it.
+#
+# On Linux the watcher uses inotify (through ctypes, one watch per directory) and sleeps in
+# poll() between events; elsewhere, or when inotify is unavailable or out of watches, it
+# rescans the tree, never spending more than WATCH_POLL_CPU_SHARE of its time scanning.
+# Directories and files ignored by git (.gitignore, .git/info/exclude, the global excludes)
+# are not watched or reported; outside git work trees SCAN_SKIP_DIRS are skipped.
+# Changes made while the rerun a change triggered is in progress, or within one quiet period
+# after it finished, are dropped: they are the run's own output, and would trigger it again.
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+import logging
+import threading
+import subprocess
+from typing import Optional, Callable, Dict, List, Set, Tuple
+
+from feedback_command_cache import SCAN_SKIP_DIRS
+
+logger = logging.getLogger("feedback_watch")
+
+# Quiet period after the last change before the callback fires; a steady stream of changes
+# still fires after WATCH_MAX_DELAY_FACTOR quiet periods.
+WATCH_DEBOUNCE_SECONDS = float(os.environ.get("UI_WATCH_DEBOUNCE_MS", 300)) / 1000
+WATCH_MAX_DELAY_FACTOR = 5
+# "auto" (inotify where available, else polling), "inotify" or "poll".
+WATCH_BACKEND = os.environ.get("UI_WATCH_BACKEND", "auto").lower()
+WATCH_POLL_INTERVAL_SECONDS = float(os.environ.get("UI_WATCH_POLL_INTERVAL", 1.0))
+WATCH_POLL_CPU_SHARE = 0.05
+GIT_TIMEOUT_SECONDS = 30.0
+
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_EXCL_UNLINK = 0x04000000
+IN_ISDIR = 0x40000000
+# Writes are reported once, on close; editors that save by renaming show up as IN_MOVED_TO.
+INOTIFY_MASK = (IN_CLOSE_WRITE | IN_ATTRIB | IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE_SELF
+                | IN_ONLYDIR | IN_EXCL_UNLINK)
+INOTIFY_EVENT = struct.Struct("iIII") # wd, mask, cookie, len (followed by len bytes of name)
+INOTIFY_READ_BYTES = 64 * 1024
+
+
+def _git(project_directory: str, args: List[str], stdin: Optional[bytes] = None) -> Optional[subprocess.CompletedProcess]:
+    try:
+        return subprocess.run(["git", "--no-optional-locks", *args], cwd=project_directory, input=stdin,
+                              capture_output=True, timeout=GIT_TIMEOUT_SECONDS)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+
+
+class IgnoreRules:
+    """Which directories to watch and which changes count, per git's ignore rules where possible."""
+
+    def __init__(self, project_directory: str):
+        self.root = project_directory
+        completed = _git(project_directory, ["rev-parse", "--is-inside-work-tree"])
+        self.git = completed is not None and completed.returncode == 0
+        self.ignored_dirs: Set[str] = set()
+        if self.git: self.reload()
+
+    def reload(self):
+        # Ignored directories that exist now; git collapses each one to a single "dir/" entry.
+        completed = _git(self.root, ["ls-files", "-z", "--others", "--ignored", "--exclude-standard", "--directory"])
+        if completed is None or completed.returncode != 0: return
+        self.ignored_dirs = {os.path.join(self.root, os.fsdecode(entry[:-1])) for entry in completed.stdout.split(b"\0")
+                             if entry.endswith(b"/")}
+
+    def skip_dir(self, path: str, new: bool = False) -> bool:
+        # new: a directory created after the last reload, which git has to be asked about.
+        name = os.path.basename(path)
+        if name == ".git": return True
+        if not self.git: return name in SCAN_SKIP_DIRS
+        if path in self.ignored_dirs: return True
+        return new and bool(self.ignored(path + os.sep))
+
+    def ignored(self, *paths: str) -> Set[str]:
+        if not self.git or not paths: return set()
+        completed = _git(self.root, ["check-ignore", "-z", "--stdin"], stdin=b"\0".join(os.fsencode(p) for p in paths))
+        if completed is None or completed.returncode not in (0, 1): return set()
+        return {os.path.join(self.root, os.fsdecode(p)) for p in completed.stdout.split(b"\0") if p}
+
+    def filter(self, paths: Set[str]) -> List[str]:
+        # The changed paths that count, relative to the project directory.
+        kept = []
+        for path in paths:
+            relative = os.path.relpath(path, self.root)
+            parts = relative.split(os.sep)
+            if ".git" in parts or any(os.path.join(self.root, *parts[:i]) in self.ignored_dirs for i in range(1, len(parts))):
+                continue
+            if not self.git and any(part in SCAN_SKIP_DIRS for part in parts[:-1]): continue
+            kept.append(path)
+        if any(os.path.basename(path) == ".gitignore" for path in kept): self.reload()
+        ignored = self.ignored(*kept)
+        return sorted(os.path.relpath(path, self.root) for path in kept if path not in ignored)
+
+
+def _walk_dirs(top: str, rules: IgnoreRules, new: bool = False):
+    # Yields top and every directory below it that is watched, without following symlinks.
+    if rules.skip_dir(top, new) and top != rules.root: return
+    pending = [top]
+    while pending:
+        directory = pending.pop()
+        yield directory
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try: is_dir = entry.is_dir(follow_symlinks=False)
+                    except OSError: continue
+                    if is_dir and not rules.skip_dir(entry.path): pending.append(entry.path)
+        except OSError:
+            continue
+
+
+class InotifyBackend:
+    # Raises OSError when inotify is unavailable or the tree needs more watches than allowed.
+    name = "inotify"
+
+    def __init__(self, rules: IgnoreRules):
+        self.rules = rules
+        libc_path = ctypes.util.find_library("c") or "libc.so.6"
+        self.libc = ctypes.CDLL(libc_path, use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        self.watches: Dict[int, str] = {}
+        self.wake_read, self.wake_write = os.pipe()
+        self.poller = select.poll()
+        self.poller.register(self.fd, select.POLLIN)
+        self.poller.register(self.wake_read, select.POLLIN)
+        self.closed = False
+        self.changes_since = 0.0 # Monotonic time from which the last wait()'s changes can date
+        self.fds_closed = False
+        self.fds_lock = threading.Lock()
+        try:
+            for directory in _walk_dirs(rules.root, rules): self._add_watch(directory, strict=True)
+        except OSError:
+            self._close_fds()
+            raise
+
+    def _add_watch(self, directory: str, strict: bool = False):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), INOTIFY_MASK)
+        if wd >= 0:
+            self.watches[wd] = directory
+            return
+        error = ctypes.get_errno()
+        # Out of watches (fs.inotify.max_user_watches) is fatal at startup; directories that
+        # vanished or can't be read are not.
+        if error == errno.ENOSPC and strict: raise OSError(error, "Too many directories for inotify (fs.inotify.max_user_watches)")
+        if error == errno.ENOSPC: logger.warning("Out of inotify watches; not watching %s", directory)
+
+    def wait(self, timeout: Optional[float]) -> Optional[List[str]]:
+        # Changed paths ([] after timeout seconds without events), or None once closed.
+        if not self.closed:
+            ready = self.poller.poll(None if timeout is None else max(0, int(timeout * 1000)))
+        if self.closed:
+            self._close_fds()
+            return None
+        self.changes_since = time.monotonic() # Events arrive as they happen
+        changed = []
+        if not any(fd == self.fd for fd, _ in ready): return changed
+        while True:
+            try: data = os.read(self.fd, INOTIFY_READ_BYTES)
+            except BlockingIOError: break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _cookie, length = INOTIFY_EVENT.unpack_from(data, offset)
+                name = data[offset + INOTIFY_EVENT.size:offset + INOTIFY_EVENT.size + length].rstrip(b"\0")
+                offset += INOTIFY_EVENT.size + length
+                if mask & IN_Q_OVERFLOW:
+                    changed.append(self.rules.root) # Events were lost; something changed
+                    continue
+                if mask & IN_IGNORED:
+                    self.watches.pop(wd, None)
+                    continue
+                directory = self.watches.get(wd)
+                if directory is None: continue
+                path = os.path.join(directory, os.fsdecode(name)) if name else directory
+                if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                    for new_directory in _walk_dirs(path, self.rules, new=True): self._add_watch(new_directory)
+                changed.append(path)
+        return changed
+
+    def close(self):
+        # From any thread; the waiting thread closes the descriptors.
+        with self.fds_lock:
+            if self.fds_closed: return
+            self.closed = True
+            os.write(self.wake_write, b"x")
+
+    def _close_fds(self):
+        with self.fds_lock:
+            if self.fds_closed: return
+            self.fds_closed = True
+            for fd in (self.fd, self.wake_read, self.wake_write):
+                try: os.close(fd)
+                except OSError: pass
+
+
+class PollingBackend:
+    name = "poll"
+
+    def __init__(self, rules: IgnoreRules, interval_seconds: float = WATCH_POLL_INTERVAL_SECONDS):
+        self.rules, self.interval_seconds = rules, interval_seconds
+        self.stopped = threading.Event()
+        self.snapshot_at = self.changes_since = time.monotonic()
+        self.snapshot = self._scan()
+        self._schedule_scan()
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        started = time.monotonic()
+        snapshot: Dict[str, Tuple[int, int]] = {}
+        for directory in _walk_dirs(self.rules.root, self.rules):
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        try:
+                            if entry.is_dir(follow_symlinks=False): continue
+                            stat = entry.stat(follow_symlinks=False)
+                        except OSError:
+                            continue
+                        snapshot[entry.path] = (stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                continue
+        # Large trees are rescanned less often (see _schedule_scan), so scanning stays a small share of the time.
+        self.scan_seconds = time.monotonic() - started
+        return snapshot
+
+    def _schedule_scan(self):
+        self.next_scan_at = time.monotonic() + max(self.interval_seconds, self.scan_seconds / WATCH_POLL_CPU_SHARE)
+
+    def wait(self, timeout: Optional[float]) -> Optional[List[str]]:
+        wait_seconds = max(0.0, self.next_scan_at - time.monotonic())
+        if timeout is not None and timeout < wait_seconds:
+            return None if self.stopped.wait(timeout) else []
+        if self.stopped.wait(wait_seconds): return None
+        # A scan reports everything since the previous one started.
+        self.changes_since, self.snapshot_at = self.snapshot_at, time.monotonic()
+        snapshot = self._scan()
+        self._schedule_scan()
+        previous, self.snapshot = self.snapshot, snapshot
+        changed = [path for path, state in snapshot.items() if previous.get(path) != state]
+        return changed + [path for path in previous.keys() - snapshot.keys()]
+
+    def close(self):
+        self.stopped.set()
+
+
+class ProjectWatcher:
+    """Calls on_change(paths) when files under project_directory change, after a quiet period.
+
+    Everything runs on the watcher's own daemon thread, including the initial walk of
+    the tree, so start() returns at once; on_change is called there too, with the
+    changed paths relative to project_directory (never empty). stop() is safe from any
+    thread and returns at once.
+
+    Between run_started() and run_finished() (the rerun an on_change call started), and for
+    one quiet period after it, changes are dropped, so the rerun's own writes can't trigger the
+    next rerun. The polling backend drops the whole scan that overlaps that period.
+    """
+
+    def __init__(self, project_directory: str, on_change: Callable[[List[str]], None],
+                 debounce_seconds: float = WATCH_DEBOUNCE_SECONDS, backend: str = WATCH_BACKEND):
+        self.project_directory = os.path.realpath(project_directory)
+        self.on_change = on_change
+        self.debounce_seconds, self.backend_choice = debounce_seconds, backend
+        self.backend = None
+        self.ready = threading.Event() # Set once the tree is being watched
+        self.stopped = False
+        self.running = False # A rerun triggered by on_change is in progress
+        self.quiet_until = 0.0 # Monotonic time until which changes are dropped after it
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self._run, name="project-watcher", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        with self.lock:
+            self.stopped = True
+            if self.backend: self.backend.close()
+
+    def run_started(self):
+        # From any thread, before the rerun starts writing.
+        with self.lock: self.running = True
+
+    def run_finished(self):
+        # From any thread: the rerun is over.
+        with self.lock:
+            self.running = False
+            self.quiet_until = time.monotonic() + self.debounce_seconds
+
+    def _own_changes(self, backend) -> bool:
+        # Whether the changes backend.wait() just returned may come from the triggered rerun.
+        with self.lock:
+            return self.running or backend.changes_since < self.quiet_until
+
+    def _create_backend(self, rules: IgnoreRules):
+        if self.backend_choice != "poll" and sys.platform.startswith("linux"):
+            try: return InotifyBackend(rules)
+            except (OSError, AttributeError) as e:
+                if self.backend_choice == "inotify": raise
+                logger.warning("inotify unavailable (%s); watching %s by polling", e, rules.root)
+        return PollingBackend(rules)
+
+    def _run(self):
+        try:
+            rules = IgnoreRules(self.project_directory)
+            backend = self._create_backend(rules)
+        except Exception:
+            logger.exception("Could not watch %s", self.project_directory)
+            return
+        with self.lock:
+            if self.stopped:
+                backend.close()
+                backend.wait(0) # Lets the inotify backend release its descriptors
+                return
+            self.backend = backend
+        logger.debug("Watching %s with %s", self.project_directory, backend.name)
+        self.ready.set()
+        pending: Set[str] = set()
+        first_change_at = deadline = 0.0
+        while True:
+            now = time.monotonic()
+            changed = backend.wait(max(0.0, deadline - now) if pending else None)
+            if changed is None: return
+            now = time.monotonic()
+            if changed and self._own_changes(backend):
+                continue
+            if changed:
+                if not pending: first_change_at = now
+                pending.update(changed)
+                deadline = min(now + self.debounce_seconds, first_change_at + self.debounce_seconds * WATCH_MAX_DELAY_FACTOR)
+            elif pending and now >= deadline:
+                paths = rules.filter(pending)
+                pending = set()
+                if paths and not self.stopped:
+                    try: self.on_change(paths)
+                    except Exception: logger.exception("Watch callback failed")
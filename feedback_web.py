@@ -0,0 +1,239 @@
+# Browser backend of the UI server: the feedback form as a small HTML page served by the
+# API itself, with the command run by the API process. There is no GUI process and no Qt:
+# opening a "window" means creating a BrowserFeedbackSession and handing out its URL.
+import hmac
+import html
+import json
+import time
+import asyncio
+import hashlib
+import secrets
+import logging
+from string import Template
+from typing import Optional, Callable, List
+
+from feedback_common import (
+    LOG_HEAD_BYTES, LOG_TAIL_BYTES, LOG_SPILL, FeedbackResult, LogPolicy, LogStore, collect_feedback_result,
+    CommandStats, CommandRun, describe_command_stats,
+)
+from feedback_condense import LogCondenser
+from feedback_command_cache import get_command_cache
+
+logger = logging.getLogger("feedback_web")
+
+# Page URLs carry a per-session token derived from this key, so only whoever was handed
+# the URL can run commands through the form. A new key per server process.
+_TOKEN_KEY = secrets.token_bytes(32)
+
+
+def session_token(session_id: str) -> str:
+    return hmac.new(_TOKEN_KEY, session_id.encode("utf-8"), hashlib.sha256).hexdigest()[:32]
+
+
+def token_matches(session_id: str, token: Optional[str]) -> bool:
+    return token is not None and hmac.compare_digest(session_token(session_id), token)
+
+
+class BrowserFeedbackSession:
+    """One feedback form shown in a browser: the console log, the running command and the answer.
+
+    Lives on the event loop thread; the command's CommandRun thread hands output over
+    through loop.call_soon_threadsafe. on_output receives every chunk of console text
+    (the API publishes it on the session's SSE log stream), metrics_sink gets the same
+    phase samples a GUI process would send.
+    """
+
+    def __init__(self, project_directory: str, prompt: str, log_policy: Optional[LogPolicy] = None,
+                 on_output: Optional[Callable[[str], None]] = None,
+                 metrics_sink: Optional[Callable[[dict], None]] = None):
+        self.project_directory, self.prompt = project_directory, prompt
+        self.log_policy: LogPolicy = log_policy or {}
+        self.on_output, self.metrics_sink = on_output, metrics_sink
+        self.loop = asyncio.get_running_loop()
+        self.log_store = LogStore(LOG_HEAD_BYTES, LOG_TAIL_BYTES, spill=LOG_SPILL)
+        self.command_run: Optional[CommandRun] = None
+        self.command_stats: List[CommandStats] = []
+        self.condenser = LogCondenser() if self.log_policy.get("condense") else None
+        self.result: asyncio.Future = self.loop.create_future()
+        self.shown = False
+        self.closed = False
+
+    def mark_shown(self):
+        # Called for every page load; only the first one counts as the window being shown.
+        if self.shown: return
+        self.shown = True
+        if self.metrics_sink: self.metrics_sink({"window_shown_at": time.time()})
+
+    def _append(self, text: str, condensed: bool = False):
+        if self.closed: return # Output of a command that was killed with the session
+        self.log_store.append(text)
+        if self.condenser and not condensed: self.condenser.feed(text)
+        if self.on_output: self.on_output(text)
+
+    def run(self, command: str) -> bool:
+        # Returns False if a command is already running (the page shows Stop then).
+        if self.command_run: return False
+        if not command:
+            self._append("Please enter a command to run.\n")
+            return True
+        self._append(f"$ {command}\n")
+        run = self.command_run = CommandRun(
+            command, self.project_directory, self._emit,
+            lambda stats: self.loop.call_soon_threadsafe(self._on_command_finished, run, stats), cache=get_command_cache())
+        run.start()
+        return True
+
+    def _emit(self, text: str):
+        # Command output, from run and monitor threads: condensed there, off the event loop.
+        if self.condenser: self.condenser.feed(text)
+        self.loop.call_soon_threadsafe(self._append, text, True)
+
+    def _on_command_finished(self, run: CommandRun, stats: Optional[CommandStats]):
+        if stats: self.command_stats.append(stats)
+        if self.command_run is not run: return # A command that was already replaced
+        if stats: self._append(f"\n{describe_command_stats(stats)}\n")
+        self.command_run = None
+
+    def stop(self):
+        if not self.command_run: return
+        self._append("Stopping current process...\n")
+        self.command_run.stop()
+
+    def collected_result(self, interactive_feedback: str) -> FeedbackResult:
+        return collect_feedback_result(self.log_store, self.log_policy, interactive_feedback, self.command_stats, self.condenser)
+
+    def submit(self, interactive_feedback: str) -> bool:
+        # Cancel on the page submits empty feedback, like closing the Qt window does.
+        if self.result.done(): return False
+        if self.metrics_sink: self.metrics_sink({"window_closed_at": time.time()})
+        self.result.set_result(self.collected_result(interactive_feedback.strip()))
+        return True
+
+    def close(self):
+        # The session is over (answered, timed out or cancelled): stop the command and drop the logs.
+        self.closed = True
+        if self.command_run:
+            self.command_run.stop()
+            self.command_run = None
+        self.log_store.close()
+
+    def state(self) -> dict:
+        return {"running": self.command_run is not None, "answered": self.result.done()}
+
+
+PAGE_STYLE = """
+body { background: #353535; color: #fff; font-family: system-ui, sans-serif; margin: 0 auto; max-width: 960px; padding: 16px; }
+h1 { font-size: 1.2em; margin: 0 0 4px; }
+.project { color: #aaa; font-size: 0.9em; margin-bottom: 16px; word-break: break-all; }
+fieldset { border: 1px solid #555; border-radius: 4px; margin: 0 0 16px; padding: 12px; }
+legend { padding: 0 4px; }
+.prompt { white-space: pre-wrap; margin-bottom: 8px; }
+.row { display: flex; gap: 8px; }
+input, textarea, pre { background: #191919; color: #fff; border: 1px solid #555; border-radius: 3px; font: inherit; box-sizing: border-box; }
+input { flex: 1; padding: 6px; }
+textarea { width: 100%; min-height: 7em; padding: 6px; resize: vertical; }
+pre { font-family: ui-monospace, monospace; font-size: 0.85em; height: 18em; margin: 8px 0 0; overflow: auto; padding: 6px; white-space: pre-wrap; }
+button { background: #2a82da; color: #fff; border: 0; border-radius: 3px; cursor: pointer; padding: 6px 14px; }
+button.secondary { background: #555; }
+button:disabled { opacity: 0.5; cursor: default; }
+#status { color: #aaa; margin-top: 8px; }
+"""
+
+PAGE_TEMPLATE = Template("""<!doctype html>
+<html lang="en"><head><meta charset="utf-8"><title>Interactive Feedback MCP</title>
+<meta name="viewport" content="width=device-width, initial-scale=1"><style>$style</style></head>
+<body>
+<h1>Interactive Feedback MCP</h1>
+<div class="project">Project: $project</div>
+<fieldset><legend>Command</legend>
+<form id="run-form" class="row"><input id="command" value="$command" placeholder="Command to run" autocomplete="off"><button id="run" type="submit">Run</button></form>
+<pre id="console"></pre>
+</fieldset>
+<fieldset><legend>Feedback</legend>
+<div class="prompt">$prompt</div>
+<textarea id="feedback" placeholder="Enter your feedback here (Ctrl+Enter to submit)" autofocus></textarea>
+<div class="row"><button id="submit">Send Feedback (Ctrl+Enter)</button><button id="cancel" class="secondary">Cancel</button></div>
+<div id="status"></div>
+</fieldset>
+<script>
+const config = $config;
+const $$ = (id) => document.getElementById(id);
+let running = false, ended = false;
+function post(action, body) {
+  return fetch(config.base + "/" + action + "?token=" + encodeURIComponent(config.token), {
+    method: "POST", headers: {"Content-Type": "application/json"}, body: JSON.stringify(body || {}),
+  }).then((response) => response.json().then((data) => {
+    if (!response.ok) throw new Error(data.detail || response.statusText);
+    return data;
+  }));
+}
+function setRunning(value) { running = value; $$("run").textContent = value ? "Stop" : "Run"; }
+function end(message) {
+  ended = true;
+  for (const id of ["command", "run", "feedback", "submit", "cancel"]) $$(id).disabled = true;
+  $$("status").textContent = message;
+}
+function fail(error) { $$("status").textContent = error.message; }
+function pollState() {
+  if (!running || ended) return;
+  fetch(config.base + "/state?token=" + encodeURIComponent(config.token)).then((r) => r.json())
+    .then((state) => { setRunning(state.running); setTimeout(pollState, 1000); }).catch(() => setTimeout(pollState, 1000));
+}
+const consoleView = $$("console");
+const events = new EventSource(config.logs);
+events.addEventListener("log", (event) => {
+  const follow = consoleView.scrollTop + consoleView.clientHeight >= consoleView.scrollHeight - 4;
+  consoleView.textContent += JSON.parse(event.data).text;
+  if (follow) consoleView.scrollTop = consoleView.scrollHeight;
+});
+events.addEventListener("end", () => { events.close(); if (!ended) end("This feedback session has ended."); });
+$$("run-form").addEventListener("submit", (event) => {
+  event.preventDefault();
+  if (running) { post("stop").catch(fail); return; }
+  post("run", {command: $$("command").value}).then((state) => { setRunning(state.running); pollState(); }).catch(fail);
+});
+function answer(action, feedback) {
+  post(action, {interactive_feedback: feedback}).then(() => end("Feedback sent. You can close this tab.")).catch(fail);
+}
+$$("submit").addEventListener("click", () => answer("submit", $$("feedback").value));
+$$("cancel").addEventListener("click", () => answer("cancel", ""));
+document.addEventListener("keydown", (event) => {
+  if (ended) return;
+  if (event.key === "Enter" && (event.ctrlKey || event.metaKey)) { event.preventDefault(); answer("submit", $$("feedback").value); }
+  else if (event.key === "Escape" && (document.activeElement !== $$("feedback") || !$$("feedback").value.trim())) answer("cancel", "");
+});
+</script>
+</body></html>
+""")
+
+NOTICE_TEMPLATE = Template("""<!doctype html>
+<html lang="en"><head><meta charset="utf-8"><title>Interactive Feedback MCP</title>$refresh<style>$style</style></head>
+<body><h1>Interactive Feedback MCP</h1><p>$message</p></body></html>
+""")
+
+
+def _script_json(value) -> str:
+    # JSON that is safe inside a <script> element.
+    return json.dumps(value).replace("<", "\\u003c").replace(">", "\\u003e").replace("&", "\\u0026")
+
+
+def render_feedback_page(session_id: str, token: str, project_directory: str, prompt: str, command: str = "") -> str:
+    # command prefills the command input (the project's stored run_command).
+    config = {"base": f"/ui/{session_id}", "token": token, "logs": f"/sessions/{session_id}/logs"}
+    return PAGE_TEMPLATE.substitute(style=PAGE_STYLE, project=html.escape(project_directory), command=html.escape(command),
+                                    prompt=html.escape(prompt), config=_script_json(config))
+
+
+def render_notice_page(message: str, refresh_seconds: Optional[int] = None) -> str:
+    refresh = f'<meta http-equiv="refresh" content="{refresh_seconds}">' if refresh_seconds else ""
+    return NOTICE_TEMPLATE.substitute(style=PAGE_STYLE, refresh=refresh, message=html.escape(message))
+
+
+def open_in_browser(url: str):
+    # Blocking (it may start a browser process); the API calls it on an executor thread.
+    import webbrowser
+    try:
+        if not webbrowser.open(url):
+            logger.warning("No browser available to open %s", url)
+    except Exception as e:
+        logger.warning("Could not open %s in a browser: %s", url, e)
@@ -4,30 +4,147 @@
 import os
 import sys
 import json
+import uuid
+import asyncio
+import logging
 # import tempfile # No longer needed for output file
 # import subprocess # No longer needed for subprocess
 import httpx # For making HTTP requests
 
-from typing import Annotated, Dict
+from typing import Annotated, Any, Dict, List, Optional
 
-from fastmcp import FastMCP
+from fastmcp import FastMCP, Context
 from pydantic import Field
 
+from feedback_logging import configure_logging, truncate
+
+# Diagnostics go to stderr through a background writer; stdout carries the MCP stdio transport.
+configure_logging()
+logger = logging.getLogger("server")
+
 # The log_level is necessary for Cline to work: https://github.com/jlowin/fastmcp/issues/81
 mcp = FastMCP("Interactive Feedback MCP", log_level="ERROR")
 
 API_PORT = int(os.environ.get("UI_SERVER_PORT", 50689))
+# Optional Unix domain socket of the UI server; when set, loopback TCP is skipped entirely.
+API_UDS = os.environ.get("UI_SERVER_UDS") or None
 
 # Define the API endpoint URL
 # You might want to make this configurable (e.g., via environment variable)
-FEEDBACK_API_URL = f"http://localhost:{API_PORT}/run_feedback_ui/"
-# Define a long timeout for the API request (e.g., 1 hour = 3600 seconds)
+# With a Unix socket the host part is only used for the Host header.
+API_BASE_URL = "http://localhost" if API_UDS else f"http://localhost:{API_PORT}"
+# Job-style API: POST creates a session, GET long-polls it.
+SESSIONS_URL = f"{API_BASE_URL}/sessions"
+SESSION_URL = API_BASE_URL + "/sessions/{session_id}"
+# Live console output of a session is served as server-sent events here.
+SESSION_LOGS_URL = API_BASE_URL + "/sessions/{session_id}/logs"
+# Past feedback sessions recorded by the UI server.
+HISTORY_URL = f"{API_BASE_URL}/history"
+# Forward command output to the MCP client while the human is still answering.
+STREAM_LOGS = os.environ.get("UI_STREAM_LOGS", "1").lower() not in ("0", "false", "no")
+# How long to keep waiting for the human overall (e.g., 1 hour = 3600 seconds). The wait is a
+# series of short long-polls, so no single connection stays open that long.
 # Adjust as needed based on how long you expect the UI interaction to take.
 API_TIMEOUT_SECONDS = 3600.0
+# Each GET /sessions/{id} waits at most this long on the server before returning "pending".
+LONG_POLL_SECONDS = 25.0
+# Backoff between retries when the UI server is briefly unreachable while polling.
+POLL_RETRY_MAX_DELAY_SECONDS = 5.0
+# Connecting to / sending the request to a local server should be quick; fail fast if it isn't up.
+API_CONNECT_TIMEOUT_SECONDS = 5.0
+API_WRITE_TIMEOUT_SECONDS = 30.0
+API_POOL_TIMEOUT_SECONDS = 30.0
+# Each pending tool call holds one connection until the human answers.
+API_MAX_CONNECTIONS = int(os.environ.get("UI_CLIENT_MAX_CONNECTIONS", 32))
+API_MAX_KEEPALIVE_CONNECTIONS = 8
+
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+class FeedbackSessionError(Exception):
+    pass
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Returns the shared keep-alive AsyncClient, creating it on first use.
+    """
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            # The long read timeout is for the SSE log feed, which can be idle while the human thinks;
+            # session calls pass their own short timeouts.
+            timeout=httpx.Timeout(
+                connect=API_CONNECT_TIMEOUT_SECONDS,
+                read=API_TIMEOUT_SECONDS,
+                write=API_WRITE_TIMEOUT_SECONDS,
+                pool=API_POOL_TIMEOUT_SECONDS,
+            ),
+            limits=httpx.Limits(
+                max_connections=API_MAX_CONNECTIONS,
+                max_keepalive_connections=API_MAX_KEEPALIVE_CONNECTIONS,
+            ),
+            transport=httpx.AsyncHTTPTransport(uds=API_UDS) if API_UDS else None,
+        )
+    return _http_client
+
+
+async def forward_session_logs(session_id: str, on_log) -> None:
+    """
+    Consumes the session's SSE log feed and hands every chunk to on_log as it arrives.
+    """
+    event = None
+    async with get_http_client().stream("GET", SESSION_LOGS_URL.format(session_id=session_id)) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                if event == "end":
+                    return
+                if event == "log":
+                    await on_log(json.loads(line[len("data:"):])["text"])
+
+
+def _session_timeout(read_seconds: float) -> httpx.Timeout:
+    return httpx.Timeout(connect=API_CONNECT_TIMEOUT_SECONDS, read=read_seconds,
+                         write=API_WRITE_TIMEOUT_SECONDS, pool=API_POOL_TIMEOUT_SECONDS)
+
+
+async def wait_for_feedback_session(session_id: str) -> dict[str, Any]:
+    """
+    Long-polls GET /sessions/{id} until the session finishes. Transport errors (UI server
+    restarting, dropped connection) are retried with backoff, so the wait is resumable.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + API_TIMEOUT_SECONDS
+    retry_delay = 0.5
+    url = SESSION_URL.format(session_id=session_id)
+    while True:
+        if loop.time() > deadline:
+            raise FeedbackSessionError(f"Timed out after {API_TIMEOUT_SECONDS:.0f}s waiting for feedback session {session_id}.")
+        try:
+            response = await get_http_client().get(url, params={"wait": LONG_POLL_SECONDS},
+                                                   timeout=_session_timeout(LONG_POLL_SECONDS + 10.0))
+        except httpx.TransportError as e:
+            logger.warning("Polling feedback session %s failed (%r); retrying in %.1fs", session_id, e, retry_delay)
+            await asyncio.sleep(retry_delay)
+            retry_delay = min(retry_delay * 2, POLL_RETRY_MAX_DELAY_SECONDS)
+            continue
+        retry_delay = 0.5
+        response.raise_for_status()
+        status = response.json()
+        if status["status"] == "pending":
+            continue
+        if status["status"] == "completed":
+            return status["result"]
+        raise FeedbackSessionError(f"Feedback session {session_id} {status['status']}: {status.get('error') or 'no result'}")
+
 
-def launch_feedback_ui_via_api(project_directory: str, summary_prompt: str) -> dict[str, str]:
+async def launch_feedback_ui_via_api(project_directory: str, summary_prompt: str, on_log=None) -> dict[str, Any]:
     """
-    Launches the feedback UI by calling the FastAPI service.
+    Launches the feedback UI by creating a session on the FastAPI service and polling it.
+    If on_log is given, command output is streamed to it while the window is open.
     """
     payload = {
         "project_directory": project_directory,
@@ -36,53 +153,93 @@ def launch_feedback_ui_via_api(project_directory: str, summary_prompt: str) -> d
         # If you need to save on the server, you can add it:
         # "server_save_path": "/path/on/server/to/save/result.json"
     }
+    log_task = None
+    if on_log:
+        payload["session_id"] = uuid.uuid4().hex
+        log_task = asyncio.create_task(forward_session_logs(payload["session_id"], on_log))
 
     try:
-        print(f"Calling Feedback API at {FEEDBACK_API_URL} with payload: {payload}")
-        with httpx.Client(timeout=API_TIMEOUT_SECONDS) as client:
-            response = client.post(FEEDBACK_API_URL, json=payload)
+        logger.info("Calling Feedback API at %s for %s", SESSIONS_URL, project_directory)
+        logger.debug("Feedback API payload: %s", truncate(json.dumps(payload)))
+        response = await get_http_client().post(SESSIONS_URL, json=payload,
+                                                timeout=_session_timeout(API_WRITE_TIMEOUT_SECONDS))
         
         # Check if the request was successful
         response.raise_for_status()  # Raises an HTTPStatusError for 4xx/5xx responses
+        session_id = response.json()["session_id"]
+        ui_url = response.json().get("ui_url")
+        if ui_url:
+            # Browser backend: the human answers in a web page instead of a desktop window.
+            logger.info("Feedback form for session %s: %s", session_id, ui_url)
+            if on_log: await on_log(f"Feedback form: {ui_url}\n")
 
         # Parse the JSON response
-        result = response.json()
-        print(f"Received response from Feedback API: {result}")
+        # If this tool call is abandoned (e.g. an MCP-level timeout), the session keeps running on
+        # the UI server; the agent's retry is coalesced onto it and resumes polling.
+        result = await wait_for_feedback_session(session_id)
+        logger.info("Received feedback for session %s (%d chars of feedback, %d chars of logs)",
+                    session_id, len(result.get("interactive_feedback", "")), len(result.get("logs", "")))
         return result
 
+    except FeedbackSessionError as e:
+        logger.error("%s", e)
+        raise
+
     except httpx.HTTPStatusError as e:
         # Handle HTTP errors (e.g., 404, 500, 422 for validation errors from FastAPI)
         error_message = f"API request failed with status {e.response.status_code}: {e.response.text}"
-        print(f"Error: {error_message}")
+        logger.error(error_message)
         # You might want to return a specific error structure or re-raise a custom exception
         raise Exception(error_message) from e
     except httpx.RequestError as e:
         # Handle other request errors (e.g., network issues, timeout)
         error_message = f"API request failed: {str(e)}"
-        print(f"Error: {error_message}")
+        logger.error(error_message)
         raise Exception(error_message) from e
     except json.JSONDecodeError as e:
         error_message = f"Failed to decode JSON response from API: {str(e)}"
-        print(f"Error: {error_message} - Response text: {response.text if 'response' in locals() else 'N/A'}")
+        logger.error("%s - Response text: %s", error_message, truncate(response.text) if 'response' in locals() else 'N/A')
         raise Exception(error_message) from e
     except Exception as e:
         # Catch any other unexpected errors
         error_message = f"An unexpected error occurred while calling the feedback API: {str(e)}"
-        print(f"Error: {error_message}")
+        logger.error(error_message)
         raise Exception(error_message) from e
+    finally:
+        # The final result already carries the full logs; live streaming is best effort.
+        if log_task:
+            log_task.cancel()
+            try: await log_task
+            except (asyncio.CancelledError, Exception): pass
 
 
 def first_line(text: str) -> str:
     return text.split("\n")[0].strip()
 
 @mcp.tool()
-def interactive_feedback(
+async def interactive_feedback(
     project_directory: Annotated[str, Field(description="Full path to the project directory")],
     summary: Annotated[str, Field(description="Short, one-line summary of the changes (will be shown as a prompt in the UI)")],
-) -> Dict[str, str]:
+    ctx: Context,
+) -> Dict[str, Any]:
     """Request interactive feedback for a given project directory and summary by calling a remote UI service."""
     # The 'summary' from the tool maps to the 'prompt' in the API request.
-    return launch_feedback_ui_via_api(first_line(project_directory), first_line(summary))
+    # Command output is relayed to the client as log messages while the human answers.
+    return await launch_feedback_ui_via_api(first_line(project_directory), first_line(summary),
+                                            on_log=ctx.info if STREAM_LOGS else None)
+
+@mcp.tool()
+async def feedback_history(
+    project_directory: Annotated[str, Field(description="Full path to the project directory")],
+    limit: Annotated[int, Field(description="How many past answers to return, newest first")] = 10,
+) -> List[Dict]:
+    """Return earlier interactive feedback answers for a project (prompt, answer, status, time) without asking the user again."""
+    response = await get_http_client().get(
+        HISTORY_URL, params={"project_directory": first_line(project_directory), "limit": limit},
+        timeout=_session_timeout(API_WRITE_TIMEOUT_SECONDS))
+    response.raise_for_status()
+    return [{key: entry[key] for key in ("prompt", "interactive_feedback", "status", "created_at", "error")}
+            for entry in response.json()["entries"]]
 
 if __name__ == "__main__":
     # Example of how to test the tool directly (optional)
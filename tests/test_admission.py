@@ -0,0 +1,33 @@
+# Admission limits are read at startup: a per-project cap set before the lifespan queues the
+# project's next session, and without one (the default) nothing is queued.
+import asyncio
+
+import httpx
+import pytest
+
+import feedback_ui
+from feedback_web import session_token
+
+
+@pytest.mark.parametrize("per_project, queued", [(0, False), (1, True)])
+def test_per_project_limit_is_applied_at_startup(monkeypatch, tmp_path, per_project, queued):
+    monkeypatch.setattr(feedback_ui, "HISTORY_DB_PATH", "")
+    monkeypatch.setattr(feedback_ui, "CONFIG_DB_PATH", "")
+    monkeypatch.setattr(feedback_ui, "GUI_POOL_SIZE", 0)
+    monkeypatch.setattr(feedback_ui, "MAX_SESSIONS_PER_PROJECT", per_project)
+    request = {"project_directory": str(tmp_path), "backend": "browser"}
+
+    async def scenario():
+        async with feedback_ui.lifespan(feedback_ui.app):
+            transport = httpx.ASGITransport(app=feedback_ui.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://ui") as client:
+                first = (await client.post("/sessions", json={**request, "prompt": "first", "session_id": "a"})).json()
+                second = (await client.post("/sessions", json={**request, "prompt": "second", "session_id": "b"})).json()
+                stats = (await client.get("/admission/")).json()
+                for session_id in ("a", "b"):
+                    await client.post(f"/ui/{session_id}/cancel?token={session_token(session_id)}")
+                return first, second, stats
+
+    first, second, stats = asyncio.run(scenario())
+    assert not first["queued"] and second["queued"] == queued
+    assert stats["max_per_project"] == per_project
@@ -0,0 +1,41 @@
+# Browser sessions run commands in the UI server process: their form and actions are only
+# served to clients on this machine, even with the session's token.
+import asyncio
+
+import httpx
+
+import feedback_ui
+from feedback_web import session_token
+
+
+def test_browser_session_actions_refuse_remote_clients(monkeypatch, tmp_path):
+    monkeypatch.setattr(feedback_ui, "HISTORY_DB_PATH", "")
+    monkeypatch.setattr(feedback_ui, "CONFIG_DB_PATH", "")
+    monkeypatch.setattr(feedback_ui, "GUI_POOL_SIZE", 0)
+    marker = tmp_path / "ran"
+    request = {"project_directory": str(tmp_path), "prompt": "Ship it?", "backend": "browser", "session_id": "web"}
+
+    async def scenario():
+        async with feedback_ui.lifespan(feedback_ui.app):
+            remote = httpx.ASGITransport(app=feedback_ui.app, client=("192.0.2.7", 40000))
+            local = httpx.ASGITransport(app=feedback_ui.app, client=("127.0.0.1", 40000))
+            async with httpx.AsyncClient(transport=remote, base_url="http://ui") as remote_client, \
+                       httpx.AsyncClient(transport=local, base_url="http://ui") as local_client:
+                assert (await remote_client.post("/sessions", json=request)).status_code == 403
+                assert (await local_client.post("/sessions", json=request)).json()["status"] == "pending"
+                await asyncio.sleep(0.1) # Let the session open its form
+
+                token = session_token("web")
+                run = await remote_client.post(f"/ui/web/run?token={token}", json={"command": f"touch '{marker}'"})
+                assert run.status_code == 403
+                for action in ("stop", "cancel"):
+                    assert (await remote_client.post(f"/ui/web/{action}?token={token}")).status_code == 403
+                assert (await remote_client.post(f"/ui/web/submit?token={token}", json={"interactive_feedback": "x"})).status_code == 403
+                assert (await remote_client.get(f"/ui/web/state?token={token}")).status_code == 403
+                assert (await remote_client.get(f"/ui/web?token={token}")).status_code == 403
+
+                assert (await local_client.get(f"/ui/web/state?token={token}")).status_code == 200
+                await local_client.post(f"/ui/web/submit?token={token}", json={"interactive_feedback": "yes"})
+
+    asyncio.run(scenario())
+    assert not marker.exists()
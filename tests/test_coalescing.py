@@ -0,0 +1,67 @@
+# Identical requests: a retry joins the in-flight session (including its live log feed),
+# and a retry after the answer gets the cached answer, saved and recorded like any other.
+import os
+import json
+import time
+import asyncio
+
+import httpx
+
+import feedback_ui
+from feedback_history import HistoryStore
+from feedback_web import session_token
+
+
+async def _wait_for(condition, timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.02)
+
+
+def test_retry_joins_in_flight_session_and_then_gets_the_cached_answer(monkeypatch, tmp_path):
+    monkeypatch.setattr(feedback_ui, "HISTORY_DB_PATH", str(tmp_path / "history.sqlite3"))
+    monkeypatch.setattr(feedback_ui, "CONFIG_DB_PATH", "")
+    monkeypatch.setattr(feedback_ui, "GUI_POOL_SIZE", 0) # Browser sessions only: no GUI processes
+    request = {"project_directory": str(tmp_path), "prompt": "Ship it?", "backend": "browser"}
+    save_path = tmp_path / "answer.json"
+
+    async def scenario():
+        async with feedback_ui.lifespan(feedback_ui.app):
+            transport = httpx.ASGITransport(app=feedback_ui.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://ui") as client:
+                first = (await client.post("/sessions", json={**request, "session_id": "first"})).json()
+                assert first["status"] == "pending"
+
+                # The retry's log feed is subscribed before the retry itself arrives (as server.py does).
+                retry_feed = asyncio.create_task(client.get("/sessions/retry/logs"))
+                await _wait_for(lambda: "retry" in feedback_ui.log_streams and feedback_ui.log_streams["retry"].subscribers)
+                retry = (await client.post("/sessions", json={**request, "session_id": "retry"})).json()
+                assert retry["session_id"] == "first"
+
+                token = session_token("first")
+                await client.post(f"/ui/first/run?token={token}", json={"command": "echo from-the-first-window"})
+                await _wait_for(lambda: any("from-the-first-window" in text for text in feedback_ui.log_streams["first"].backlog))
+                await client.post(f"/ui/first/submit?token={token}", json={"interactive_feedback": "yes"})
+
+                feed = await asyncio.wait_for(retry_feed, 10.0)
+                assert "from-the-first-window" in feed.text
+                assert feed.text.rstrip().endswith("event: end\ndata: {}")
+
+                cached = await client.post("/run_feedback_ui/", json={**request, "session_id": "late",
+                                                                      "server_save_path": str(save_path)})
+                assert cached.json()["interactive_feedback"] == "yes"
+                late_feed = await client.get("/sessions/late/logs")
+                assert "event: end" in late_feed.text
+                await _wait_for(save_path.exists)
+        # Leaving the lifespan flushed the history writer.
+        return json.loads(save_path.read_text(encoding="utf-8"))
+
+    saved = asyncio.run(scenario())
+    assert saved["interactive_feedback"] == "yes"
+    store = HistoryStore(str(tmp_path / "history.sqlite3"))
+    try:
+        entries = store.query(os.path.normcase(os.path.abspath(str(tmp_path))), None, None, None, None, 10, False)
+    finally:
+        store.close()
+    assert [entry["interactive_feedback"] for entry in entries] == ["yes", "yes"]
@@ -0,0 +1,41 @@
+# The command cache key changes with inputs git ignores: an edited .env or an installed
+# dependency must not replay a result from before.
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from feedback_command_cache import CommandCache
+
+pytestmark = pytest.mark.skipif(shutil.which("git") is None, reason="needs git")
+
+
+def _bump_mtime(path):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_key_covers_ignored_env_file_and_dependencies(tmp_path):
+    project = tmp_path / "project"
+    project.mkdir()
+    (project / ".gitignore").write_text(".env\nnode_modules/\n", encoding="utf-8")
+    (project / "main.py").write_text("print('hi')\n", encoding="utf-8")
+    (project / ".env").write_text("MODE=a\n", encoding="utf-8")
+    (project / "node_modules").mkdir()
+    git = ["git", "-C", str(project), "-c", "user.name=t", "-c", "user.email=t@t"]
+    subprocess.run(git + ["init", "-q"], check=True)
+    subprocess.run(git + ["add", "-A"], check=True)
+    subprocess.run(git + ["commit", "-qm", "init"], check=True)
+
+    cache = CommandCache(str(tmp_path / "cache.sqlite3"))
+    first, _ = cache.key("pytest", str(project))
+    assert cache.key("pytest", str(project))[0] == first # Nothing changed
+
+    (project / ".env").write_text("MODE=b\n", encoding="utf-8")
+    after_env, _ = cache.key("pytest", str(project))
+    assert after_env != first
+
+    (project / "node_modules" / "left-pad").mkdir()
+    _bump_mtime(project / "node_modules") # Same-second mkdir on coarse-mtime filesystems
+    assert cache.key("pytest", str(project))[0] != after_env
@@ -0,0 +1,69 @@
+# Concurrent /run_feedback_ui/ requests against real (offscreen) Qt windows.
+#
+# Every window answers itself WINDOW_SECONDS after it is created. The auto-submit patch
+# is applied inside the GUI process, by wrapping the process targets: patching
+# feedback_gui in the test process would load Qt before the fork.
+import os
+import time
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import pytest
+from fastapi.testclient import TestClient
+
+import feedback_ui
+
+REQUESTS = 4
+WINDOW_SECONDS = 2.0
+# Process start, Qt init and teardown on top of the window's own lifetime.
+STARTUP_ALLOWANCE_SECONDS = 3.0
+GUI_TARGETS = ["process_target_for_gui", "gui_worker_main", "session_host_main"]
+ORIGINAL_TARGETS = {name: getattr(feedback_ui, name) for name in GUI_TARGETS}
+
+
+def _auto_submitting(target_name: str, *args):
+    # Runs in the GUI process: every FeedbackUI submits "answer: <prompt>" after WINDOW_SECONDS.
+    import feedback_gui
+    from PySide6.QtCore import QTimer
+    original_init = feedback_gui.FeedbackUI.__init__
+
+    def __init__(self, *init_args, **init_kwargs):
+        original_init(self, *init_args, **init_kwargs)
+        def submit():
+            self.feedback_text.setPlainText(f"answer: {self.prompt}")
+            self._submit_feedback_and_close()
+        QTimer.singleShot(int(WINDOW_SECONDS * 1000), self, submit)
+    feedback_gui.FeedbackUI.__init__ = __init__
+    ORIGINAL_TARGETS[target_name](*args)
+
+
+@pytest.fixture(params=["spawn", "pool", "session_host"])
+def client(request, monkeypatch, tmp_path):
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path / "config")) # QSettings of the GUI processes
+    monkeypatch.setattr(feedback_ui, "HISTORY_DB_PATH", "")
+    monkeypatch.setattr(feedback_ui, "CONFIG_DB_PATH", str(tmp_path / "config.sqlite3"))
+    monkeypatch.setattr(feedback_ui, "GUI_POOL_SIZE", REQUESTS if request.param == "pool" else 0)
+    monkeypatch.setattr(feedback_ui, "SESSION_HOST_MODE", request.param == "session_host")
+    for name in GUI_TARGETS:
+        monkeypatch.setattr(feedback_ui, name, functools.partial(_auto_submitting, name))
+    with TestClient(feedback_ui.app) as test_client:
+        yield test_client
+
+
+def test_parallel_requests_wait_for_windows_concurrently(client, tmp_path):
+    def ask(index: int):
+        return client.post("/run_feedback_ui/", json={"project_directory": str(tmp_path), "prompt": f"question {index}",
+                                                      "dedupe": False})
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=REQUESTS) as executor:
+        responses = list(executor.map(ask, range(REQUESTS)))
+    elapsed = time.perf_counter() - started
+
+    assert [response.status_code for response in responses] == [200] * REQUESTS
+    assert [response.json()["interactive_feedback"] for response in responses] == [
+        f"answer: question {index}" for index in range(REQUESTS)]
+    # Served one after another this would take at least REQUESTS * WINDOW_SECONDS.
+    assert elapsed < WINDOW_SECONDS + STARTUP_ALLOWANCE_SECONDS
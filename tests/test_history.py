@@ -0,0 +1,44 @@
+# The feedback history is bounded (retention period and entry cap) and only served locally.
+import time
+import asyncio
+
+import httpx
+
+import feedback_ui
+from feedback_history import HistoryStore
+
+
+def _entry(index: int, created_at: float) -> dict:
+    return {"session_id": f"s{index}", "project_directory": "/project", "prompt": f"question {index}",
+            "status": "completed", "created_at": created_at, "finished_at": created_at,
+            "interactive_feedback": f"answer {index}", "logs": f"log {index}"}
+
+
+def test_history_drops_expired_and_excess_entries(tmp_path):
+    path = str(tmp_path / "history.sqlite3")
+    now = time.time()
+    store = HistoryStore(path, retention_days=1, max_entries=3)
+    store.record(_entry(0, now - 2 * 86400)) # Past the retention period
+    for index in range(1, 6):
+        store.record(_entry(index, now - 60 + index))
+    store.close()
+    store = HistoryStore(path, retention_days=1, max_entries=3)
+    try:
+        assert [entry["session_id"] for entry in store.query(limit=10)] == ["s5", "s4", "s3"]
+    finally:
+        store.close()
+
+
+def test_history_refuses_remote_clients(monkeypatch, tmp_path):
+    monkeypatch.setattr(feedback_ui, "HISTORY_DB_PATH", str(tmp_path / "history.sqlite3"))
+    monkeypatch.setattr(feedback_ui, "CONFIG_DB_PATH", "")
+    monkeypatch.setattr(feedback_ui, "GUI_POOL_SIZE", 0)
+
+    async def scenario():
+        async with feedback_ui.lifespan(feedback_ui.app):
+            for host, status in (("192.0.2.7", 403), ("127.0.0.1", 200)):
+                transport = httpx.ASGITransport(app=feedback_ui.app, client=(host, 40000))
+                async with httpx.AsyncClient(transport=transport, base_url="http://ui") as client:
+                    assert (await client.get("/history", params={"include_logs": "true"})).status_code == status
+
+    asyncio.run(scenario())
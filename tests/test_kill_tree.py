@@ -0,0 +1,54 @@
+# kill_tree on a multi-level process tree that ignores SIGTERM: the caller is not blocked,
+# and the SIGKILL escalation leaves no descendant alive, including one that left the group.
+import sys
+import time
+
+import psutil
+import pytest
+
+from feedback_common import kill_tree, start_command
+
+DEPTH = 3
+GRACE_SECONDS = 0.5
+# Each level ignores SIGTERM, starts the next level, prints its pid and sleeps; the last
+# level also moves to a session of its own, out of reach of killpg().
+TREE_SCRIPT = """
+import os, sys, signal, subprocess, time
+signal.signal(signal.SIGTERM, signal.SIG_IGN)
+depth = int(sys.argv[1])
+if depth: subprocess.Popen([sys.executable, "-c", sys.argv[2], str(depth - 1), sys.argv[2]])
+else: os.setsid()
+print(os.getpid(), flush=True)
+time.sleep(60)
+"""
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="process groups and SIGTERM are POSIX-only")
+
+
+def _gone(proc: psutil.Process) -> bool:
+    try: return not proc.is_running() or proc.status() == psutil.STATUS_ZOMBIE
+    except psutil.NoSuchProcess: return True
+
+
+def test_kill_tree_stops_a_deep_tree_that_ignores_sigterm(tmp_path):
+    script = tmp_path / "tree.py"
+    script.write_text(TREE_SCRIPT, encoding="utf-8")
+    process = start_command(f'"{sys.executable}" "{script}" {DEPTH} "$(cat "{script}")"', str(tmp_path), limits={})
+    pids = [int(process.stdout.readline()) for _ in range(DEPTH + 1)]
+    root = psutil.Process(process.pid)
+    tree = [root] + root.children(recursive=True)
+    assert set(pids) <= {proc.pid for proc in tree}
+
+    started = time.monotonic()
+    killer = kill_tree(process, grace_seconds=GRACE_SECONDS)
+    assert time.monotonic() - started < 0.1 # SIGTERM and the escalation run on the killer thread
+    assert killer.is_alive() # Everything ignores SIGTERM, so it is still waiting out the grace period
+
+    killer.join(GRACE_SECONDS + 10)
+    assert not killer.is_alive()
+    process.wait(5)
+    process.stdout.close()
+    deadline = time.monotonic() + 5
+    while not all(_gone(proc) for proc in tree) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert [proc.pid for proc in tree if not _gone(proc)] == []
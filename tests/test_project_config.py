@@ -0,0 +1,50 @@
+# PUT /projects/config: only for clients on this machine, and a project configured through it
+# before its first window still gets the rest of its config migrated from QSettings.
+import asyncio
+
+import httpx
+
+import feedback_ui
+from feedback_config import ConfigStore
+
+
+def test_put_for_a_project_only_in_qsettings_keeps_it_unmigrated(monkeypatch, tmp_path):
+    db_path = str(tmp_path / "config.sqlite3")
+    monkeypatch.setattr(feedback_ui, "HISTORY_DB_PATH", "")
+    monkeypatch.setattr(feedback_ui, "CONFIG_DB_PATH", db_path)
+    monkeypatch.setattr(feedback_ui, "GUI_POOL_SIZE", 0)
+    project = str(tmp_path)
+    update = {"project_directory": project, "run_command": "pytest -q"}
+
+    async def scenario():
+        async with feedback_ui.lifespan(feedback_ui.app):
+            remote = httpx.ASGITransport(app=feedback_ui.app, client=("192.0.2.7", 40000))
+            async with httpx.AsyncClient(transport=remote, base_url="http://ui") as client:
+                assert (await client.put("/projects/config", json={**update, "execute_automatically": True})).status_code == 403
+                assert (await client.get("/projects/config", params={"project_directory": project})).status_code == 403
+            local = httpx.ASGITransport(app=feedback_ui.app, client=("127.0.0.1", 40000))
+            async with httpx.AsyncClient(transport=local, base_url="http://ui") as client:
+                response = await client.put("/projects/config", json=update)
+                assert response.status_code == 200 and response.json()["run_command"] == "pytest -q"
+            key = feedback_ui.normalized_project_directory(project)
+            return key, feedback_ui.config_store.settings(key)
+
+    key, settings = asyncio.run(scenario())
+    # The GUI still reads QSettings for this project and applies the API's fields over it.
+    assert settings["project"] is None and settings["project_overrides"] == {"run_command": "pytest -q"}
+
+    store = ConfigStore(db_path) # Reloaded: the row is still unmigrated
+    try:
+        assert store.settings(key)["project"] is None
+        qsettings = {"run_command": "make", "execute_automatically": False, "watch_changes": True,
+                     "named_commands": "lint: ruff check .", "command_section_visible": True}
+        store.apply_message({"project_directory": key, "project": qsettings, "migrate": True})
+        assert store.settings(key)["project"] == {**qsettings, "run_command": "pytest -q"}
+    finally:
+        store.close()
+    store = ConfigStore(db_path)
+    try:
+        assert store.settings(key)["project"]["named_commands"] == "lint: ruff check ."
+        assert not store.unmigrated
+    finally:
+        store.close()
@@ -0,0 +1,57 @@
+# Watch mode outside a git work tree: a rerun that writes into the project (a report nobody
+# ignores) must not trigger the next rerun, while a later edit still does.
+import sys
+import time
+import threading
+
+import pytest
+
+from feedback_watch import ProjectWatcher
+
+DEBOUNCE_SECONDS = 0.1
+RUN_SECONDS = 0.3
+# The polling backend rescans every UI_WATCH_POLL_INTERVAL (1 s by default).
+SETTLE_SECONDS = 3.0
+
+BACKENDS = ["poll"] + (["inotify"] if sys.platform.startswith("linux") else [])
+
+
+def _wait_for(condition, timeout: float):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    return condition()
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_a_rerun_that_writes_into_the_project_does_not_trigger_itself(tmp_path, backend):
+    (tmp_path / "main.py").write_text("print('hi')\n", encoding="utf-8")
+    calls = []
+
+    def rerun():
+        # Like the window's run: writes its report while running, then reports it is done.
+        for index in range(3):
+            (tmp_path / "report.txt").write_text(f"run {len(calls)} step {index}\n", encoding="utf-8")
+            time.sleep(RUN_SECONDS / 3)
+        watcher.run_finished()
+
+    def on_change(paths):
+        calls.append(paths)
+        watcher.run_started()
+        threading.Thread(target=rerun, daemon=True).start()
+
+    watcher = ProjectWatcher(str(tmp_path), on_change, debounce_seconds=DEBOUNCE_SECONDS, backend=backend)
+    watcher.start()
+    try:
+        assert watcher.ready.wait(10)
+        (tmp_path / "main.py").write_text("print('changed')\n", encoding="utf-8")
+        assert _wait_for(lambda: calls, SETTLE_SECONDS)
+        assert calls[0] == ["main.py"]
+        time.sleep(SETTLE_SECONDS)
+        assert len(calls) == 1, calls # The report written by the rerun didn't count
+
+        (tmp_path / "main.py").write_text("print('changed again')\n", encoding="utf-8")
+        assert _wait_for(lambda: len(calls) == 2, SETTLE_SECONDS)
+        assert calls[1] == ["main.py"]
+    finally:
+        watcher.stop()